@@ -6,12 +6,10 @@ import os
 from PIL import Image
 
 from src.data_loader import load_all_data
-from src.feature_engineering import prepare_location_features
-from src.content_filtering import create_user_preference_vector, get_content_based_recommendations
-from src.collaborative_filtering import create_user_location_matrix, get_top_k_similar_users, predict_ratings_for_user
-from src.utils import estimate_location_cost, get_user_budget_limit
-from src.hybrid import combine_scores
-from src import config
+from src.engine import RecommenderEngine
+from src.utils import get_user_budget_limit
+from src.result_cache import ResultCache, recommend_cached
+from src import config, instrumentation
 
 st.set_page_config(page_title="Offbeat Oasis - Travel Recommender", layout="wide", page_icon="🌿")
 
@@ -134,15 +132,24 @@ load_css()
 st.markdown('<div class="header">Offbeat Oasis</div>', unsafe_allow_html=True)
 st.markdown('<div style="text-align: center; color: #2e7d32; margin-bottom: 2em;">Discover Your Perfect Nature Escape</div>', unsafe_allow_html=True)
 
-# Load data
-@st.cache_data
-def load_data():
-    logger.info("Loading data...")
-    data = load_all_data()
-    logger.info("Data loaded successfully.")
-    return data
+# Load the data and fit the models once per process; every rerun and session shares the same objects
+@st.cache_resource
+def load_engine():
+    logger.info("Loading data and fitting recommender engine (TF-IDF, interaction matrix, cost table)...")
+    engine = RecommenderEngine().fit(*load_all_data())
+    logger.info("Recommender engine fitted.")
+    return engine
 
-locations_df, trips_df, users_df, reviews_df = load_data()
+engine = load_engine()
+# The engine's own frames, read-only (st.cache_data would hand every rerun a fresh copy)
+locations_df, users_df = engine.locations_df, engine.users_df
+
+# Rankings already computed, for any session; keyed on the query and the engine version
+@st.cache_resource
+def load_result_cache():
+    return ResultCache()
+
+result_cache = load_result_cache()
 
 # Sidebar user input
 with st.sidebar:
@@ -154,8 +161,6 @@ with st.sidebar:
     
     user_id = st.selectbox("Select User ID", users_df["user_id"].unique())
     
-    # User Metadata for personalized content filtering
-    user_metadata = users_df[users_df["user_id"] == user_id].iloc[0]
     category = st.selectbox("Preferred Travel Category", locations_df["category"].dropna().unique())
     state = st.selectbox("Preferred State", locations_df["state"].dropna().unique())
     top_k = st.slider("Number of Recommendations", 1, 20, config.TOP_K)
@@ -167,7 +172,7 @@ with st.sidebar:
     if budget_mode == "Manual":
         user_budget = st.slider("Trip Budget (₹)", 10000, 200000, 50000, step=5000)
     else:
-        user_budget = get_user_budget_limit(users_df, user_id)
+        user_budget = get_user_budget_limit(users_df, user_id, lookup=engine.lookup)
     
     st.markdown(f"""
     <div style="background-color: #e8f5e9; padding: 10px; border-radius: 8px; margin-top: 20px;">
@@ -177,41 +182,16 @@ with st.sidebar:
 
 logger.info(f"User selected: user_id={user_id}, category='{category}', state='{state}', budget_mode={budget_mode}, budget=₹{user_budget}, top_k={top_k}")
 
-# Feature engineering
-logger.info("Preparing location features using TF-IDF and numeric data...")
-tfidf_matrix, tfidf = prepare_location_features(locations_df)
-
-user_vector = create_user_preference_vector(category, state, tfidf, {
-    "occupation": user_metadata["occupation"],
-    "location_type": user_metadata["location_type"]
-})
-
-content_recs = get_content_based_recommendations(user_vector, tfidf_matrix, locations_df, top_n=50)
-logger.info(f"Generated {len(content_recs)} content-based recommendations.")
-
-# Collaborative filtering
-logger.info("Running collaborative filtering...")
-interaction_matrix = create_user_location_matrix(reviews_df, users_df)
-similar_users = get_top_k_similar_users(interaction_matrix, user_id, k=5)
-collab_scores = predict_ratings_for_user(interaction_matrix, similar_users, user_id)
-logger.info("Collaborative filtering scores calculated.")
-
-# Estimate costs and filter by user's budget
-logger.info("Estimating costs and applying budget filter...")
-location_costs = estimate_location_cost(reviews_df, trips_df)
-content_recs = content_recs.merge(location_costs, on="location_id", how="left")
-filtered_recs = content_recs[content_recs["estimated_cost"] <= user_budget]
-logger.info(f"{len(filtered_recs)} recommendations remain after budget filtering (limit: ₹{user_budget}).")
-
-# Combine scores (Hybrid)
-final_recs = combine_scores(
-    filtered_recs,
-    collab_scores,
-    user_id,
-    reviews_df,
-    weight_content=config.WEIGHT_CONTENT,
-    weight_collab=config.WEIGHT_COLLAB
-)
+# Hybrid recommendations from the fitted engine; a cached ranking is sliced when only top_k changed
+final_recs = recommend_cached(result_cache, engine, int(user_id), category, state, budget=user_budget, top_n=top_k)
+cache_stats = result_cache.stats()
+logger.info(f"Result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} entries")
+with st.sidebar:
+    st.caption(f"Result cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+               f"({cache_stats['hit_rate']:.0%} hit rate)")
+if instrumentation.is_enabled():
+    # Per-stage histograms so far (config.INSTRUMENT_STAGES), for Prometheus' textfile collector or offline reading
+    instrumentation.export()
 
 logger.info(f"{len(final_recs)} final recommendations after hybrid scoring.")
 
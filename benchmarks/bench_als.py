@@ -0,0 +1,64 @@
+import argparse
+import time
+
+import numpy as np
+
+from src import config
+from src.collaborative_filtering import create_sparse_user_location_matrix, get_top_k_similar_users, predict_rating_array
+from src.matrix_factorization import als_rmse, predict_als_rating_array, train_als
+from src.synthetic_data import generate_dataset
+
+# (users, locations, reviews), growing to the bench_pipeline "large" preset
+SIZES = [(1000, 200, 5000), (10000, 500, 50000), (50000, 2000, 250000), (200000, 5000, 1000000)]
+
+
+def per_query_ms(fn, user_ids):
+    seconds = []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        fn(user_id)
+        seconds.append(time.perf_counter() - start)
+    seconds_ms = 1000 * np.array(seconds)
+    return float(seconds_ms.mean()), float(np.percentile(seconds_ms, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ALS training time and query latency vs user-user CF, by data size")
+    parser.add_argument("--max-reviews", type=int, default=1000000, help="Skip sizes with more reviews than this")
+    parser.add_argument("--rank", type=int, default=config.ALS_RANK)
+    parser.add_argument("--iterations", type=int, default=config.ALS_ITERATIONS)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"rank {args.rank}, {args.iterations} iterations; query = CF scores for every location for one user")
+    print(f"{'users':>7} {'locs':>5} {'reviews':>8} {'train s':>8} {'RMSE':>6} "
+          f"{'user-CF ms':>10} {'p95':>7} {'ALS ms':>7} {'p95':>7} {'speed-up':>8}")
+    for num_users, num_locations, num_reviews in SIZES:
+        if num_reviews > args.max_reviews:
+            continue
+        _, _, _, reviews_df = generate_dataset(num_users, num_locations, num_reviews, num_trips=1, seed=args.seed)
+        interactions = create_sparse_user_location_matrix(reviews_df)
+
+        start = time.perf_counter()
+        model = train_als(interactions, rank=args.rank, iterations=args.iterations, seed=args.seed)
+        train_s = time.perf_counter() - start
+
+        rng = np.random.default_rng(args.seed)
+        user_ids = rng.choice(interactions.user_ids, size=args.queries).tolist()
+
+        def user_cf(user_id):
+            similar_users = get_top_k_similar_users(interactions, user_id, k=5)
+            return predict_rating_array(interactions, similar_users, user_id)
+
+        user_cf(user_ids[0])
+        predict_als_rating_array(interactions, model, user_ids[0])
+        user_mean, user_p95 = per_query_ms(user_cf, user_ids)
+        als_mean, als_p95 = per_query_ms(lambda user_id: predict_als_rating_array(interactions, model, user_id), user_ids)
+        print(f"{len(interactions.user_ids):>7} {num_locations:>5} {num_reviews:>8} {train_s:>8.2f} "
+              f"{als_rmse(model, interactions):>6.3f} {user_mean:>10.3f} {user_p95:>7.3f} {als_mean:>7.3f} "
+              f"{als_p95:>7.3f} {user_mean / als_mean:>7.1f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
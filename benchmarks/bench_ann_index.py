@@ -0,0 +1,71 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.ann_index import RandomProjectionLSH, evaluate_ann_index
+from src.collaborative_filtering import create_sparse_user_location_matrix
+
+
+def clustered_reviews(num_users, num_locations, reviews_per_user, num_clusters, seed):
+    # Users in a cluster review overlapping location pools, which gives the neighbourhoods real structure
+    rng = np.random.default_rng(seed)
+    pool_size = max(num_locations // num_clusters, reviews_per_user)
+    pools = [rng.choice(num_locations, size=pool_size, replace=False) + 1 for _ in range(num_clusters)]
+    clusters = rng.integers(0, num_clusters, size=num_users)
+    user_ids = np.repeat(np.arange(1, num_users + 1), reviews_per_user)
+    location_ids = np.concatenate([
+        rng.choice(pools[cluster], size=reviews_per_user, replace=False) for cluster in clusters
+    ])
+    return pd.DataFrame({
+        "user_id": user_ids,
+        "location_id": location_ids,
+        "rating": np.round(rng.uniform(1.0, 5.0, size=len(user_ids)), 1),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LSH user index: recall@k and query speed-up vs the exact scan")
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--locations", type=int, default=175)
+    parser.add_argument("--reviews-per-user", type=int, default=4)
+    parser.add_argument("--clusters", type=int, default=25)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--tables", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--bits", type=int, nargs="+", default=[8, 12])
+    parser.add_argument("--probes", type=int, nargs="+", default=[0, 2])
+    parser.add_argument("--insert", type=int, default=1000, help="Users held out of the build and inserted afterwards")
+    args = parser.parse_args()
+
+    reviews_df = clustered_reviews(args.users, args.locations, args.reviews_per_user, args.clusters, seed=42)
+    interactions = create_sparse_user_location_matrix(reviews_df)
+    rng = np.random.default_rng(0)
+    query_users = rng.choice(interactions.user_ids, size=min(args.queries, len(interactions.user_ids)), replace=False)
+    num_built = len(interactions.user_ids) - args.insert
+
+    print(f"{'tables':>6} {'bits':>4} {'probes':>6} {'build s':>8} {'insert ms/user':>14} "
+          f"{'recall@k':>8} {'exact ms':>9} {'ann ms':>8} {'speed-up':>8}")
+    for num_tables in args.tables:
+        for num_bits in args.bits:
+            for num_probes in args.probes:
+                start = time.perf_counter()
+                index = RandomProjectionLSH(interactions.shape[1], num_tables=num_tables,
+                                            num_bits=num_bits, num_probes=num_probes)
+                index.add(interactions.user_ids[:num_built], interactions.normalized[:num_built])
+                build_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                for row in range(num_built, len(interactions.user_ids)):
+                    index.add([interactions.user_ids[row]], interactions.normalized[row])
+                insert_ms = (time.perf_counter() - start) * 1000 / max(args.insert, 1)
+
+                report = evaluate_ann_index(index, interactions, query_users, k=args.k)
+                print(f"{num_tables:>6} {num_bits:>4} {num_probes:>6} {build_seconds:>8.2f} {insert_ms:>14.3f} "
+                      f"{report['recall_at_k']:>8.3f} {report['exact_ms_per_query']:>9.2f} "
+                      f"{report['ann_ms_per_query']:>8.2f} {report['speedup']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
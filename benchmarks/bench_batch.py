@@ -0,0 +1,43 @@
+import argparse
+import time
+
+import numpy as np
+
+from src.data_loader import load_all_data
+from src.engine import RecommenderEngine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput: per-user recommend() loop vs recommend_batch()")
+    parser.add_argument("--users", type=int, default=5000, help="Number of (repeated) user queries to score")
+    parser.add_argument("--loop-users", type=int, default=300, help="Queries timed through the per-user loop")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--block-size", type=int, nargs="+", default=[256, 1024])
+    parser.add_argument("--cf-mode", choices=["user", "item"], default="user")
+    args = parser.parse_args()
+
+    locations_df, trips_df, users_df, reviews_df = load_all_data()
+    engine = RecommenderEngine(cf_mode=args.cf_mode).fit(locations_df, trips_df, users_df, reviews_df)
+
+    rng = np.random.default_rng(42)
+    user_ids = rng.choice(users_df["user_id"].unique(), size=args.users)
+    categories = rng.choice(locations_df["category"].dropna().unique(), size=args.users)
+    states = rng.choice(locations_df["state"].dropna().unique(), size=args.users)
+
+    num_loop = min(args.loop_users, args.users)
+    start = time.perf_counter()
+    for user_id, category, state in zip(user_ids[:num_loop], categories[:num_loop], states[:num_loop]):
+        engine.recommend(user_id, category, state, top_n=args.top_n)
+    loop_rate = num_loop / (time.perf_counter() - start)
+    print(f"per-user loop        : {loop_rate:10.0f} users/s")
+
+    for block_size in args.block_size:
+        start = time.perf_counter()
+        result = engine.recommend_batch(user_ids, categories, states, top_n=args.top_n, block_size=block_size)
+        batch_rate = args.users / (time.perf_counter() - start)
+        print(f"batch (block={block_size:>5}) : {batch_rate:10.0f} users/s  ({batch_rate / loop_rate:.0f}x, "
+              f"{len(result)} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import time
+
+import numpy as np
+
+from src.data_loader import load_all_data
+from src.engine import RecommenderEngine
+from src.utils import get_user_budget_limit
+from src.feature_engineering import prepare_location_features
+from src.content_filtering import create_user_preference_vector, get_content_based_recommendations
+from src.collaborative_filtering import create_user_location_matrix, get_top_k_similar_users, predict_ratings_for_user
+from src.utils import estimate_location_cost
+from src.hybrid import combine_scores
+from src import config
+
+
+def recommend_rebuild_every_request(user_id, category, state, locations_df, trips_df, users_df, reviews_df, top_n):
+    # The per-request pipeline app/app3.py ran before the engine existed
+    user_metadata = users_df[users_df["user_id"] == user_id].iloc[0]
+    tfidf_matrix, tfidf = prepare_location_features(locations_df)
+    user_vector = create_user_preference_vector(category, state, tfidf, {
+        "occupation": user_metadata["occupation"],
+        "location_type": user_metadata["location_type"]
+    })
+    content_recs = get_content_based_recommendations(user_vector, tfidf_matrix, locations_df, top_n=50)
+    interaction_matrix = create_user_location_matrix(reviews_df, users_df)
+    similar_users = get_top_k_similar_users(interaction_matrix, user_id, k=5)
+    collab_scores = predict_ratings_for_user(interaction_matrix, similar_users, user_id)
+    location_costs = estimate_location_cost(reviews_df, trips_df)
+    user_budget = get_user_budget_limit(users_df, user_id)
+    content_recs = content_recs.merge(location_costs, on="location_id", how="left")
+    filtered_recs = content_recs[content_recs["estimated_cost"] <= user_budget]
+    final_recs = combine_scores(filtered_recs, collab_scores, user_id, reviews_df,
+                                weight_content=config.WEIGHT_CONTENT, weight_collab=config.WEIGHT_COLLAB)
+    return final_recs.head(top_n)
+
+
+def summarize(label, timings):
+    timings_ms = np.array(timings) * 1000
+    print(f"{label:<22} mean={timings_ms.mean():8.3f} ms  p50={np.percentile(timings_ms, 50):8.3f} ms  "
+          f"p95={np.percentile(timings_ms, 95):8.3f} ms  ({len(timings_ms)} requests)")
+    return timings_ms.mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request latency: rebuild-per-request vs fitted RecommenderEngine")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    locations_df, trips_df, users_df, reviews_df = load_all_data()
+    rng = np.random.default_rng(args.seed)
+    user_ids = rng.choice(users_df["user_id"].unique(), size=args.requests)
+    categories = locations_df["category"].dropna().unique()
+    states = locations_df["state"].dropna().unique()
+    queries = [(uid, rng.choice(categories), rng.choice(states)) for uid in user_ids]
+
+    before = []
+    for user_id, category, state in queries:
+        start = time.perf_counter()
+        recommend_rebuild_every_request(user_id, category, state, locations_df, trips_df, users_df, reviews_df, args.top_n)
+        before.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    engine = RecommenderEngine().fit(locations_df, trips_df, users_df, reviews_df)
+    fit_seconds = time.perf_counter() - start
+
+    after = []
+    for user_id, category, state in queries:
+        start = time.perf_counter()
+        engine.recommend(user_id, category, state, top_n=args.top_n)
+        after.append(time.perf_counter() - start)
+
+    print(f"Engine fit: {fit_seconds * 1000:.1f} ms (once per process)")
+    mean_before = summarize("rebuild per request", before)
+    mean_after = summarize("fitted engine", after)
+    print(f"Speed-up: {mean_before / mean_after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
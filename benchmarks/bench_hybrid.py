@@ -0,0 +1,104 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data_loader import load_all_data
+from src.engine import RecommenderEngine
+from src.collaborative_filtering import predict_item_based_ratings, predict_ratings_for_user
+from src.content_filtering import create_user_preference_vector, get_content_based_recommendations
+from src.hybrid import combine_scores
+from src.matrix_factorization import predict_als_ratings
+
+# Requested speed-up of recommend() over the frame path. The scoring stage clears it; the whole request does not,
+# since the preference vector and content ranking before scoring are not what the array scorer replaced
+REQUESTED_SPEEDUP = 10.0
+
+
+def frame_collab_scores(engine, user_id):
+    # CF predictions as the frame path consumed them: a pandas Series indexed by location_id
+    if engine.cf_mode == "item":
+        return predict_item_based_ratings(engine.interaction_matrix, engine.item_similarity, user_id)
+    if engine.cf_mode == "als":
+        return predict_als_ratings(engine.interaction_matrix, engine.als_model, user_id)
+    return predict_ratings_for_user(engine.interaction_matrix, engine._similar_users(user_id), user_id)
+
+
+def recommend_with_frames(engine, user_id, category, state, top_n):
+    # recommend() as it was before the array scorer: content frame -> cost merge -> combine_scores
+    user_metadata = engine.lookup.user_metadata(user_id)
+    user_vector = create_user_preference_vector(category, state, engine.tfidf, {
+        "occupation": user_metadata["occupation"],
+        "location_type": user_metadata["location_type"]
+    })
+    content_recs = get_content_based_recommendations(
+        user_vector, engine.tfidf_matrix, engine.locations_df, top_n=engine.content_pool
+    )
+    content_recs = content_recs.merge(engine.location_costs, on="location_id", how="left")
+    filtered_recs = content_recs[content_recs["estimated_cost"] <= engine.lookup.budget_limit(user_id)]
+    return filtered_recs, frame_collab_scores(engine, user_id)
+
+
+def time_per_call(fn, user_ids):
+    start = time.perf_counter()
+    for user_id in user_ids:
+        fn(user_id)
+    return (time.perf_counter() - start) * 1e6 / len(user_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hybrid scoring: combine_scores frames vs the array scorer")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    locations_df, trips_df, users_df, reviews_df = load_all_data()
+    category, state = "Adventure", "Goa"
+    user_ids = users_df["user_id"].unique()
+    query_users = np.random.default_rng(0).choice(user_ids, size=args.queries).tolist()
+
+    for cf_mode in ["user", "item", "als"]:
+        engine = RecommenderEngine(cf_mode=cf_mode).fit(locations_df, trips_df, users_df, reviews_df)
+
+        # Same rows, values and order for every user
+        for user_id in user_ids:
+            filtered_recs, collab_scores = recommend_with_frames(engine, user_id, category, state, args.top_n)
+            expected = combine_scores(filtered_recs, collab_scores, user_id, reviews_df,
+                                      weight_content=engine.weight_content, weight_collab=engine.weight_collab,
+                                      top_n=args.top_n)
+            pd.testing.assert_frame_equal(engine.recommend(user_id, category, state, top_n=args.top_n), expected,
+                                          check_exact=True)
+
+        # Scoring stage only: from the budget-filtered content pool and CF scores to the final top-n frame
+        frame_inputs, array_inputs = {}, {}
+        for user_id in query_users:
+            frame_inputs[user_id] = recommend_with_frames(engine, user_id, category, state, args.top_n)
+            positions = engine.lookup.location_rows(frame_inputs[user_id][0]["location_id"].to_numpy())
+            content_scores = np.zeros(len(engine.locations_df))
+            content_scores[positions] = frame_inputs[user_id][0]["content_score"].to_numpy()
+            array_inputs[user_id] = (content_scores, positions) + engine._collab_score_arrays(user_id)
+        frames_us = time_per_call(lambda user_id: combine_scores(
+            *frame_inputs[user_id], user_id, reviews_df, weight_content=engine.weight_content,
+            weight_collab=engine.weight_collab, lookup=engine.lookup, top_n=args.top_n
+        ), query_users)
+        arrays_us = time_per_call(
+            lambda user_id: engine._score_candidates(user_id, *array_inputs[user_id], args.top_n), query_users
+        )
+        full_frames_us = time_per_call(lambda user_id: combine_scores(
+            *recommend_with_frames(engine, user_id, category, state, args.top_n), user_id, reviews_df,
+            weight_content=engine.weight_content, weight_collab=engine.weight_collab,
+            lookup=engine.lookup, top_n=args.top_n
+        ), query_users)
+        recommend_us = time_per_call(lambda user_id: engine.recommend(user_id, category, state, top_n=args.top_n),
+                                     query_users)
+        print(f"cf_mode={cf_mode}: identical results for {len(user_ids)} users")
+        print(f"  scoring: combine_scores {frames_us:9.1f} us   arrays {arrays_us:9.1f} us  ({frames_us / arrays_us:.1f}x)")
+        request_speedup = full_frames_us / recommend_us
+        print(f"  request: frames         {full_frames_us:9.1f} us   recommend() {recommend_us:6.1f} us  "
+              f"({request_speedup:.1f}x; {'meets' if request_speedup >= REQUESTED_SPEEDUP else 'short of'} "
+              f"the {REQUESTED_SPEEDUP:.0f}x target)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data_loader import load_all_data
+from src.engine import RecommenderEngine
+from src.collaborative_filtering import get_top_k_similar_users
+
+
+def split_latest(reviews_df, trips_df, fraction, seed):
+    # Hold back a random slice of reviews and trips as the "new" events
+    rng = np.random.default_rng(seed)
+    review_mask = rng.random(len(reviews_df)) < fraction
+    trip_mask = rng.random(len(trips_df)) < fraction
+    return (reviews_df[~review_mask], trips_df[~trip_mask], reviews_df[review_mask], trips_df[trip_mask])
+
+
+def check_matches_refit(updated, refit, users_df, locations_df):
+    # Interaction matrix, cost table and recommendations (served from the surviving neighbour cache)
+    # must agree with a full refit
+    dense_updated = updated.interaction_matrix.to_dense().sort_index().sort_index(axis=1)
+    dense_refit = refit.interaction_matrix.to_dense()
+    assert dense_updated.index.equals(dense_refit.index) and dense_updated.columns.equals(dense_refit.columns)
+    assert np.allclose(dense_updated.to_numpy(), dense_refit.to_numpy())
+
+    costs = updated.location_costs.set_index("location_id")["estimated_cost"].dropna().sort_index()
+    refit_costs = refit.location_costs.set_index("location_id")["estimated_cost"].dropna().sort_index()
+    assert costs.index.equals(refit_costs.index) and np.allclose(costs, refit_costs)
+
+    category, state = locations_df["category"].iloc[0], locations_df["state"].iloc[0]
+    k = refit.num_neighbors
+    for user_id in users_df["user_id"].unique():
+        ours = updated.recommend(user_id, category, state)
+        theirs = refit.recommend(user_id, category, state)
+        if ours is None:
+            assert theirs is None
+            continue
+        neighbors = get_top_k_similar_users(refit.interaction_matrix, user_id, k=k)
+        if refit.cf_mode == "user" and neighbors is not None:
+            cached = updated._neighbor_cache[user_id]
+            assert cached.index.equals(neighbors.index) and np.allclose(cached.to_numpy(), neighbors.to_numpy())
+        assert ours["location_id"].tolist() == theirs["location_id"].tolist()
+        assert np.allclose(ours["hybrid_score"].to_numpy(), theirs["hybrid_score"].to_numpy())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental RecommenderEngine.update() vs full refit")
+    parser.add_argument("--fraction", type=float, default=0.1, help="Share of reviews/trips replayed as new events")
+    parser.add_argument("--batches", type=int, default=5)
+    parser.add_argument("--cf-mode", choices=["user", "item"], default="user")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    locations_df, trips_df, users_df, reviews_df = load_all_data()
+    base_reviews, base_trips, new_reviews, new_trips = split_latest(reviews_df, trips_df, args.fraction, args.seed)
+
+    engine = RecommenderEngine(cf_mode=args.cf_mode).fit(locations_df, base_trips, users_df, base_reviews)
+    category, state = locations_df["category"].iloc[0], locations_df["state"].iloc[0]
+    for user_id in users_df["user_id"].unique():
+        engine.recommend(user_id, category, state)
+
+    update_seconds = []
+    review_batches = [new_reviews.iloc[idx] for idx in np.array_split(np.arange(len(new_reviews)), args.batches)]
+    trip_batches = [new_trips.iloc[idx] for idx in np.array_split(np.arange(len(new_trips)), args.batches)]
+    for review_batch, trip_batch in zip(review_batches, trip_batches):
+        cached_before = len(engine._neighbor_cache)
+        start = time.perf_counter()
+        changed = engine.update(review_batch, trip_batch)
+        update_seconds.append(time.perf_counter() - start)
+        print(f"update: {len(review_batch):>4} reviews, {len(trip_batch):>3} trips -> {len(changed):>3} changed users, "
+              f"{cached_before - len(engine._neighbor_cache):>3} of {cached_before} cached neighbourhoods invalidated, "
+              f"{update_seconds[-1] * 1000:.1f} ms")
+        # Re-warm so the next batch invalidates against a full cache
+        for user_id in users_df["user_id"].unique():
+            engine.recommend(user_id, category, state)
+
+    start = time.perf_counter()
+    refit = RecommenderEngine(cf_mode=args.cf_mode).fit(
+        locations_df, pd.concat([base_trips, new_trips]), users_df, pd.concat([base_reviews, new_reviews])
+    )
+    refit_seconds = time.perf_counter() - start
+
+    check_matches_refit(engine, refit, users_df, locations_df)
+    print(f"Incremental state matches a full refit. mean update {np.mean(update_seconds) * 1000:.1f} ms "
+          f"vs refit {refit_seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_incremental import check_matches_refit, split_latest
+from src.data_loader import load_all_data
+from src.engine import RecommenderEngine
+from src.ingestion import EventIngestor
+from src.synthetic_data import generate_dataset
+
+
+def event_lines(reviews_df, trips_df, seed):
+    # One JSONL line per held-out review/trip, interleaved at random as a live stream would be
+    records = ([{"type": "review", **row} for row in json.loads(reviews_df.to_json(orient="records"))]
+               + [{"type": "trip", **row} for row in json.loads(trips_df.to_json(orient="records"))])
+    order = np.random.default_rng(seed).permutation(len(records))
+    return [records[index] for index in order]
+
+
+def write_events(path, events, event_time=None):
+    with open(path, "a") as f:
+        for event in events:
+            f.write(json.dumps(event if event_time is None else {**event, "event_time": event_time}) + "\n")
+
+
+def ingest_all(tables, events_path, checkpoint_dir, max_batch):
+    engine = RecommenderEngine().fit(*tables)
+    ingestor = EventIngestor(engine, events_path, checkpoint_dir, max_batch=max_batch, max_delay=0.0)
+    ingestor.recover()
+    start = time.perf_counter()
+    summary = ingestor.run()
+    return engine, ingestor, summary, time.perf_counter() - start
+
+
+def live_lag(tables, events, scratch, rate, duration, max_delay, poll_interval):
+    # A producer thread appends events at `rate` per second while the ingestor tails the file
+    events_path = os.path.join(scratch, f"live-{max_delay}.jsonl")
+    engine = RecommenderEngine().fit(*tables)
+    ingestor = EventIngestor(engine, events_path, os.path.join(scratch, f"live-{max_delay}"), max_delay=max_delay)
+    ingestor.recover()
+    stop = threading.Event()
+
+    def produce():
+        start, written = time.perf_counter(), 0
+        while not stop.is_set() and written < len(events):
+            due = min(int((time.perf_counter() - start) * rate), len(events))
+            if due > written:
+                write_events(events_path, events[written:due], event_time=time.time())
+                written = due
+            time.sleep(0.005)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    timer = threading.Timer(duration, stop.set)
+    timer.start()
+    summary = ingestor.run(follow=True, poll_interval=poll_interval, stop=stop)
+    producer.join()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONL event ingestion: throughput, freshness lag, refit equivalence")
+    parser.add_argument("--events", type=int, default=5000, help="Held-out synthetic events replayed per run")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--rate", type=float, default=500.0, help="Events per second written in the live run")
+    parser.add_argument("--duration", type=float, default=8.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Shipped data: ingesting the held-out events, before and after a restart, must match a full refit
+        locations_df, trips_df, users_df, reviews_df = load_all_data()
+        base_reviews, base_trips, new_reviews, new_trips = split_latest(reviews_df, trips_df, 0.1, args.seed)
+        events_path = os.path.join(scratch, "shipped.jsonl")
+        write_events(events_path, event_lines(new_reviews, new_trips, args.seed))
+        base = (locations_df, base_trips, users_df, base_reviews)
+        refit = RecommenderEngine().fit(locations_df, pd.concat([base_trips, new_trips]), users_df,
+                                        pd.concat([base_reviews, new_reviews]))
+        engine, _, summary, _ = ingest_all(base, events_path, os.path.join(scratch, "shipped"), max_batch=16)
+        check_matches_refit(engine, refit, users_df, locations_df)
+        restarted = RecommenderEngine().fit(*base)
+        replayed = EventIngestor(restarted, events_path, os.path.join(scratch, "shipped")).recover()
+        check_matches_refit(restarted, refit, users_df, locations_df)
+        print(f"shipped data: {sum(summary['applied'].values())} events in {summary['batches']} batches match a full "
+              f"refit; a restart replayed {replayed} committed events and matches too")
+
+        # Synthetic data: throughput against micro-batch size
+        synthetic_locations, synthetic_trips, synthetic_users, synthetic_reviews = generate_dataset(
+            20000, 1000, 100000, seed=args.seed
+        )
+        fraction = args.events / (len(synthetic_reviews) + len(synthetic_trips))
+        base_reviews, base_trips, new_reviews, new_trips = split_latest(synthetic_reviews, synthetic_trips, fraction, args.seed)
+        base = (synthetic_locations, base_trips, synthetic_users, base_reviews)
+        events = event_lines(new_reviews, new_trips, args.seed)
+        events_path = os.path.join(scratch, "synthetic.jsonl")
+        write_events(events_path, events)
+        print(f"\nsynthetic data ({len(synthetic_users)} users, {len(synthetic_reviews)} reviews), "
+              f"{len(events)} events replayed from a file")
+        print(f"{'max_batch':>9} {'batches':>8} {'events/s':>9} {'update() ev/s':>13}")
+        for max_batch in args.batch_sizes:
+            _, _, summary, seconds = ingest_all(base, events_path, os.path.join(scratch, f"batch-{max_batch}"), max_batch)
+            print(f"{max_batch:>9} {summary['batches']:>8} {len(events) / seconds:>9.0f} "
+                  f"{summary['apply_events_per_second']:>13.0f}")
+
+        # Freshness lag while a producer appends at a steady rate
+        print(f"\nlive: {args.rate:.0f} events/s appended for {args.duration:.0f}s, file polled every 50 ms")
+        print(f"{'max_delay':>9} {'batches':>8} {'events/s':>9} {'lag p50 s':>10} {'lag p95 s':>10} {'lag max s':>10}")
+        for max_delay in (0.0, 0.25, 1.0):
+            summary = live_lag(base, events, scratch, args.rate, args.duration, max_delay, poll_interval=0.05)
+            print(f"{max_delay:>9} {summary['batches']:>8} {summary['events_per_second']:>9.0f} "
+                  f"{summary['lag_p50_seconds']:>10.3f} {summary['lag_p95_seconds']:>10.3f} "
+                  f"{summary['lag_max_seconds']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
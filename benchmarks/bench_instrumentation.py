@@ -0,0 +1,110 @@
+import argparse
+import time
+
+import numpy as np
+
+from src import instrumentation
+from src.data_loader import load_all_data
+from src.engine import RecommenderEngine
+
+
+def time_requests(engine, queries):
+    # One pass over the query set, in microseconds per request
+    start = time.perf_counter()
+    for user_id, category, state in queries:
+        engine.recommend(user_id, category, state)
+    return (time.perf_counter() - start) * 1e6 / len(queries)
+
+
+def time_modes(engine, queries, repeat):
+    # Best pass per mode; the modes take turns within each round so machine noise hits them alike
+    modes = {"off": (False, False), "timing": (True, False), "memory": (True, True)}
+    best = dict.fromkeys(modes, np.inf)
+    for _ in range(repeat):
+        for mode, (enabled, trace_memory) in modes.items():
+            instrumentation.disable()
+            if enabled:
+                instrumentation.enable(trace_memory=trace_memory)
+            best[mode] = min(best[mode], time_requests(engine, queries))
+    instrumentation.disable()
+    return best
+
+
+def disabled_stage_ns(iterations):
+    # Cost of one `with stage(...)` plus one decorated call while instrumentation is off, over an empty loop
+    noop = instrumentation.instrumented("noop")(lambda: None)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        pass
+    empty = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with instrumentation.stage("noop"):
+            pass
+    with_stage = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(iterations):
+        noop()
+    with_decorator = time.perf_counter() - start
+    bare = noop.__wrapped__
+    start = time.perf_counter()
+    for _ in range(iterations):
+        bare()
+    undecorated = time.perf_counter() - start
+    return (with_stage - empty) * 1e9 / iterations, (with_decorator - undecorated) * 1e9 / iterations
+
+
+def enabled_stage_ns(iterations):
+    # Cost of recording one stage with timing on (two clocks per side plus the histogram update)
+    instrumentation.enable()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with instrumentation.stage("noop"):
+            pass
+    elapsed = time.perf_counter() - start
+    instrumentation.disable()
+    return elapsed * 1e9 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="recommend() latency with instrumentation off, timing only, and with memory")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output-dir", default=None, help="Export the collected histograms here")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    locations_df, trips_df, users_df, reviews_df = load_all_data()
+    engine = RecommenderEngine().fit(locations_df, trips_df, users_df, reviews_df)
+    rng = np.random.default_rng(args.seed)
+    queries = list(zip(
+        rng.choice(users_df["user_id"].unique(), size=args.requests).tolist(),
+        rng.choice(locations_df["category"].dropna().unique(), size=args.requests).tolist(),
+        rng.choice(locations_df["state"].dropna().unique(), size=args.requests).tolist(),
+    ))
+    time_requests(engine, queries)  # warm the neighbourhood cache so every mode sees the same work
+
+    instrumentation.reset()
+    best = time_modes(engine, queries, args.repeat)
+    off_us, timing_us, memory_us = best["off"], best["timing"], best["memory"]
+    # Stages recorded per request, from the passes run with instrumentation on
+    stages_per_request = sum(
+        metrics["wall_seconds"]["count"] for metrics in instrumentation.summary().values()
+    ) / (2 * len(queries) * args.repeat)
+
+    stage_ns, decorator_ns = disabled_stage_ns(1_000_000)
+    recording_ns = enabled_stage_ns(100_000)
+    off_overhead_us = stages_per_request * max(stage_ns, decorator_ns) / 1000
+    print(f"recommend() per request: off {off_us:8.1f} us   timing {timing_us:8.1f} us ({timing_us / off_us - 1:+.1%})   "
+          f"timing+tracemalloc {memory_us:8.1f} us ({memory_us / off_us - 1:+.1%})")
+    print(f"Disabled cost: stage() {stage_ns:.0f} ns, decorator {decorator_ns:.0f} ns; {stages_per_request:.1f} stages "
+          f"per request -> ~{off_overhead_us:.2f} us ({off_overhead_us / off_us:.3%} of a request)")
+    print(f"Enabled cost: {recording_ns / 1000:.2f} us per stage -> ~{stages_per_request * recording_ns / 1000:.1f} us "
+          f"({stages_per_request * recording_ns / 1000 / off_us:.2%} of a request)")
+    if args.output_dir:
+        paths = instrumentation.export(args.output_dir)
+        print(f"Histograms written to {paths['prometheus']} and {paths['json']}")
+
+
+if __name__ == "__main__":
+    main()
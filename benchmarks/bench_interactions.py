@@ -0,0 +1,66 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.collaborative_filtering import create_user_location_matrix, get_top_k_similar_users, predict_ratings_for_user
+
+
+def random_reviews(num_users, num_locations, reviews_per_user, seed):
+    rng = np.random.default_rng(seed)
+    num_reviews = num_users * reviews_per_user
+    return pd.DataFrame({
+        "user_id": rng.integers(1, num_users + 1, size=num_reviews),
+        "location_id": rng.integers(1, num_locations + 1, size=num_reviews),
+        "rating": np.round(rng.uniform(1.0, 5.0, size=num_reviews), 1),
+    })
+
+
+def matrix_nbytes(interaction_matrix):
+    if isinstance(interaction_matrix, pd.DataFrame):
+        return interaction_matrix.memory_usage(index=True, deep=True).sum()
+    csr = interaction_matrix.matrix
+    normalized = interaction_matrix.normalized
+    return (csr.data.nbytes + csr.indices.nbytes + csr.indptr.nbytes
+            + normalized.data.nbytes + normalized.indices.nbytes + normalized.indptr.nbytes)
+
+
+def time_backend(reviews_df, backend, query_users, k):
+    start = time.perf_counter()
+    interaction_matrix = create_user_location_matrix(reviews_df, backend=backend)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for user_id in query_users:
+        similar_users = get_top_k_similar_users(interaction_matrix, user_id, k=k)
+        predict_ratings_for_user(interaction_matrix, similar_users, user_id)
+    query_seconds = (time.perf_counter() - start) / len(query_users)
+    return build_seconds, query_seconds, matrix_nbytes(interaction_matrix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dense pivot vs sparse CSR interaction matrix")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--locations", type=int, default=175)
+    parser.add_argument("--reviews-per-user", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--skip-dense-above", type=int, default=50000,
+                        help="Skip the dense backend for user counts above this")
+    args = parser.parse_args()
+
+    print(f"{'users':>8} {'backend':>7} {'build ms':>10} {'query ms':>10} {'memory MB':>10}")
+    for num_users in args.users:
+        reviews_df = random_reviews(num_users, args.locations, args.reviews_per_user, seed=num_users)
+        query_users = reviews_df["user_id"].drop_duplicates().head(args.queries).tolist()
+        for backend in ("dense", "sparse"):
+            if backend == "dense" and num_users > args.skip_dense_above:
+                continue
+            build_seconds, query_seconds, nbytes = time_backend(reviews_df, backend, query_users, args.k)
+            print(f"{num_users:>8} {backend:>7} {build_seconds * 1000:>10.1f} "
+                  f"{query_seconds * 1000:>10.2f} {nbytes / 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
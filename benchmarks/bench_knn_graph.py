@@ -0,0 +1,69 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from benchmarks.bench_interactions import random_reviews
+from src.collaborative_filtering import create_sparse_user_location_matrix, get_top_k_similar_users
+from src.data_loader import load_all_data
+from src.knn_graph import build_user_knn_graph
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def check_matches_scan(graph, interactions, user_ids, k):
+    # Same neighbour ids, in the same order, and the same weights as the per-user scan
+    for user_id in user_ids:
+        expected = get_top_k_similar_users(interactions, user_id, k=k)
+        actual = graph.neighbors(user_id)
+        assert actual.index.tolist() == expected.index.tolist(), f"user {user_id}: neighbour ids differ"
+        assert np.allclose(actual.to_numpy(), expected.to_numpy(), atol=1e-6), f"user {user_id}: weights differ"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blocked user kNN graph: wall time and peak memory vs users")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 5000, 20000, 50000])
+    parser.add_argument("--locations", type=int, default=175)
+    parser.add_argument("--reviews-per-user", type=int, default=3)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--block-sizes", type=int, nargs="+", default=[256, 1024])
+    parser.add_argument("--check-users", type=int, default=500,
+                        help="Users per size whose neighbours are checked against the per-user scan")
+    parser.add_argument("--full-matrix-up-to", type=int, default=20000,
+                        help="Also time the full N x N cosine matrix for user counts up to this")
+    args = parser.parse_args()
+
+    _, _, _, reviews_df = load_all_data()
+    interactions = create_sparse_user_location_matrix(reviews_df)
+    check_matches_scan(build_user_knn_graph(interactions, k=args.k), interactions, interactions.user_ids.tolist(), args.k)
+    print(f"shipped data: neighbour ids and weights of all {len(interactions.user_ids)} users match the per-user scan")
+
+    print(f"\n{'users':>8} {'method':>14} {'wall s':>8} {'peak MB':>9}")
+    for num_users in args.users:
+        reviews_df = random_reviews(num_users, args.locations, args.reviews_per_user, seed=num_users)
+        interactions = create_sparse_user_location_matrix(reviews_df)
+        sample = np.random.default_rng(num_users).choice(
+            interactions.user_ids, size=min(args.check_users, num_users), replace=False
+        )
+        for block_size in args.block_sizes:
+            elapsed, peak = measure(lambda: build_user_knn_graph(interactions, k=args.k, block_size=block_size))
+            print(f"{num_users:>8} {f'block={block_size}':>14} {elapsed:>8.2f} {peak / 1e6:>9.1f}")
+            check_matches_scan(build_user_knn_graph(interactions, k=args.k, block_size=block_size), interactions,
+                               sample.tolist(), args.k)
+        if num_users <= args.full_matrix_up_to:
+            elapsed, peak = measure(lambda: cosine_similarity(interactions.matrix))
+            print(f"{num_users:>8} {'full N x N':>14} {elapsed:>8.2f} {peak / 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_interactions import random_reviews
+from src.utils import estimate_location_cost, build_location_cost_table
+
+
+def random_trips(num_users, num_locations, trips_per_user, seed):
+    rng = np.random.default_rng(seed)
+    num_trips = num_users * trips_per_user
+    return pd.DataFrame({
+        "trip_id": np.arange(1, num_trips + 1),
+        "user_id": rng.integers(1, num_users + 1, size=num_trips),
+        "location_id": rng.integers(1, num_locations + 1, size=num_trips),
+        "cost": np.round(rng.uniform(1000.0, 150000.0, size=num_trips), 2),
+    })
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Location cost aggregation: reviews x trips fan-out join vs direct aggregate")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--locations", type=int, default=175)
+    parser.add_argument("--per-user", type=int, nargs="+", default=[2, 5, 10],
+                        help="Reviews and trips per user")
+    args = parser.parse_args()
+
+    print(f"{'users':>7} {'per user':>8} {'trips':>9} {'joined rows':>12} {'join s':>8} {'join MB':>8} "
+          f"{'direct s':>9} {'direct MB':>9}")
+    for num_users in args.users:
+        for per_user in args.per_user:
+            reviews_df = random_reviews(num_users, args.locations, per_user, seed=num_users)
+            trips_df = random_trips(num_users, args.locations, per_user, seed=num_users + 1)
+            legacy_trips = trips_df.drop(columns="location_id")
+            # Rows the many-to-many merge materialises before its groupby
+            joined_rows = len(reviews_df.merge(legacy_trips[["user_id"]], on="user_id", how="left"))
+
+            join_s, join_peak = measure(lambda: estimate_location_cost(reviews_df, legacy_trips))
+            direct_s, direct_peak = measure(lambda: build_location_cost_table(trips_df))
+            print(f"{num_users:>7} {per_user:>8} {len(trips_df):>9} {joined_rows:>12} {join_s:>8.3f} "
+                  f"{join_peak / 1e6:>8.1f} {direct_s:>9.3f} {direct_peak / 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
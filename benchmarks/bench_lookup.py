@@ -0,0 +1,86 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_interactions import random_reviews
+from src.hybrid import combine_scores
+from src.lookup import LookupTables
+from src.utils import get_user_budget_limit
+
+BUDGET_FLAGS = ['budget_under_25k', 'budget_25k_to_50k', 'budget_50k_to_100k', 'budget_above_100k']
+
+
+def random_users(num_users, seed):
+    rng = np.random.default_rng(seed)
+    flags = np.eye(len(BUDGET_FLAGS), dtype=bool)[rng.integers(0, len(BUDGET_FLAGS), size=num_users)]
+    users_df = pd.DataFrame(flags, columns=BUDGET_FLAGS)
+    users_df.insert(0, "user_id", np.arange(1, num_users + 1))
+    users_df["occupation"] = rng.choice(["student", "engineer", "artist"], size=num_users)
+    users_df["location_type"] = rng.choice(["urban", "rural"], size=num_users)
+    return users_df
+
+
+def time_per_call(fn, user_ids):
+    start = time.perf_counter()
+    for user_id in user_ids:
+        fn(user_id)
+    return (time.perf_counter() - start) * 1e6 / len(user_ids)
+
+
+def check_matches_scan(users_df, reviews_df, user_ids):
+    # Budget caps and metadata must follow users_df rows whatever their order, so check on shuffled rows too
+    for frame in (users_df, users_df.sample(frac=1, random_state=0)):
+        lookup = LookupTables(frame, reviews_df)
+        for user_id in user_ids:
+            assert lookup.budget_limit(user_id) == get_user_budget_limit(frame, user_id), f"user {user_id}: budget"
+            assert lookup.user_metadata(user_id).equals(frame[frame["user_id"] == user_id].iloc[0]), f"user {user_id}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call latency of boolean-mask lookups vs the LookupTables layer")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--reviews-per-user", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    content_df = pd.DataFrame({"location_id": np.arange(1, 51), "content_score": np.linspace(1.0, 0.5, 50)})
+    collab_scores = pd.Series(np.linspace(5.0, 1.0, 20), index=pd.Index(np.arange(1, 21), name="location_id"))
+
+    print(f"{'users':>8} {'function':<24} {'mask us':>10} {'lookup us':>10} {'speed-up':>9}")
+    for num_users in args.users:
+        users_df = random_users(num_users, seed=num_users)
+        reviews_df = random_reviews(num_users, 175, args.reviews_per_user, seed=num_users)
+        start = time.perf_counter()
+        lookup = LookupTables(users_df, reviews_df)
+        build_ms = (time.perf_counter() - start) * 1000
+        query_users = np.random.default_rng(0).integers(1, num_users + 1, size=args.queries).tolist()
+        check_matches_scan(users_df, reviews_df, query_users)
+
+        cases = [
+            ("get_user_budget_limit",
+             lambda u: get_user_budget_limit(users_df, u),
+             lambda u: get_user_budget_limit(users_df, u, lookup=lookup)),
+            ("user metadata",
+             lambda u: users_df[users_df["user_id"] == u].iloc[0],
+             lambda u: lookup.user_metadata(u)),
+            ("review count",
+             lambda u: len(reviews_df[reviews_df["user_id"] == u]),
+             lambda u: lookup.review_count(u)),
+            ("user reviews",
+             lambda u: reviews_df[reviews_df["user_id"] == u],
+             lambda u: lookup.user_reviews(u)),
+            ("combine_scores",
+             lambda u: combine_scores(content_df, collab_scores, u, reviews_df),
+             lambda u: combine_scores(content_df, collab_scores, u, reviews_df, lookup=lookup)),
+        ]
+        for name, scan, indexed in cases:
+            scan_us = time_per_call(scan, query_users)
+            lookup_us = time_per_call(indexed, query_users)
+            print(f"{num_users:>8} {name:<24} {scan_us:>10.1f} {lookup_us:>10.1f} {scan_us / lookup_us:>8.1f}x")
+        print(f"{num_users:>8} LookupTables built once in {build_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
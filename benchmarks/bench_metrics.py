@@ -0,0 +1,78 @@
+import argparse
+import time
+
+import numpy as np
+
+from src.metrics import SCALAR_METRICS, padded_rankings, ranking_metrics, relevance_csr
+
+
+def random_rankings(num_users, num_items, max_k, seed):
+    # Per-user recommended lists (some shorter than max_k, some empty) and de-duplicated relevant lists
+    rng = np.random.default_rng(seed)
+    recommended, relevant = [], []
+    for _ in range(num_users):
+        length = rng.integers(0, max_k + 1) if rng.random() < 0.2 else max_k
+        recommended.append(rng.choice(num_items, size=length, replace=False).tolist())
+        relevant.append(sorted(set(rng.integers(0, num_items, size=rng.integers(0, 8)).tolist())))
+    return recommended, relevant
+
+
+# Inputs with repeats: the relevant ids count once, and so does a repeated recommendation (at its first position).
+# The scalar functions count every repeat, so they give the "scalar" values.
+DUPLICATE_CASES = [
+    # recommended, relevant, k, expected
+    ([3, 3, 7, 5], [3, 3, 5], 3, {"precision": 1 / 3, "recall": 1 / 2, "ndcg": 1 / (1 + 1 / np.log2(3)), "hit_rate": 1}),
+    ([3, 3, 7, 5], [3, 3, 5], 4, {"precision": 2 / 4, "recall": 2 / 2,
+                                  "ndcg": (1 + 1 / np.log2(5)) / (1 + 1 / np.log2(3)), "hit_rate": 1}),
+    ([2, 2], [2, 2, 2], 2, {"precision": 1 / 2, "recall": 1 / 1, "ndcg": 1.0, "hit_rate": 1}),
+]
+
+
+def check_duplicates():
+    print(f"{'recommended':>14} {'relevant':>10} {'k':>2} {'metric':>9} {'scalar':>7} {'vector':>7}")
+    for recommended, relevant, k, expected in DUPLICATE_CASES:
+        actual = ranking_metrics(padded_rankings([recommended], k), relevance_csr([relevant]), [k])
+        for name, value in expected.items():
+            scalar = SCALAR_METRICS[name](recommended, relevant, k)
+            print(f"{str(recommended):>14} {str(relevant):>10} {k:>2} {name:>9} {scalar:>7.4f} {actual[f'{name}@{k}'][0]:>7.4f}")
+            assert np.isclose(actual[f"{name}@{k}"][0], value, rtol=0, atol=1e-12), \
+                f"{name}@{k} of {recommended} against {relevant}: {actual[f'{name}@{k}'][0]}, expected {value}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorised ranking metrics vs the scalar per-user functions")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--items", type=int, default=175)
+    parser.add_argument("--cutoffs", type=int, nargs="+", default=[5, 10, 15])
+    args = parser.parse_args()
+
+    check_duplicates()
+
+    max_k = max(args.cutoffs)
+    print(f"\n{'users':>8} {'scalar ms':>10} {'vector ms':>10} {'speed-up':>9} {'metrics only ms':>16}  check")
+    for num_users in args.users:
+        recommended, relevant = random_rankings(num_users, args.items, max_k, seed=num_users)
+
+        start = time.perf_counter()
+        expected = {
+            f"{name}@{k}": np.array([fn(recs, rel, k) for recs, rel in zip(recommended, relevant)])
+            for name, fn in SCALAR_METRICS.items() for k in args.cutoffs
+        }
+        scalar_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rankings, relevance = padded_rankings(recommended, max_k), relevance_csr(relevant)
+        packed = time.perf_counter()
+        actual = ranking_metrics(rankings, relevance, args.cutoffs)
+        vector_seconds = time.perf_counter() - start
+        metrics_seconds = time.perf_counter() - packed
+
+        max_error = max(np.abs(actual[name] - expected[name]).max() for name in expected)
+        assert max_error <= 1e-12, f"vectorised metrics differ from the scalar functions by {max_error}"
+        identical = all(np.array_equal(actual[name], expected[name]) for name in expected)
+        print(f"{num_users:>8} {scalar_seconds * 1000:>10.1f} {vector_seconds * 1000:>10.1f} "
+              f"{scalar_seconds / vector_seconds:>8.1f}x {metrics_seconds * 1000:>16.1f}  {'bit-identical' if identical else f'max error {max_error:.1e}'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import scipy
+import sklearn
+
+from benchmarks.bench_hybrid import frame_collab_scores
+from src.collaborative_filtering import build_item_similarity, create_user_location_matrix, get_top_k_similar_users
+from src.content_filtering import create_user_preference_vector, get_content_based_recommendations
+from src.data_loader import load_all_data
+from src.engine import RecommenderEngine
+from src.feature_engineering import prepare_location_features
+from src.hybrid import combine_scores
+from src.snapshot import compile_snapshot
+from src.synthetic_data import generate_dataset, write_dataset
+from src.utils import estimate_location_cost
+from src import config
+
+# (users, locations, reviews); trips default to one per user
+PRESETS = {
+    "small": (1000, 200, 5000),
+    "medium": (20000, 1000, 100000),
+    "large": (200000, 5000, 1000000),
+}
+
+
+def time_once(fn, repeat):
+    # Whole-dataset stages: best and median of `repeat` runs, plus the last result for the next stage
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+    return {"min_ms": 1000 * min(seconds), "median_ms": 1000 * float(np.median(seconds)), "runs": repeat}, result
+
+
+def time_per_query(fn, queries):
+    # Per-request stages: latency distribution over the query set
+    seconds = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(*query)
+        seconds.append(time.perf_counter() - start)
+    seconds_ms = 1000 * np.array(seconds)
+    return {"mean_ms": float(seconds_ms.mean()), "p50_ms": float(np.percentile(seconds_ms, 50)),
+            "p95_ms": float(np.percentile(seconds_ms, 95)), "queries": len(queries)}
+
+
+def sample_queries(locations_df, reviews_df, num_queries, seed):
+    # (user_id, category, state) for users with at least one review, so the CF step has neighbours to find
+    rng = np.random.default_rng(seed)
+    user_ids = rng.choice(reviews_df["user_id"].unique(), size=num_queries)
+    categories = rng.choice(locations_df["category"].dropna().unique(), size=num_queries)
+    states = rng.choice(locations_df["state"].dropna().unique(), size=num_queries)
+    return [(int(user_id), str(category), str(state)) for user_id, category, state in zip(user_ids, categories, states)]
+
+
+def benchmark_dataset(data_dir, num_queries, repeat, seed):
+    stages = {}
+    stages["load_all_data (csv)"], tables = time_once(lambda: load_all_data(data_dir, snapshot_dir=""), repeat)
+    snapshot_dir = os.path.join(data_dir, "snapshot")
+    stages["compile_snapshot"], _ = time_once(lambda: compile_snapshot(data_dir, snapshot_dir), 1)
+    stages["load_all_data (snapshot)"], _ = time_once(lambda: load_all_data(data_dir, snapshot_dir=snapshot_dir), repeat)
+    locations_df, trips_df, users_df, reviews_df = tables
+    queries = sample_queries(locations_df, reviews_df, num_queries, seed)
+
+    # Feature cache disabled so the TF-IDF/scaler fit is what gets timed
+    stages["prepare_location_features"], _ = time_once(lambda: prepare_location_features(locations_df, cache_dir=""),
+                                                       repeat)
+    stages["create_user_location_matrix"], interactions = time_once(
+        lambda: create_user_location_matrix(reviews_df, users_df), repeat
+    )
+    stages["similarity (top-k users per query)"] = time_per_query(
+        lambda user_id, *_: get_top_k_similar_users(interactions, user_id, k=5), queries
+    )
+    stages["build_item_similarity"], _ = time_once(
+        lambda: build_item_similarity(interactions, config.ITEM_NEIGHBORS), repeat
+    )
+    stages["estimate_location_cost"], _ = time_once(lambda: estimate_location_cost(reviews_df, trips_df), repeat)
+
+    stages["engine fit"], engine = time_once(
+        lambda: RecommenderEngine().fit(locations_df, trips_df, users_df, reviews_df), repeat
+    )
+    # combine_scores alone, on content frames and CF scores prepared up front
+    scoring_inputs = {}
+    for user_id, category, state in queries:
+        user_metadata = engine.lookup.user_metadata(user_id)
+        user_vector = create_user_preference_vector(category, state, engine.tfidf, {
+            "occupation": user_metadata["occupation"],
+            "location_type": user_metadata["location_type"]
+        })
+        content_recs = get_content_based_recommendations(
+            user_vector, engine.tfidf_matrix, engine.locations_df, top_n=engine.content_pool
+        )
+        scoring_inputs[user_id] = (content_recs, frame_collab_scores(engine, user_id))
+    stages["combine_scores"] = time_per_query(lambda user_id, *_: combine_scores(
+        *scoring_inputs[user_id], user_id, reviews_df, weight_content=engine.weight_content,
+        weight_collab=engine.weight_collab, lookup=engine.lookup, top_n=10
+    ), queries)
+    stages["recommend (end to end)"] = time_per_query(
+        lambda user_id, category, state: engine.recommend(user_id, category, state, top_n=10), queries
+    )
+    return stages
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "git_commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def headline_ms(stage):
+    return stage["min_ms"] if "min_ms" in stage else stage["mean_ms"]
+
+
+def print_comparison(results, baseline_path):
+    # Stage-by-stage ratio against an earlier run of this suite (>1 means this run is faster)
+    with open(baseline_path) as f:
+        baseline = {dataset["name"]: dataset for dataset in json.load(f)["datasets"]}
+    print(f"\nCompared with {baseline_path}")
+    for dataset in results["datasets"]:
+        if dataset["name"] not in baseline:
+            continue
+        for stage, timing in dataset["stages"].items():
+            before = baseline[dataset["name"]]["stages"].get(stage)
+            if before is not None:
+                print(f"{dataset['name']:<8} {stage:<36} {headline_ms(before):>10.2f} -> {headline_ms(timing):>10.2f} ms"
+                      f"  ({headline_ms(before) / headline_ms(timing):.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage timings on synthetic data of increasing size")
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=list(PRESETS))
+    parser.add_argument("--data-dir", default=None, help="Benchmark this dataset instead of generated ones")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Defaults to artifacts/benchmarks/pipeline-<timestamp>.json")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "seed": args.seed, "datasets": []}
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        datasets = []
+        if args.data_dir:
+            # Copied into the scratch directory so the snapshot stage never writes next to the caller's data
+            data_dir = os.path.join(scratch_dir, "custom")
+            datasets.append(("custom", data_dir, write_dataset(data_dir, *load_all_data(args.data_dir, snapshot_dir=""))))
+        else:
+            for name in args.sizes:
+                num_users, num_locations, num_reviews = PRESETS[name]
+                data_dir = os.path.join(scratch_dir, name)
+                start = time.perf_counter()
+                rows = write_dataset(data_dir, *generate_dataset(num_users, num_locations, num_reviews, seed=args.seed))
+                print(f"{name}: generated {rows} in {time.perf_counter() - start:.1f}s")
+                datasets.append((name, data_dir, rows))
+
+        for name, data_dir, rows in datasets:
+            stages = benchmark_dataset(data_dir, args.queries, args.repeat, args.seed)
+            results["datasets"].append({"name": name, "rows": rows, "stages": stages})
+            for stage, timing in stages.items():
+                detail = (f"min {timing['min_ms']:10.2f} ms  median {timing['median_ms']:10.2f} ms"
+                          if "min_ms" in timing else
+                          f"mean {timing['mean_ms']:9.3f} ms  p50 {timing['p50_ms']:9.3f} ms  p95 {timing['p95_ms']:9.3f} ms")
+                print(f"{name:<8} {stage:<36} {detail}")
+
+    output = args.output or f"artifacts/benchmarks/pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import time
+
+import numpy as np
+
+from src.data_loader import load_all_data
+from src.engine import RecommenderEngine
+from src.result_cache import ResultCache, recommend_cached
+
+
+def session_reruns(users_df, locations_df, num_sessions, seed):
+    # Widget changes a Streamlit session typically makes; each one reruns app3.py with these inputs
+    rng = np.random.default_rng(seed)
+    categories = locations_df["category"].dropna().unique()
+    states = locations_df["state"].dropna().unique()
+    reruns = []
+    for user_id in rng.choice(users_df["user_id"].unique(), size=num_sessions).tolist():
+        category, state, budget = rng.choice(categories), rng.choice(states), None
+        for top_k in (10, 5, 15, 20, 8):  # dragging the top-k slider
+            reruns.append((user_id, category, state, budget, top_k))
+        for budget in (50000, 75000, None):  # manual budget, then back to auto
+            reruns.append((user_id, category, state, budget, top_k))
+        category = rng.choice(categories)  # new category, then back
+        reruns.append((user_id, category, state, budget, top_k))
+        reruns.append((user_id, reruns[-6][1], state, budget, 10))
+    return reruns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit-style reruns: engine.recommend every time vs the result cache")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    locations_df, trips_df, users_df, reviews_df = load_all_data()
+    engine = RecommenderEngine().fit(locations_df, trips_df, users_df, reviews_df)
+    reruns = session_reruns(users_df, locations_df, args.sessions, args.seed)
+    engine.recommend(*reruns[0][:3])  # warm-up
+
+    start = time.perf_counter()
+    for user_id, category, state, budget, top_k in reruns:
+        engine.recommend(user_id, category, state, budget=budget, top_n=top_k)
+    uncached_us = (time.perf_counter() - start) * 1e6 / len(reruns)
+
+    cache = ResultCache()
+    start = time.perf_counter()
+    for user_id, category, state, budget, top_k in reruns:
+        recommend_cached(cache, engine, user_id, category, state, budget=budget, top_n=top_k)
+    cached_us = (time.perf_counter() - start) * 1e6 / len(reruns)
+
+    stats = cache.stats()
+    print(f"{len(reruns)} reruns over {args.sessions} sessions")
+    print(f"recommend() every rerun {uncached_us:8.1f} us   result cache {cached_us:8.1f} us  "
+          f"({uncached_us / cached_us:.1f}x)")
+    print(f"hits {stats['hits']}  misses {stats['misses']}  hit rate {stats['hit_rate']:.1%}  entries {stats['entries']}")
+
+
+if __name__ == "__main__":
+    main()
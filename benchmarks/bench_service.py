@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from src.data_loader import load_all_data
+
+# (label, --window-ms, --max-batch)
+SERVER_CONFIGS = [("unbatched", 0.0, 1), ("batched 2ms", 2.0, 256), ("batched 5ms", 5.0, 256)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def http_request(reader, writer, method, path, payload=None):
+    body = b"" if payload is None else json.dumps(payload).encode()
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def get_json(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        return (await http_request(reader, writer, "GET", path))[1]
+    finally:
+        writer.close()
+
+
+async def client(port, queries, deadline, latencies, errors):
+    # Closed loop over one keep-alive connection: the next request goes out as soon as the last one returns
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        index = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = await http_request(reader, writer, "POST", "/recommend", queries[index % len(queries)])
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+            index += 1
+    finally:
+        writer.close()
+
+
+async def load_test(port, queries, concurrency, duration):
+    before = await get_json(port, "/health")
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(port, queries[offset::concurrency], deadline, latencies, errors) for offset in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    after = await get_json(port, "/health")
+    latencies_ms = 1000 * np.array(latencies)
+    batches = after["batches"] - before["batches"]
+    return {
+        "requests_per_s": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_batch_size": (after["queries"] - before["queries"]) / max(batches, 1),
+        "errors": len(errors),
+    }
+
+
+async def wait_until_listening(port, process, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during start-up")
+        try:
+            return await get_json(port, "/health")
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError("server did not start listening")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local load test of serve.py: unbatched vs micro-batched")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per (server config, concurrency)")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Known users only, so every request is a 200 and the timing covers real scoring work
+    locations_df, _, users_df, _ = load_all_data()
+    rng = np.random.default_rng(args.seed)
+    queries = [
+        {"user_id": int(user_id), "category": str(category), "state": str(state), "top_n": 10}
+        for user_id, category, state in zip(
+            rng.choice(users_df["user_id"].unique(), size=args.queries),
+            rng.choice(locations_df["category"].dropna().unique(), size=args.queries),
+            rng.choice(locations_df["state"].dropna().unique(), size=args.queries),
+        )
+    ]
+
+    print(f"{'server':<13} {'clients':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'batch':>7} {'errors':>6}")
+    for label, window_ms, max_batch in SERVER_CONFIGS:
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, "serve.py", "--port", str(port), "--window-ms", str(window_ms), "--max-batch", str(max_batch)],
+            stdout=subprocess.DEVNULL
+        )
+        try:
+            asyncio.run(wait_until_listening(port, process))
+            for concurrency in args.concurrency:
+                result = asyncio.run(load_test(port, queries, concurrency, args.duration))
+                print(f"{label:<13} {concurrency:>7} {result['requests_per_s']:>9.1f} {result['p50_ms']:>8.2f} "
+                      f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['mean_batch_size']:>7.1f} "
+                      f"{result['errors']:>6}")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from src import config
+from src.snapshot import compile_snapshot
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from src.data_loader import load_csv_data
+from src.snapshot import load_snapshot
+imported = time.perf_counter()
+frames = load_snapshot(sys.argv[2]) if sys.argv[1] == "snapshot" else load_csv_data(sys.argv[2])
+rows = sum(len(df) for df in frames)
+print(json.dumps({"import_s": imported - start, "load_s": time.perf_counter() - imported, "rows": rows}))
+"""
+
+
+def run_child(mode, path):
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, mode, path], capture_output=True, text=True, check=True,
+        cwd=os.getcwd(), env={**os.environ, "PYTHONPATH": os.getcwd()}
+    ).stdout
+    result = json.loads(output)
+    result["process_s"] = time.perf_counter() - start
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process start-up: CSV parsing vs memory-mapped snapshot")
+    parser.add_argument("--data-dir", default=config.DATA_DIR)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_dir = os.path.join(tmp, "snapshot")
+        compile_snapshot(args.data_dir, snapshot_dir)
+        print(f"{'source':<9} {'load ms (p50)':>14} {'process ms (p50)':>17} {'rows':>10}")
+        for mode, path in (("csv", args.data_dir), ("snapshot", snapshot_dir)):
+            runs = [run_child(mode, path) for _ in range(args.runs)]
+            load_ms = np.median([run["load_s"] for run in runs]) * 1000
+            process_ms = np.median([run["process_s"] for run in runs]) * 1000
+            print(f"{mode:<9} {load_ms:>14.1f} {process_ms:>17.1f} {runs[0]['rows']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import argparse
+import os
+import time
+import tracemalloc
+
+from src.data_loader import load_all_data
+from src.collaborative_filtering import create_sparse_user_location_matrix
+from src.knn_graph import build_user_knn_graph
+
+
+# Offline job: precompute every user's top-k neighbours for get_top_k_similar_users(..., knn_graph=...)
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline user kNN graph from data/final/reviews.csv")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--block-size", type=int, default=1024)
+    parser.add_argument("--output", default="artifacts/user_knn_graph.npz")
+    args = parser.parse_args()
+
+    _, _, _, reviews_df = load_all_data()
+    interactions = create_sparse_user_location_matrix(reviews_df)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    graph = build_user_knn_graph(interactions, k=args.k, block_size=args.block_size)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    graph.save(args.output)
+    print(f"Built k={args.k} graph for {len(graph.user_ids)} users in {elapsed:.3f}s "
+          f"(block_size={args.block_size}, peak {peak / 1e6:.1f} MB) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,101 @@
+import argparse
+import json
+import os
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
-from collections import defaultdict
-from sklearn.model_selection import KFold
-from src.engine_wrapper import recommend_for_evaluation
+from src.evaluation import evaluate_kfold
 from src.data_loader import load_all_data
+from src.utils import data_fingerprint
 
-locations_df, trips_df, users_df, reviews_df = load_all_data()
-
-# Evaluation metrics
-def precision_at_k(recommended, relevant, k):
-    if not recommended:
-        return 0.0
-    return sum(1 for item in recommended[:k] if item in relevant) / k
-
-def recall_at_k(recommended, relevant, k):
-    if not relevant:
-        return 0.0
-    return sum(1 for item in recommended[:k] if item in relevant) / len(relevant)
-
-def ndcg_at_k(recommended, relevant, k):
-    dcg = sum(1 / np.log2(i + 2) for i, item in enumerate(recommended[:k]) if item in relevant)
-    idcg = sum(1 / np.log2(i + 2) for i in range(min(len(relevant), k)))
-    return dcg / idcg if idcg else 0.0
-
-def hit_rate_at_k(recommended, relevant, k):
-    return int(any(item in relevant for item in recommended[:k]))
 
 # Parameters
 k_values = [3, 4, 5]
 top_k_values = [5, 10, 15]
+cf_modes = ['user', 'item']
 metrics = ['precision', 'recall', 'ndcg', 'hit_rate']
-results = {}
-
-# Run evaluation
-for k_fold in k_values:
-    kf = KFold(n_splits=k_fold, shuffle=True, random_state=42)
-    for top_k in top_k_values:
-        scores = defaultdict(list)
-        for train_idx, test_idx in kf.split(reviews_df):
-            train = reviews_df.iloc[train_idx]
-            test = reviews_df.iloc[test_idx]
-
-            for user_id in test["user_id"].unique():
-                user_train = train[train["user_id"] == user_id]
-                user_test = test[test["user_id"] == user_id]
-
-                if user_train.empty or user_test.empty:
-                    continue
-
-                relevant = user_test["location_id"].tolist()
-                recs = recommend_for_evaluation(user_id, user_train, users_df, locations_df, trips_df, top_n=top_k)
-
-                if recs is None or recs.empty:
-                    continue
-
-                predicted = recs["location_id"].tolist()
-                scores["precision"].append(precision_at_k(predicted, relevant, top_k))
-                scores["recall"].append(recall_at_k(predicted, relevant, top_k))
-                scores["ndcg"].append(ndcg_at_k(predicted, relevant, top_k))
-                scores["hit_rate"].append(hit_rate_at_k(predicted, relevant, top_k))
-
-        results[(k_fold, top_k)] = {m: np.mean(scores[m]) for m in metrics}
-
-# 🎨 Plotting
-fig, axs = plt.subplots(2, 2, figsize=(14, 10))
-axs = axs.flatten()
-
-for idx, metric in enumerate(metrics):
-    ax = axs[idx]
-    for k in k_values:
-        y = [results[(k, tk)][metric] for tk in top_k_values]
-        ax.plot(top_k_values, y, marker='o', label=f"K={k}")
-    ax.set_title(f"{metric.upper()}@top_k")
-    ax.set_xlabel("top_k")
-    ax.set_ylabel(metric)
-    ax.legend()
-    ax.grid(True)
 
-plt.tight_layout()
-plt.savefig("real_evaluation_metrics_plot.png")
-plt.show()
+RESULTS_PATH = "artifacts/evaluation_results.json"
+
+def run_sweep(tables, workers=1):
+    # Each (cf_mode, K) is ranked once per user at max(top_k_values); every smaller top_k is a prefix of that ranking
+    locations_df, trips_df, users_df, reviews_df = tables
+    rows = []
+    for cf_mode, k_fold in [(mode, k) for mode in cf_modes for k in k_values]:
+        scores, timings = evaluate_kfold(
+            locations_df, trips_df, users_df, reviews_df,
+            n_splits=k_fold, cutoffs=top_k_values, cf_mode=cf_mode, workers=workers
+        )
+        for top_k in top_k_values:
+            row = {"cf_mode": cf_mode, "K": k_fold, "top_k": top_k}
+            row.update({m: float(np.mean(scores[f"{m}@{top_k}"])) for m in metrics})
+            row["fit_ms"] = 1000 * float(np.mean(timings["fit_seconds"]))
+            row["query_ms"] = 1000 * float(np.mean(timings["query_seconds"]))
+            rows.append(row)
+    return rows
+
+def sweep_params(tables):
+    return {"k_values": k_values, "top_k_values": top_k_values, "cf_modes": cf_modes, "metrics": metrics,
+            "data": data_fingerprint(tables)}
+
+def load_results(path, params):
+    # Cached sweep, or None when missing or computed with different sweep parameters or data
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cached["rows"] if cached.get("params") == params else None
+
+def save_results(rows, path, params):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"params": params, "rows": rows}, f, indent=2)
+
+def plot_results(rows):
+    results = {(row["cf_mode"], row["K"], row["top_k"]): row for row in rows}
+
+    # User-user vs item-item CF, side by side
+    summary = pd.DataFrame(rows).set_index(["cf_mode", "K", "top_k"])
+    print(summary.unstack("cf_mode").round(4).to_string())
+
+    # 🎨 Plotting
+    fig, axs = plt.subplots(2, 2, figsize=(14, 10))
+    axs = axs.flatten()
+
+    for idx, metric in enumerate(metrics):
+        ax = axs[idx]
+        for cf_mode, linestyle in zip(cf_modes, ['-', '--']):
+            for k in k_values:
+                y = [results[(cf_mode, k, tk)][metric] for tk in top_k_values]
+                ax.plot(top_k_values, y, marker='o', linestyle=linestyle, label=f"K={k} ({cf_mode} CF)")
+        ax.set_title(f"{metric.upper()}@top_k")
+        ax.set_xlabel("top_k")
+        ax.set_ylabel(metric)
+        ax.legend()
+        ax.grid(True)
+
+    plt.tight_layout()
+    plt.savefig("real_evaluation_metrics_plot.png")
+    plt.show()
+
+def main():
+    parser = argparse.ArgumentParser(description="K-fold sweep over folds, top_k and CF mode, plotted")
+    parser.add_argument("--workers", type=int, default=1, help="Processes sharing the fold x user work")
+    parser.add_argument("--results", default=RESULTS_PATH, help="Cached sweep results the plot is drawn from")
+    parser.add_argument("--recompute", action="store_true", help="Re-run the sweep even if cached results match")
+    args = parser.parse_args()
+
+    tables = load_all_data()
+    params = sweep_params(tables)
+    rows = None if args.recompute else load_results(args.results, params)
+    if rows is None:
+        rows = run_sweep(tables, workers=args.workers)
+        save_results(rows, args.results, params)
+        print(f"Sweep results written to {args.results}")
+    else:
+        print(f"Plotting cached sweep results from {args.results} (--recompute to re-run)")
+    plot_results(rows)
+
+if __name__ == "__main__":
+    main()
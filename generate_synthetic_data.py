@@ -0,0 +1,29 @@
+import argparse
+import time
+
+from src.synthetic_data import generate_dataset, write_dataset
+
+
+# Writes users/locations/reviews/trips CSVs in the data/final schemas at any size, for scaling benchmarks
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic dataset")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--locations", type=int, default=1000)
+    parser.add_argument("--reviews", type=int, default=50000)
+    parser.add_argument("--trips", type=int, default=None, help="Defaults to one trip per user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default=None, help="Defaults to data/synthetic/<users>u_<reviews>r_s<seed>")
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or f"data/synthetic/{args.users}u_{args.reviews}r_s{args.seed}"
+    start = time.perf_counter()
+    tables = generate_dataset(args.users, args.locations, args.reviews, args.trips, seed=args.seed)
+    rows = write_dataset(output_dir, *tables)
+    elapsed = time.perf_counter() - start
+    for table, count in rows.items():
+        print(f"{table:<10} {count:>9} rows")
+    print(f"Synthetic data written to {output_dir} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,69 @@
-import src.data_loader as dl
-import src.feature_engineering as fe
-import src.content_filtering as cb
-import src.collaborative_filtering as cf
-import src.utils as ut
-import src.hybrid as hy
+import argparse
+import hashlib
+import itertools
+import time
+
+from src import config
+from src.data_loader import load_all_data
+from src.engine import RecommenderEngine
+from src.matrix_factorization import load_als_model
+from src.topn_table import TopNTable, location_contexts, precompute_topn_table
+from src.utils import data_fingerprint
+
+
+# Offline job: every user's top-N for every (category, state) query, written to the memory-mapped table that
+# TopNTable serves from. Rerunning resumes an interrupted run and rewrites only the shards whose rankings changed.
+def main():
+    parser = argparse.ArgumentParser(description="Precompute every user's top-N recommendations into a serving table")
+    parser.add_argument("--output", default=config.TOPN_TABLE_DIR)
+    parser.add_argument("--top-n", type=int, default=config.TOP_K)
+    parser.add_argument("--shard-users", type=int, default=config.TOPN_SHARD_USERS)
+    parser.add_argument("--category", nargs="+", default=None,
+                        help="Categories to precompute (crossed with --state); default: every (category, state) "
+                             "pair some location has")
+    parser.add_argument("--state", nargs="+", default=None)
+    parser.add_argument("--cf-mode", choices=["user", "item", "als"], default=None)
+    parser.add_argument("--als-model", default=config.ALS_MODEL_PATH,
+                        help="Factors from train_als_model.py for the als mode; trained at start-up when missing")
+    parser.add_argument("--data-dir", default=None)
+    args = parser.parse_args()
+
+    tables = load_all_data(args.data_dir)
+    locations_df = tables[0]
+    if args.category or args.state:
+        contexts = list(itertools.product(
+            args.category or locations_df["category"].dropna().unique().tolist(),
+            args.state or locations_df["state"].dropna().unique().tolist()
+        ))
+    else:
+        contexts = location_contexts(locations_df)
+
+    start = time.perf_counter()
+    als_model = load_als_model(args.als_model, tables[3]) if (args.cf_mode or config.CF_MODE) == "als" else None
+    engine = RecommenderEngine(cf_mode=args.cf_mode, als_model=als_model).fit(*tables)
+    print(f"Engine fitted in {time.perf_counter() - start:.2f}s"
+          + (f" with ALS factors from {args.als_model}" if als_model is not None else ""), flush=True)
+    fingerprint = data_fingerprint(
+        tables, cf_mode=engine.cf_mode, content_pool=engine.content_pool, num_neighbors=engine.num_neighbors,
+        weight_content=engine.weight_content, weight_collab=engine.weight_collab, item_neighbors=config.ITEM_NEIGHBORS,
+        # Saved or freshly trained, the factors themselves decide the als rankings
+        als=engine.als_model is not None and hashlib.sha256(
+            engine.als_model.user_factors.tobytes() + engine.als_model.item_factors.tobytes()
+        ).hexdigest(),
+        content_table=engine.content_table is not None and str(engine.content_table.scores.dtype)
+    )
+
+    start = time.perf_counter()
+    summary = precompute_topn_table(
+        engine, args.output, contexts, fingerprint, top_n=args.top_n, shard_users=args.shard_users,
+        progress=lambda done, total: print(f"  shard {done}/{total}", flush=True)
+    )
+    elapsed = time.perf_counter() - start
+    table = TopNTable(args.output)
+    print(f"{len(table.user_ids)} users x {len(table.contexts)} (category, state) contexts, top {table.top_n}: "
+          f"{summary['written']} shard(s) written, {summary['unchanged']} unchanged, {summary['resumed']} resumed "
+          f"in {elapsed:.2f}s -> {args.output}")
+
 
 if __name__ == "__main__":
-    travel_category = "Adventure"
-    preferred_state = "Himachal Pradesh"
-    trip_budget = 40000
-    target_user_id = 30
-    top_k = 10
-
-    # Load data
-    locations_df, trips_df, users_df, reviews_df = dl.load_all_data()
-
-    # Feature engineering
-    tfidf_matrix, tfidf = fe.prepare_location_features(locations_df)
-    user_vector = cb.create_user_preference_vector(travel_category, preferred_state, tfidf)
-    content_recs = cb.get_content_based_recommendations(user_vector, tfidf_matrix, locations_df, top_n=50)
-
-    # Collaborative filtering
-    interaction_matrix = cf.create_user_location_matrix(reviews_df)
-    similar_users = cf.get_top_k_similar_users(interaction_matrix, target_user_id, k=5)
-    collab_scores = cf.predict_ratings_for_user(interaction_matrix, similar_users, target_user_id)
-
-    # Budget filtering
-    location_costs = ut.estimate_location_cost(reviews_df, trips_df)
-    filtered = ut.apply_budget_filter(content_recs, location_costs, trip_budget)
-
-    # Combine scores
-    final_recommendations = hy.combine_scores(filtered, collab_scores, weight_content=0.6, weight_collab=0.4)
-
-    # Show output
-    print(final_recommendations[["location_id", "hybrid_score"]].head(top_k))
\ No newline at end of file
+    main()
@@ -1,78 +1,63 @@
 
+import argparse
+import time
 import pandas as pd
 import numpy as np
-from collections import defaultdict
-from sklearn.model_selection import KFold
 from src.data_loader import load_all_data
-from src.engine_wrapper import recommend_for_evaluation
+from src.evaluation import evaluate_kfold
 
-# Evaluation metrics
-def precision_at_k(recommended, relevant, k):
-    if not recommended:
-        return 0.0
-    recommended_k = recommended[:k]
-    relevant_set = set(relevant)
-    hits = sum(1 for item in recommended_k if item in relevant_set)
-    return hits / k
+TIMING_KEYS = ("fit_ms", "query_ms")
 
-def recall_at_k(recommended, relevant, k):
-    if not relevant:
-        return 0.0
-    recommended_k = recommended[:k]
-    relevant_set = set(relevant)
-    hits = sum(1 for item in recommended_k if item in relevant_set)
-    return hits / len(relevant_set)
-
-def ndcg_at_k(recommended, relevant, k):
-    dcg = 0.0
-    for i, item in enumerate(recommended[:k]):
-        if item in relevant:
-            dcg += 1 / np.log2(i + 2)
-    idcg = sum(1 / np.log2(i + 2) for i in range(min(len(relevant), k)))
-    return dcg / idcg if idcg != 0 else 0.0
-
-def hit_rate_at_k(recommended, relevant, k):
-    return int(any(item in relevant for item in recommended[:k]))
-
-# Main evaluation with K-Fold CV
-def run_kfold_evaluation(k=5, top_k=10):
+# Main evaluation with K-Fold CV; fold x user work is spread over `workers` processes
+def run_kfold_evaluation(k=5, top_k=10, cf_mode=None, workers=1, seed=42):
     locations_df, trips_df, users_df, reviews_df = load_all_data()
 
-    kf = KFold(n_splits=k, shuffle=True, random_state=42)
-    metrics = defaultdict(list)
-
-    fold = 1
-    for train_idx, test_idx in kf.split(reviews_df):
-        print(f"Evaluating Fold {fold}...")
-        train_reviews = reviews_df.iloc[train_idx]
-        test_reviews = reviews_df.iloc[test_idx]
-        test_users = test_reviews["user_id"].unique()
-
-        for user_id in test_users:
-            user_test = test_reviews[test_reviews["user_id"] == user_id]
-            user_train = train_reviews[train_reviews["user_id"] == user_id]
-
-            if user_test.empty or user_train.empty:
-                continue
-
-            relevant_locs = user_test["location_id"].tolist()
-            recs = recommend_for_evaluation(user_id, user_train, users_df, locations_df, trips_df, top_n=top_k)
-
-            if recs is None or recs.empty:
-                continue
-
-            predicted_locs = recs["location_id"].tolist()
-
-            metrics["precision"].append(precision_at_k(predicted_locs, relevant_locs, top_k))
-            metrics["recall"].append(recall_at_k(predicted_locs, relevant_locs, top_k))
-            metrics["ndcg"].append(ndcg_at_k(predicted_locs, relevant_locs, top_k))
-            metrics["hit_rate"].append(hit_rate_at_k(predicted_locs, relevant_locs, top_k))
-
-        fold += 1
-
-    print("\n=== Final K-Fold Evaluation Results ===")
-    for metric, scores in metrics.items():
-        print(f"{metric}@{top_k}: {np.mean(scores):.4f}")
+    print(f"Evaluating {k} folds on {workers} worker(s)...")
+    scores, timings = evaluate_kfold(
+        locations_df, trips_df, users_df, reviews_df,
+        n_splits=k, top_k=top_k, cf_mode=cf_mode, workers=workers, seed=seed
+    )
+
+    print(f"\n=== Final K-Fold Evaluation Results (cf_mode={cf_mode or 'config'}) ===")
+    results = {metric: np.mean(values) for metric, values in scores.items()}
+    # Fit once per fold, then query per user
+    results["fit_ms"] = 1000 * np.mean(timings["fit_seconds"])
+    results["query_ms"] = 1000 * np.mean(timings["query_seconds"]) if timings["query_seconds"] else float("nan")
+    for name, value in results.items():
+        print(f"{name}: {value:.4f}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="K-fold evaluation of the hybrid recommender")
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1],
+                        help="Worker counts to run; several values also report the speed-up over the first")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # User-user, item-item and matrix-factorisation collaborative filtering, side by side
+    comparison, timings = {}, {}
+    for cf_mode in ("user", "item", "als"):
+        for workers in args.workers:
+            start = time.perf_counter()
+            results = run_kfold_evaluation(k=args.folds, top_k=args.top_k, cf_mode=cf_mode, workers=workers, seed=args.seed)
+            timings[(cf_mode, workers)] = time.perf_counter() - start
+            metrics = {name: value for name, value in results.items() if name not in TIMING_KEYS}
+            if cf_mode in comparison and metrics != {n: v for n, v in comparison[cf_mode].items() if n not in TIMING_KEYS}:
+                raise AssertionError(f"Metrics with {workers} workers differ from the {args.workers[0]}-worker run")
+            comparison.setdefault(cf_mode, results)
+
+    print("\n=== CF mode comparison ===")
+    print(pd.DataFrame(comparison).round(4))
+
+    if len(args.workers) > 1:
+        print("\n=== Speed-up per worker count (metrics bit-identical across runs) ===")
+        for cf_mode in comparison:
+            baseline = timings[(cf_mode, args.workers[0])]
+            for workers in args.workers:
+                seconds = timings[(cf_mode, workers)]
+                print(f"{cf_mode:>5} CF  workers={workers:<3} {seconds:8.2f} s  speed-up {baseline / seconds:5.2f}x")
 
 if __name__ == "__main__":
-    run_kfold_evaluation(k=3, top_k=5)
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import asyncio
+import time
+
+from src import config
+from src.data_loader import load_all_data
+from src.engine import RecommenderEngine
+from src.ingestion import EventIngestor
+from src.matrix_factorization import load_als_model
+from src.service import RecommendationService, serve
+
+
+# Standalone JSON recommendation service: POST /recommend, POST /recommend/batch, GET /health, GET /metrics
+def main():
+    parser = argparse.ArgumentParser(description="Serve recommendations over HTTP with micro-batching")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--window-ms", type=float, default=2.0,
+                        help="How long the first waiting request holds its batch open for others")
+    parser.add_argument("--max-batch", type=int, default=256, help="1 scores every request on its own")
+    parser.add_argument("--cf-mode", choices=["user", "item", "als"], default=None)
+    parser.add_argument("--als-model", default=config.ALS_MODEL_PATH,
+                        help="Factors from train_als_model.py for the als mode; trained at start-up when missing")
+    parser.add_argument("--data-dir", default=None)
+    parser.add_argument("--events", default=None,
+                        help=f"JSONL review/trip/user events to tail into the engine (e.g. {config.EVENTS_PATH})")
+    parser.add_argument("--checkpoint-dir", default=config.INGEST_CHECKPOINT_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tables = load_all_data(args.data_dir)
+    als_model = load_als_model(args.als_model, tables[3]) if (args.cf_mode or config.CF_MODE) == "als" else None
+    engine = RecommenderEngine(cf_mode=args.cf_mode, als_model=als_model).fit(*tables)
+    print(f"Engine fitted in {time.perf_counter() - start:.2f}s"
+          + (f" with ALS factors from {args.als_model}" if als_model is not None else ""), flush=True)
+    ingestor = None
+    if args.events:
+        ingestor = EventIngestor(engine, args.events, args.checkpoint_dir)
+        replayed = ingestor.recover()
+        print(f"Replayed {replayed} committed event(s); tailing {args.events} from byte {ingestor.offset}", flush=True)
+    service = RecommendationService(engine, window=args.window_ms / 1000, max_batch=args.max_batch, ingestor=ingestor)
+    print(f"Serving on http://{args.host}:{args.port} (window {args.window_ms} ms, max batch {args.max_batch})",
+          flush=True)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
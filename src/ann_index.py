@@ -0,0 +1,164 @@
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, vstack
+from sklearn.preprocessing import normalize
+
+from src.collaborative_filtering import get_top_k_similar_users
+
+
+class RandomProjectionLSH:
+    # Cosine LSH: each table hashes a vector to the sign pattern of num_bits random projections.
+    # More tables / more probes -> higher recall; more bits -> smaller buckets and faster queries.
+
+    def __init__(self, num_features, num_tables=8, num_bits=8, num_probes=2, seed=42):
+        self.num_features = num_features
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.num_probes = min(num_probes, num_bits)
+        self._rng = np.random.default_rng(seed)
+        self.planes = self._rng.standard_normal((num_features, num_tables * num_bits)).astype(np.float32)
+        self.bit_weights = (1 << np.arange(num_bits)).astype(np.int64)
+        self.tables = [{} for _ in range(num_tables)]
+        self.user_ids = []
+        self.user_index = {}
+        self._row_codes = []
+        self._blocks = []
+        self._matrix = csr_matrix((0, num_features))
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def __contains__(self, user_id):
+        return user_id in self.user_index
+
+    @classmethod
+    def from_interactions(cls, interactions, **params):
+        index = cls(interactions.shape[1], **params)
+        index.add(interactions.user_ids, interactions.normalized)
+        return index
+
+    def _ensure_features(self, num_features):
+        # New locations widen the vectors; old vectors are zero there, so their codes stay valid
+        if num_features <= self.num_features:
+            return
+        extra = self._rng.standard_normal((num_features - self.num_features, self.planes.shape[1]))
+        self.planes = np.vstack([self.planes, extra.astype(np.float32)])
+        matrix = self.matrix
+        matrix.resize((matrix.shape[0], num_features))
+        self.num_features = num_features
+
+    def _prepare(self, vectors):
+        vectors = normalize(csr_matrix(vectors), norm="l2", axis=1)
+        self._ensure_features(vectors.shape[1])
+        if vectors.shape[1] < self.num_features:
+            vectors.resize((vectors.shape[0], self.num_features))
+        return vectors
+
+    def _project(self, vectors):
+        projections = np.asarray(vectors @ self.planes)
+        return projections.reshape(-1, self.num_tables, self.num_bits)
+
+    def _codes(self, projections):
+        return (projections > 0).astype(np.int64) @ self.bit_weights
+
+    def add(self, user_ids, vectors):
+        # Inserted users become queryable immediately; buckets are appended to, never rebuilt
+        vectors = self._prepare(vectors)
+        codes = self._codes(self._project(vectors))
+        for offset, user_id in enumerate(user_ids):
+            if user_id in self.user_index:
+                raise ValueError(f"User {user_id} is already indexed")
+            row = len(self.user_ids)
+            self.user_ids.append(user_id)
+            self.user_index[user_id] = row
+            self._row_codes.append(codes[offset].tolist())
+            for table, code in zip(self.tables, self._row_codes[row]):
+                table.setdefault(code, []).append(row)
+        self._blocks.append(vectors)
+
+    def update(self, user_ids, vectors):
+        # Re-hash users whose interaction vectors changed; unknown users are inserted
+        vectors = self._prepare(vectors)
+        known = [offset for offset, user_id in enumerate(user_ids) if user_id in self.user_index]
+        new = [offset for offset, user_id in enumerate(user_ids) if user_id not in self.user_index]
+        if known:
+            rows = [self.user_index[user_ids[offset]] for offset in known]
+            codes = self._codes(self._project(vectors[known]))
+            for row, row_codes in zip(rows, codes.tolist()):
+                for table, old_code, new_code in zip(self.tables, self._row_codes[row], row_codes):
+                    table[old_code].remove(row)
+                    table.setdefault(new_code, []).append(row)
+                self._row_codes[row] = row_codes
+            matrix = self.matrix
+            replacement = np.arange(matrix.shape[0])
+            replacement[rows] = matrix.shape[0] + np.arange(len(rows))
+            self._matrix = vstack([matrix, vectors[known]], format="csr")[replacement]
+        if new:
+            self.add([user_ids[offset] for offset in new], vectors[new])
+
+    @property
+    def matrix(self):
+        if self._blocks:
+            self._matrix = vstack([self._matrix] + self._blocks, format="csr")
+            self._blocks = []
+        return self._matrix
+
+    def _candidate_rows(self, vector):
+        projections = self._project(vector)[0]
+        codes = self._codes(projections)
+        rows = []
+        for table_idx, (table, code) in enumerate(zip(self.tables, codes.tolist())):
+            rows.extend(table.get(code, ()))
+            # Multi-probe: also visit the buckets reached by flipping the least confident bits
+            for bit in np.argsort(np.abs(projections[table_idx]))[:self.num_probes].tolist():
+                rows.extend(table.get(code ^ (1 << bit), ()))
+        return np.unique(np.asarray(rows, dtype=np.int64))
+
+    def query(self, vector, k=5, exclude_user_id=None):
+        vector = self._prepare(vector)
+        rows = self._candidate_rows(vector)
+        if exclude_user_id is not None and exclude_user_id in self.user_index:
+            rows = rows[rows != self.user_index[exclude_user_id]]
+        similarities = (self.matrix[rows] @ vector.T).toarray().ravel()
+        order = np.lexsort((rows, -similarities))[:k]
+        return pd.Series(
+            similarities[order],
+            index=pd.Index([self.user_ids[row] for row in rows[order].tolist()], name="user_id")
+        )
+
+    def query_user(self, user_id, k=5):
+        row = self.user_index.get(user_id)
+        if row is None:
+            return None
+        return self.query(self.matrix[row], k=k, exclude_user_id=user_id)
+
+
+def evaluate_ann_index(index, interactions, user_ids, k=5):
+    # recall@k of the approximate neighbours against the exact sparse scan, plus the per-query speed-up
+    exact_seconds = ann_seconds = 0.0
+    hits = total = 0
+    for user_id in user_ids:
+        start = time.perf_counter()
+        exact = get_top_k_similar_users(interactions, user_id, k=k)
+        exact_seconds += time.perf_counter() - start
+        if exact is None or exact.empty:
+            continue
+
+        start = time.perf_counter()
+        approx = index.query_user(user_id, k=k)
+        ann_seconds += time.perf_counter() - start
+
+        # Score by similarity value so ties among equally similar users are not counted as misses
+        threshold = exact.iloc[-1] - 1e-9
+        hits += min(int((approx >= threshold).sum()), len(exact))
+        total += len(exact)
+
+    num_queries = max(len(user_ids), 1)
+    return {
+        "recall_at_k": hits / total if total else 0.0,
+        "exact_ms_per_query": exact_seconds * 1000 / num_queries,
+        "ann_ms_per_query": ann_seconds * 1000 / num_queries,
+        "speedup": exact_seconds / ann_seconds if ann_seconds else float("inf"),
+    }
@@ -1,7 +1,54 @@
+import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 
-def create_user_location_matrix(reviews_df, users_df=None):
+from src import config
+from src.utils import top_n_indices
+from src.instrumentation import instrumented
+
+
+class SparseInteractionMatrix:
+    # CSR user x location ratings plus the id <-> row/column maps the dense pivot carried in its index/columns
+
+    def __init__(self, matrix, user_ids, location_ids, rating_sums=None, rating_counts=None):
+        self.matrix = csr_matrix(matrix)
+        self.user_ids = np.asarray(user_ids)
+        self.location_ids = np.asarray(location_ids)
+        # Per-cell sum and count of ratings, so repeated reviews can be folded in incrementally
+        self.rating_sums = self.matrix.copy() if rating_sums is None else csr_matrix(rating_sums)
+        if rating_counts is None:
+            rating_counts = self.matrix.copy()
+            rating_counts.data = np.ones_like(rating_counts.data)
+        self.rating_counts = csr_matrix(rating_counts)
+        self.user_index = {user_id: row for row, user_id in enumerate(self.user_ids.tolist())}
+        self.location_index = {location_id: col for col, location_id in enumerate(self.location_ids.tolist())}
+        # Row-normalised copy so cosine similarity is a single sparse dot product
+        self.normalized = normalize(self.matrix, norm="l2", axis=1)
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def __contains__(self, user_id):
+        return user_id in self.user_index
+
+    def to_dense(self):
+        return pd.DataFrame(
+            self.matrix.toarray(),
+            index=pd.Index(self.user_ids, name="user_id"),
+            columns=pd.Index(self.location_ids, name="location_id")
+        )
+
+
+@instrumented("create_user_location_matrix")
+def create_user_location_matrix(reviews_df, users_df=None, backend=None):
+    backend = backend or config.INTERACTION_BACKEND
+    if backend == "sparse":
+        return create_sparse_user_location_matrix(reviews_df)
+    if backend != "dense":
+        raise ValueError(f"Unknown interaction backend: {backend!r}")
     interaction_matrix = reviews_df.pivot_table(
         index='user_id',
         columns='location_id',
@@ -10,22 +57,182 @@ def create_user_location_matrix(reviews_df, users_df=None):
     return interaction_matrix
 
 
-def get_top_k_similar_users(interaction_matrix, target_user_id, k=5):
+def create_sparse_user_location_matrix(reviews_df):
+    # Same aggregation as pivot_table (mean of repeated ratings), without materialising users x locations
+    ratings = reviews_df.groupby(['user_id', 'location_id'])['rating'].agg(['mean', 'sum', 'count'])
+    ratings = ratings[ratings['count'] > 0]
+    ratings.index = ratings.index.remove_unused_levels()
+    user_codes, location_codes = ratings.index.codes
+    user_ids, location_ids = ratings.index.levels
+    shape = (len(user_ids), len(location_ids))
+    matrix, rating_sums, rating_counts = (
+        csr_matrix((ratings[column].to_numpy(dtype=float), (user_codes, location_codes)), shape=shape)
+        for column in ('mean', 'sum', 'count')
+    )
+    return SparseInteractionMatrix(matrix, user_ids.to_numpy(), location_ids.to_numpy(), rating_sums, rating_counts)
+
+
+@instrumented("update_user_location_matrix")
+def update_user_location_matrix(interactions, new_reviews_df):
+    # Folds new reviews into the per-cell sums/counts. Existing users and locations keep their rows/columns;
+    # unseen ones are appended. Returns the updated matrix and the user_ids whose rows changed.
+    new_ratings = new_reviews_df.dropna(subset=['rating']).groupby(['user_id', 'location_id'])['rating'].agg(['sum', 'count'])
+    if new_ratings.empty:
+        return interactions, []
+    user_ids, location_ids = list(interactions.user_ids), list(interactions.location_ids)
+    user_index, location_index = dict(interactions.user_index), dict(interactions.location_index)
+    for user_id in new_ratings.index.unique(level='user_id').tolist():
+        if user_id not in user_index:
+            user_index[user_id] = len(user_ids)
+            user_ids.append(user_id)
+    for location_id in new_ratings.index.unique(level='location_id').tolist():
+        if location_id not in location_index:
+            location_index[location_id] = len(location_ids)
+            location_ids.append(location_id)
+
+    shape = (len(user_ids), len(location_ids))
+    rows = np.array([user_index[user_id] for user_id in new_ratings.index.get_level_values('user_id').tolist()])
+    cols = np.array([location_index[loc] for loc in new_ratings.index.get_level_values('location_id').tolist()])
+    rating_sums = _resize(interactions.rating_sums, shape) + csr_matrix(
+        (new_ratings['sum'].to_numpy(dtype=float), (rows, cols)), shape=shape
+    )
+    rating_counts = _resize(interactions.rating_counts, shape) + csr_matrix(
+        (new_ratings['count'].to_numpy(dtype=float), (rows, cols)), shape=shape
+    )
+    reciprocal_counts = rating_counts.copy()
+    reciprocal_counts.data = 1.0 / reciprocal_counts.data
+    matrix = csr_matrix(rating_sums.multiply(reciprocal_counts))
+
+    updated = SparseInteractionMatrix(matrix, np.array(user_ids), np.array(location_ids), rating_sums, rating_counts)
+    changed_users = new_ratings.index.unique(level='user_id').tolist()
+    return updated, changed_users
+
+
+def _resize(matrix, shape):
+    matrix = matrix.tocsr(copy=True)
+    matrix.resize(shape)
+    return matrix
+
+
+@instrumented("get_top_k_similar_users")
+def get_top_k_similar_users(interaction_matrix, target_user_id, k=5, knn_graph=None, ann_index=None):
+    # A precomputed UserKNNGraph answers in O(k) and an ANN index in sub-linear time;
+    # users missing from either fall back to the full scan
+    if knn_graph is not None and target_user_id in knn_graph:
+        return knn_graph.neighbors(target_user_id).head(k)
+    if ann_index is not None and target_user_id in ann_index:
+        return ann_index.query_user(target_user_id, k=k)
+    if isinstance(interaction_matrix, SparseInteractionMatrix):
+        return _get_top_k_similar_users_sparse(interaction_matrix, target_user_id, k)
     if target_user_id not in interaction_matrix.index:
         return None
     user_vector = interaction_matrix.loc[[target_user_id]]
-    similarity_matrix = cosine_similarity(user_vector, interaction_matrix)[0]
-    similarity_series = pd.Series(similarity_matrix, index=interaction_matrix.index)
-    similarity_series = similarity_series.drop(target_user_id).sort_values(ascending=False).head(k)
-    return similarity_series
+    similarities = cosine_similarity(user_vector, interaction_matrix)[0]
+    return _top_k_series(similarities, interaction_matrix.index, interaction_matrix.index.get_loc(target_user_id), k)
+
+
+def _get_top_k_similar_users_sparse(interactions, target_user_id, k):
+    row = interactions.user_index.get(target_user_id)
+    if row is None:
+        return None
+    normalized = interactions.normalized
+    similarities = (normalized @ normalized[row].T).toarray().ravel()
+    return _top_k_series(similarities, pd.Index(interactions.user_ids, name="user_id"), row, k)
 
+
+def _top_k_series(similarities, user_index, target_row, k):
+    # Top k excluding the target itself; ties go to the lower user_id (rows appended by updates are not in id order)
+    others = np.delete(np.arange(len(similarities)), target_row)
+    top = others[top_n_indices(similarities[others], k, tiebreak=np.asarray(user_index)[others])]
+    return pd.Series(similarities[top], index=user_index[top])
+
+
+@instrumented("predict_ratings_for_user")
 def predict_ratings_for_user(interaction_matrix, similar_users, target_user_id):
     if similar_users is None:
         return pd.Series(dtype=float)
+    if isinstance(interaction_matrix, SparseInteractionMatrix):
+        return _predict_ratings_for_user_sparse(interaction_matrix, similar_users, target_user_id)
     neighbors_matrix = interaction_matrix.loc[similar_users.index]
     user_ratings = interaction_matrix.loc[target_user_id]
     weighted_ratings = neighbors_matrix.T.dot(similar_users)
     normalization = similar_users.sum()
     prediction_scores = weighted_ratings / normalization
     unseen_locations = user_ratings[user_ratings == 0].index
-    return prediction_scores[unseen_locations].sort_values(ascending=False)
\ No newline at end of file
+    return prediction_scores[unseen_locations].sort_values(ascending=False)
+
+
+def predict_rating_array(interactions, similar_users, target_user_id):
+    # Array form of predict_ratings_for_user on a SparseInteractionMatrix: predicted score per column
+    # (interactions.location_ids order) and the mask of columns the user has not rated
+    neighbor_rows = [interactions.user_index[user_id] for user_id in similar_users.index]
+    weights = similar_users.to_numpy(dtype=float)
+    weighted_ratings = interactions.matrix[neighbor_rows].T @ weights
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prediction_scores = weighted_ratings / weights.sum()
+    user_ratings = interactions.matrix[interactions.user_index[target_user_id]].toarray().ravel()
+    return prediction_scores, user_ratings == 0
+
+
+def _predict_ratings_for_user_sparse(interactions, similar_users, target_user_id):
+    prediction_scores, unseen = predict_rating_array(interactions, similar_users, target_user_id)
+    prediction_scores = pd.Series(
+        prediction_scores[unseen], index=pd.Index(interactions.location_ids[unseen], name="location_id")
+    )
+    return prediction_scores.sort_values(ascending=False)
+
+
+def _as_sparse_interactions(interaction_matrix):
+    if isinstance(interaction_matrix, SparseInteractionMatrix):
+        return interaction_matrix
+    return SparseInteractionMatrix(
+        interaction_matrix.to_numpy(dtype=float), interaction_matrix.index, interaction_matrix.columns
+    )
+
+
+@instrumented("build_item_similarity")
+def build_item_similarity(interaction_matrix, num_neighbors=20):
+    # Location x location cosine similarity, truncated to each location's top-m neighbours (CSR, zero diagonal)
+    interactions = _as_sparse_interactions(interaction_matrix)
+    columns = normalize(interactions.matrix, norm="l2", axis=0)
+    similarity = (columns.T @ columns).toarray()
+    np.fill_diagonal(similarity, 0.0)
+
+    num_locations = similarity.shape[0]
+    m = min(num_neighbors, max(num_locations - 1, 0))
+    if m == 0:
+        return csr_matrix((num_locations, num_locations))
+    neighbor_cols = np.argpartition(-similarity, m - 1, axis=1)[:, :m]
+    rows = np.repeat(np.arange(num_locations), m)
+    weights = np.take_along_axis(similarity, neighbor_cols, axis=1).ravel()
+    item_similarity = csr_matrix((weights, (rows, neighbor_cols.ravel())), shape=similarity.shape)
+    item_similarity.eliminate_zeros()
+    return item_similarity
+
+
+def predict_item_based_rating_array(interactions, item_similarity, target_user_id):
+    # Array form of predict_item_based_ratings: (scores per column, unseen mask), or None for an unknown user
+    row = interactions.user_index.get(target_user_id)
+    if row is None:
+        return None
+    user_ratings = interactions.matrix[row].toarray().ravel()
+    weighted_ratings = item_similarity @ user_ratings
+    normalization = item_similarity @ (user_ratings > 0).astype(float)
+    prediction_scores = np.divide(
+        weighted_ratings, normalization, out=np.zeros_like(weighted_ratings), where=normalization > 0
+    )
+    return prediction_scores, user_ratings == 0
+
+
+@instrumented("predict_item_based_ratings")
+def predict_item_based_ratings(interaction_matrix, item_similarity, target_user_id):
+    # Score each unseen location by the similarity-weighted mean of the user's ratings on its neighbours
+    interactions = _as_sparse_interactions(interaction_matrix)
+    predictions = predict_item_based_rating_array(interactions, item_similarity, target_user_id)
+    if predictions is None:
+        return pd.Series(dtype=float)
+    prediction_scores, unseen = predictions
+    prediction_scores = pd.Series(
+        prediction_scores[unseen], index=pd.Index(interactions.location_ids[unseen], name="location_id")
+    )
+    return prediction_scores.sort_values(ascending=False)
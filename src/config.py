@@ -7,4 +7,44 @@ WEIGHT_COLLAB = 0.4
 TOP_K = 10  # for Precision@K, Recall@K, etc.
 
 # Budget filtering
-DEFAULT_TRIP_BUDGET = 10000
\ No newline at end of file
+DEFAULT_TRIP_BUDGET = 10000
+
+# Collaborative filtering
+INTERACTION_BACKEND = "sparse"  # "sparse" (CSR) or "dense" (pandas pivot_table)
+CF_MODE = "user"  # "user" (user-user neighbourhood), "item" (item-item similarity) or "als" (matrix factorisation)
+ITEM_NEIGHBORS = 20  # top-m similar locations kept per location in "item" mode
+ALS_RANK = 32  # latent factors per user/location in "als" mode
+ALS_REGULARIZATION = 0.1  # L2 penalty, scaled by each user's/location's rating count
+ALS_ITERATIONS = 15  # alternating user/location solves
+ALS_MODEL_PATH = "artifacts/als_model.npz"  # written by train_als_model.py
+
+# Data locations
+DATA_DIR = "data/final"
+SNAPSHOT_DIR = "data/snapshot"  # compiled by compile_data_snapshot.py; "" disables the snapshot path
+FEATURE_CACHE_DIR = "artifacts/features"  # fitted TF-IDF artifacts keyed by location-data hash; "" disables
+
+# Per-stage instrumentation (src/instrumentation.py); both can also be switched on at runtime with enable()
+INSTRUMENT_STAGES = False  # wall/CPU time histograms per pipeline stage
+INSTRUMENT_MEMORY = False  # tracemalloc peaks per stage as well; slows allocation-heavy stages down
+INSTRUMENTATION_DIR = "artifacts/instrumentation"  # export() writes stages.prom and stages.json here
+
+# Result cache for interactive callers (src/result_cache.py)
+RESULT_CACHE_SIZE = 1024  # queries kept, least recently used evicted first
+RESULT_CACHE_TTL = 600  # seconds before an entry is recomputed
+RESULT_CACHE_DEPTH = 20  # ranking length cached per query; any top_k up to this is served by slicing
+
+# Precomputed content scores (src/content_table.py)
+CONTENT_TABLE = True  # score known category/state/occupation/location_type combinations by table lookup
+CONTENT_TABLE_DTYPE = "float64"  # bit for bit the on-the-fly scores; "float32" halves the memory but reorders ties
+CONTENT_TABLE_MAX_BYTES = 256 * 2 ** 20  # larger tables are skipped and every request is scored on the fly
+
+# Offline top-N table (main.py, src/topn_table.py)
+TOPN_TABLE_DIR = "artifacts/topn"  # memory-mapped shards of every user's top-N per (category, state)
+TOPN_SHARD_USERS = 4096  # users per shard; the unit of resuming and of change-only rewrites
+
+# Streaming ingestion (src/ingestion.py)
+EVENTS_PATH = "data/events.jsonl"  # JSONL review/trip/user events, appended by producers
+INGEST_CHECKPOINT_DIR = "artifacts/ingestion"  # committed offset plus the log of applied events
+INGEST_MAX_BATCH = 500  # events folded into the engine per update() call at most
+INGEST_MAX_DELAY = 0.5  # seconds the oldest pending event waits for its batch to fill
+INGEST_POLL_INTERVAL = 0.1  # seconds between reads of the event file when following it
@@ -2,6 +2,9 @@ from sklearn.metrics.pairwise import cosine_similarity
 from scipy.sparse import hstack, csr_matrix
 import numpy as np
 
+from src.utils import top_n_indices
+from src.instrumentation import instrumented
+
 """
 def create_user_preference_vector(travel_category, preferred_state, tfidf):
     user_text = f"{travel_category} {preferred_state}"
@@ -9,6 +12,7 @@ def create_user_preference_vector(travel_category, preferred_state, tfidf):
     return user_vector
 """
 
+@instrumented("create_user_preference_vector")
 def create_user_preference_vector(travel_category, preferred_state, tfidf, user_metadata):
     # Create text vector from user metadata
     user_text = f"{travel_category} {preferred_state} {user_metadata['occupation']} {user_metadata['location_type']}"
@@ -22,8 +26,11 @@ def create_user_preference_vector(travel_category, preferred_state, tfidf, user_
     return final_user_vector
 
 
+@instrumented("get_content_based_recommendations")
 def get_content_based_recommendations(user_vector, tfidf_matrix, locations_df, top_n=10):
     similarity_scores = cosine_similarity(user_vector, tfidf_matrix).flatten()
-    locations_df = locations_df.copy()
-    locations_df['content_score'] = similarity_scores
-    return locations_df.sort_values(by='content_score', ascending=False).head(top_n)
\ No newline at end of file
+    # Partial selection on the score array; only the top_n rows are copied (ties keep locations_df order)
+    top = top_n_indices(similarity_scores, top_n)
+    recommendations = locations_df.iloc[top].copy()
+    recommendations['content_score'] = similarity_scores[top]
+    return recommendations
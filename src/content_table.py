@@ -0,0 +1,81 @@
+import itertools
+
+import numpy as np
+from scipy.sparse import csr_matrix, hstack
+from sklearn.preprocessing import normalize
+
+from src import config
+from src.instrumentation import instrumented
+
+
+def preference_texts(categories, states, occupations, location_types):
+    # The text create_user_preference_vector() builds for each query
+    return [f"{category} {state} {occupation} {location_type}"
+            for category, state, occupation, location_type in zip(categories, states, occupations, location_types)]
+
+
+def preference_score_rows(tfidf, location_unit, texts):
+    # Cosine content scores of each preference text (rows) against every location (columns)
+    preference = hstack([tfidf.transform(texts), csr_matrix(np.ones((len(texts), 2)))])
+    preference = normalize(preference.tocsr(), norm="l2", axis=1)
+    return (preference @ location_unit.T).toarray()
+
+
+class ContentScoreTable:
+    # Dense (category, state, occupation, location_type, location) tensor of content scores, so scoring a known
+    # combination is four dict lookups and a row view instead of a TF-IDF transform and a sparse product
+
+    def __init__(self, categories, states, occupations, location_types, scores):
+        self.categories, self.states = categories, states
+        self.occupations, self.location_types = occupations, location_types
+        self._category_index = {value: index for index, value in enumerate(categories)}
+        self._state_index = {value: index for index, value in enumerate(states)}
+        self._occupation_index = {value: index for index, value in enumerate(occupations)}
+        self._location_type_index = {value: index for index, value in enumerate(location_types)}
+        self.scores = scores
+
+    @property
+    def nbytes(self):
+        return self.scores.nbytes
+
+    @property
+    def dtype(self):
+        return self.scores.dtype
+
+    def round(self, scores):
+        # On-the-fly scores at the table's precision, so a combination ranks the same whether or not it is tabled
+        return scores.astype(self.dtype).astype(float)
+
+    def lookup(self, category, state, occupation, location_type):
+        # Scores aligned to location position, or None for a combination outside the table
+        try:
+            return self.scores[self._category_index[category], self._state_index[state],
+                               self._occupation_index[occupation], self._location_type_index[location_type]]
+        except (KeyError, TypeError):
+            return None
+
+
+@instrumented("build_content_table")
+def build_content_table(tfidf, location_unit, locations_df, users_df, dtype=None, max_bytes=None, block_size=4096):
+    # Every category/state in locations_df crossed with every occupation/location_type in users_df.
+    # Returns None when the tensor would exceed max_bytes; callers then score every query on the fly
+    dtype = np.dtype(config.CONTENT_TABLE_DTYPE if dtype is None else dtype)
+    max_bytes = config.CONTENT_TABLE_MAX_BYTES if max_bytes is None else max_bytes
+    axes = (
+        locations_df["category"].dropna().unique().tolist(),
+        locations_df["state"].dropna().unique().tolist(),
+        users_df["occupation"].dropna().unique().tolist(),
+        users_df["location_type"].dropna().unique().tolist(),
+    )
+    shape = tuple(len(values) for values in axes) + (location_unit.shape[0],)
+    if int(np.prod(shape, dtype=np.int64)) * dtype.itemsize > max_bytes:
+        return None
+
+    scores = np.empty(shape, dtype=dtype)
+    flat = scores.reshape(-1, shape[-1])
+    # product() walks the combinations in C order, matching the flattened tensor
+    combinations = itertools.product(*axes)
+    for start in range(0, len(flat), block_size):
+        block = list(itertools.islice(combinations, block_size))
+        flat[start:start + len(block)] = preference_score_rows(tfidf, location_unit, preference_texts(*zip(*block)))
+    return ContentScoreTable(*axes, scores)
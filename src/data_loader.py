@@ -1,8 +1,26 @@
+import os
+
 import pandas as pd
 
-def load_all_data():
-    locations_df = pd.read_csv("data/final/locations.csv")
-    trips_df = pd.read_csv("data/final/trips.csv")
-    users_df = pd.read_csv("data/final/users.csv")
-    reviews_df = pd.read_csv("data/final/reviews.csv")
-    return locations_df, trips_df, users_df, reviews_df
\ No newline at end of file
+from src import config
+from src.snapshot import TABLES, load_snapshot, snapshot_is_fresh
+from src.instrumentation import instrumented
+
+@instrumented("load_all_data")
+def load_all_data(data_dir=None, snapshot_dir=None):
+    # Memory-mapped binary snapshot when one is compiled and up to date, CSV parsing otherwise
+    data_dir = data_dir or config.DATA_DIR
+    snapshot_dir = config.SNAPSHOT_DIR if snapshot_dir is None else snapshot_dir
+    if snapshot_dir and snapshot_is_fresh(data_dir, snapshot_dir):
+        try:
+            return load_snapshot(snapshot_dir)
+        except (OSError, KeyError, ValueError):
+            pass
+    return load_csv_data(data_dir)
+
+def load_csv_data(data_dir=None):
+    data_dir = data_dir or config.DATA_DIR
+    locations_df, trips_df, users_df, reviews_df = (
+        pd.read_csv(os.path.join(data_dir, f"{table}.csv")) for table in TABLES
+    )
+    return locations_df, trips_df, users_df, reviews_df
@@ -0,0 +1,517 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
+
+from src.feature_engineering import prepare_location_features
+from src.content_filtering import create_user_preference_vector
+from src.collaborative_filtering import (
+    SparseInteractionMatrix, create_user_location_matrix, update_user_location_matrix,
+    get_top_k_similar_users, predict_rating_array, build_item_similarity, predict_item_based_rating_array
+)
+from src.utils import (
+    estimate_location_cost, build_location_cost_table, build_location_cost_stats, location_costs_from_stats,
+    get_budget_limits, top_n_indices
+)
+from src.matrix_factorization import align_als_model, predict_als_rating_array, train_als
+from src.hybrid import combine_score_arrays
+from src.content_table import build_content_table, preference_score_rows, preference_texts
+from src.lookup import LookupTables
+from src.snapshot import decode_text_columns
+from src.instrumentation import instrumented, stage
+from src import config
+
+
+class RecommenderEngine:
+    # Fits every dataset-sized structure once so that recommend() only does per-user work
+
+    def __init__(self, content_pool=50, num_neighbors=5,
+                 weight_content=config.WEIGHT_CONTENT, weight_collab=config.WEIGHT_COLLAB,
+                 cf_mode=None, knn_graph=None, ann_index=None, content_table=None, als_model=None):
+        self.cf_mode = cf_mode or config.CF_MODE
+        if self.cf_mode not in ("user", "item", "als"):
+            raise ValueError(f"Unknown collaborative filtering mode: {self.cf_mode!r}")
+        self.content_pool = content_pool
+        self.num_neighbors = num_neighbors
+        self.knn_graph = knn_graph
+        self.ann_index = ann_index
+        # Factors from train_als_model.py (ALSModel.load); without one, fit() trains them in "als" mode
+        self.pretrained_als_model = als_model
+        self.use_content_table = config.CONTENT_TABLE if content_table is None else content_table
+        self.weight_content = weight_content
+        self.weight_collab = weight_collab
+        self.is_fitted = False
+        self.version = 0
+
+    @instrumented("engine.fit")
+    def fit(self, locations_df, trips_df, users_df, reviews_df):
+        # Location columns end up in every result frame, so they keep CSV dtypes even for raw snapshot tables
+        locations_df = decode_text_columns(locations_df)
+        self.locations_df = locations_df
+        self.trips_df = trips_df
+        self.users_df = users_df
+        self.reviews_df = reviews_df
+
+        # Feature engineering
+        self.tfidf_matrix, self.tfidf = prepare_location_features(locations_df)
+
+        # Collaborative filtering
+        self.interaction_matrix = create_user_location_matrix(reviews_df, users_df)
+        self.item_similarity = None
+        if self.cf_mode == "item":
+            self.item_similarity = build_item_similarity(self.interaction_matrix, config.ITEM_NEIGHBORS)
+        self.als_model = None
+        if self.cf_mode == "als":
+            self.als_model = train_als(self.interaction_matrix) if self.pretrained_als_model is None \
+                else align_als_model(self.pretrained_als_model, self.interaction_matrix)
+
+        # Budget filtering
+        self.location_costs = estimate_location_cost(reviews_df, trips_df)
+        self._cost_stats, self._trip_stats = build_location_cost_stats(reviews_df, trips_df)
+        # Per-location mean/median/percentile trip costs; only available when trips carry location_id
+        self.location_cost_table = build_location_cost_table(trips_df) if self._trip_stats is None else None
+        with stage("engine.fit.lookup_tables"):
+            self.user_metadata = users_df.drop_duplicates("user_id").set_index("user_id")
+            self.budget_limits = get_budget_limits(users_df)
+            self.lookup = LookupTables(users_df, reviews_df, locations_df)
+
+        # Neighbourhoods already computed for recommend(), and users whose knn_graph entry is out of date
+        self._neighbor_cache = {}
+        self._stale_neighborhoods = set()
+
+        with stage("engine.fit.batch_arrays"):
+            self._fit_batch_arrays()
+        # Content scores for every category x state x occupation x location_type (None when disabled or too large)
+        self.content_table = None
+        if self.use_content_table:
+            self.content_table = build_content_table(self.tfidf, self._location_unit, locations_df, users_df)
+        self.is_fitted = True
+        self.version += 1
+        return self
+
+    def update_columns(self):
+        # Columns update() requires per table. Trips need location_id whenever fit() aggregated costs per location
+        trip_columns = ["user_id", "cost"] + (["location_id"] if self._trip_stats is None else [])
+        return {"reviews": ["user_id", "location_id", "rating"], "trips": trip_columns,
+                "users": ["user_id", "occupation", "location_type"]}
+
+    @instrumented("engine.update")
+    def update(self, new_reviews_df=None, new_trips_df=None, new_users_df=None):
+        # Folds new reviews/trips/users into the fitted state without a refit; returns the user_ids whose rows changed.
+        # All or nothing: if any step fails, the engine is left exactly as it was before the call
+        if not self.is_fitted:
+            raise RuntimeError("RecommenderEngine.fit() must be called before update()")
+        if not isinstance(self.interaction_matrix, SparseInteractionMatrix):
+            raise ValueError("update() requires the sparse interaction backend")
+        frames = {"reviews": new_reviews_df, "trips": new_trips_df, "users": new_users_df}
+        for table, columns in self.update_columns().items():
+            frame = frames[table]
+            missing = [] if frame is None or frame.empty else [name for name in columns if name not in frame.columns]
+            if missing:
+                raise ValueError(f"new {table} are missing column(s): {', '.join(missing)}")
+
+        # Every step rebinds attributes instead of changing fitted objects in place, so restoring the attribute
+        # dict undoes a partial update. Neighbourhood invalidation edits caches and the ANN index in place, so it runs
+        # last; dropped cache entries are simply recomputed against the restored state
+        saved = dict(self.__dict__)
+        try:
+            changed_users = self._apply_update(new_reviews_df, new_trips_df, new_users_df)
+            self._invalidate_neighborhoods(changed_users)
+        except BaseException:
+            self.__dict__.clear()
+            self.__dict__.update(saved)
+            raise
+        self.version += 1
+        return changed_users
+
+    def _apply_update(self, new_reviews_df, new_trips_df, new_users_df):
+        has_reviews = new_reviews_df is not None and not new_reviews_df.empty
+        has_trips = new_trips_df is not None and not new_trips_df.empty
+        has_users = new_users_df is not None and not new_users_df.empty
+
+        if has_users:
+            # As in fit(), the first row per user_id wins: a profile for a known user changes nothing
+            self.users_df = pd.concat([self.users_df, new_users_df], ignore_index=True)
+            self.user_metadata = self.users_df.drop_duplicates("user_id").set_index("user_id")
+            self.budget_limits = get_budget_limits(self.users_df)
+            if not has_reviews:
+                self.lookup = LookupTables(self.users_df, self.reviews_df, self.locations_df)
+
+        # Cost aggregates: with location_id on trips each new trip only touches its own location.
+        # Otherwise new trips spread over the locations their user already reviewed,
+        # then new reviews pick up their user's (updated) trip totals
+        direct_costs = self._trip_stats is None
+        if has_trips and direct_costs:
+            self.trips_df = pd.concat([self.trips_df, new_trips_df], ignore_index=True)
+            delta = new_trips_df.dropna(subset=["location_id", "cost"]).groupby("location_id")["cost"].agg(["sum", "count"])
+            delta.columns = ["cost_sum", "cost_count"]
+            self._cost_stats = self._cost_stats.add(delta, fill_value=0)
+            touched = self.trips_df["location_id"].isin(delta.index)
+            self.location_cost_table = pd.concat([
+                self.location_cost_table[~self.location_cost_table["location_id"].isin(delta.index)],
+                build_location_cost_table(self.trips_df[touched])
+            ], ignore_index=True)
+        elif has_trips:
+            self.trips_df = pd.concat([self.trips_df, new_trips_df], ignore_index=True)
+            trip_delta = new_trips_df.groupby("user_id")["cost"].agg(["sum", "count"])
+            trip_delta.columns = ["trip_sum", "trip_count"]
+            for user_id, trip_sum, trip_count in trip_delta.itertuples():
+                self._add_trip_costs_to_reviewed_locations(user_id, trip_sum, trip_count)
+            self._trip_stats = self._trip_stats.add(trip_delta, fill_value=0)
+        if has_reviews and not direct_costs:
+            per_review = new_reviews_df[["user_id", "location_id"]].join(self._trip_stats, on="user_id")
+            delta = per_review.groupby("location_id")[["trip_sum", "trip_count"]].sum()
+            delta.columns = ["cost_sum", "cost_count"]
+            self._cost_stats = self._cost_stats.add(delta, fill_value=0)
+        if has_trips or (has_reviews and not direct_costs):
+            self.location_costs = location_costs_from_stats(self._cost_stats)
+            costs = self.locations_df[["location_id"]].merge(self.location_costs, on="location_id", how="left")
+            self._location_cost_array = costs["estimated_cost"].to_numpy(dtype=float)
+
+        changed_users = []
+        if has_reviews:
+            self.reviews_df = pd.concat([self.reviews_df, new_reviews_df], ignore_index=True)
+            self.lookup = LookupTables(self.users_df, self.reviews_df, self.locations_df)
+            self._review_counts = self._review_counts.add(new_reviews_df.groupby("user_id").size(), fill_value=0).astype(int)
+            self.interaction_matrix, changed_users = update_user_location_matrix(self.interaction_matrix, new_reviews_df)
+            self._sparse_interactions = self.interaction_matrix
+            self._column_positions = self._positions_of(self.interaction_matrix.location_ids)
+            if self.item_similarity is not None:
+                # ~catalogue-sized, so the truncated item-item matrix is simply rebuilt
+                self.item_similarity = build_item_similarity(self.interaction_matrix, config.ITEM_NEIGHBORS)
+            if self.als_model is not None:
+                # Changed users (and any new location) are re-solved against the fixed factors of the rest
+                self.als_model = align_als_model(self.als_model, self.interaction_matrix, refresh_users=changed_users)
+        return changed_users
+
+    def _add_trip_costs_to_reviewed_locations(self, user_id, trip_sum, trip_count):
+        row = self.interaction_matrix.user_index.get(user_id)
+        if row is None:
+            return
+        counts = self.interaction_matrix.rating_counts[row]
+        location_ids = self.interaction_matrix.location_ids[counts.indices]
+        delta = pd.DataFrame(
+            {"cost_sum": counts.data * trip_sum, "cost_count": counts.data * trip_count},
+            index=pd.Index(location_ids, name="location_id")
+        )
+        self._cost_stats = self._cost_stats.add(delta, fill_value=0)
+
+    def _invalidate_neighborhoods(self, changed_users):
+        # A user's top-k can only change if it contains a changed user or a changed user now beats or ties
+        # its k-th neighbour (ties go to the lower user_id, so a tie can displace it)
+        if not changed_users:
+            return
+        interactions = self.interaction_matrix
+        changed = set(changed_users)
+        changed_rows = [interactions.user_index[user_id] for user_id in changed_users]
+        best_changed_similarity = np.asarray(
+            (interactions.normalized[changed_rows] @ interactions.normalized.T).max(axis=0).toarray()
+        ).ravel()
+
+        for user_id, similar_users in list(self._neighbor_cache.items()):
+            if user_id in changed:
+                del self._neighbor_cache[user_id]
+            elif similar_users is not None:
+                # Users without ratings stay cached as None until they appear in changed_users
+                threshold = similar_users.min() if len(similar_users) >= self.num_neighbors else -np.inf
+                row = interactions.user_index[user_id]
+                if changed.intersection(similar_users.index) or best_changed_similarity[row] >= threshold:
+                    del self._neighbor_cache[user_id]
+
+        if self.knn_graph is not None:
+            graph = self.knn_graph
+            graph_rows = np.array([interactions.user_index[user_id] for user_id in graph.user_ids.tolist()])
+            neighbor_ids = np.where(graph.neighbor_rows >= 0, graph.user_ids[graph.neighbor_rows], -1)
+            contains_changed = np.isin(neighbor_ids, list(changed)).any(axis=1)
+            beaten = best_changed_similarity[graph_rows] >= graph.weights[:, -1]
+            self._stale_neighborhoods.update(graph.user_ids[contains_changed | beaten].tolist())
+            self._stale_neighborhoods.update(changed)
+        if self.ann_index is not None:
+            self.ann_index.update(changed_users, interactions.normalized[changed_rows])
+
+    @instrumented("engine.recommend")
+    def recommend(self, user_id, category, state, budget=None, top_n=10):
+        if not self.is_fitted:
+            raise RuntimeError("RecommenderEngine.fit() must be called before recommend()")
+        if user_id not in self.lookup:
+            return None
+        user_metadata = self.lookup.user_metadata(user_id)
+
+        # Everything below works on arrays aligned to location position; only the final top_n rows become a frame
+        with stage("engine.recommend.content_scores"):
+            content_scores = self._content_scores(
+                category, state, user_metadata["occupation"], user_metadata["location_type"]
+            )
+            pool = top_n_indices(content_scores, self.content_pool)
+
+            if budget is None:
+                budget = self.lookup.budget_limit(user_id)
+            with np.errstate(invalid="ignore"):
+                candidates = pool[self._location_cost_array[pool] <= budget]
+        with stage("engine.recommend.collaborative"):
+            collab_scores, normalized_collab = self._collab_score_arrays(user_id)
+        with stage("engine.recommend.hybrid_scoring"):
+            return self._score_candidates(user_id, content_scores, candidates, collab_scores, normalized_collab, top_n)
+
+    def _content_scores(self, category, state, occupation, location_type):
+        # Precomputed row for combinations in the content table; anything else goes through the preference vector
+        if self.content_table is not None:
+            scores = self.content_table.lookup(category, state, occupation, location_type)
+            if scores is not None:
+                return scores.astype(float)
+        user_vector = create_user_preference_vector(category, state, self.tfidf, {
+            "occupation": occupation,
+            "location_type": location_type
+        })
+        scores = (normalize(user_vector.tocsr(), norm="l2", axis=1) @ self._location_unit.T).toarray().ravel()
+        return scores if self.content_table is None else self.content_table.round(scores)
+
+    def _content_score_rows(self, categories, states, occupations, location_types):
+        # _content_scores for many queries: table rows where possible, one sparse product for the distinct rest
+        keys = list(zip(categories, states, occupations, location_types))
+        content = np.empty((len(keys), len(self._location_ids)))
+        missing = []
+        for row, key in enumerate(keys):
+            scores = None if self.content_table is None else self.content_table.lookup(*key)
+            if scores is None:
+                missing.append(row)
+            else:
+                content[row] = scores
+        if missing:
+            texts = preference_texts(*zip(*(keys[row] for row in missing)))
+            unique_texts, text_rows = np.unique(texts, return_inverse=True)
+            scores = preference_score_rows(self.tfidf, self._location_unit, unique_texts)
+            content[missing] = (scores if self.content_table is None else self.content_table.round(scores))[text_rows]
+        return content
+
+    def _score_candidates(self, user_id, content_scores, candidates, collab_scores, normalized_collab, top_n):
+        # Array counterpart of combine_scores over candidate location positions (content-rank order)
+        top, top_content, top_collab, top_hybrid = combine_score_arrays(
+            content_scores[candidates],
+            normalized_collab[candidates],
+            self.lookup.review_count(user_id),
+            weight_content=self.weight_content,
+            weight_collab=self.weight_collab,
+            top_n=top_n
+        )
+
+        positions = candidates[top]
+        columns = {
+            name: values.take(positions) for name, values in self._location_columns.items()
+        }
+        columns["location_id"] = np.asarray(columns["location_id"]).astype(int)
+        columns["content_score"] = content_scores[positions]
+        columns["estimated_cost"] = self._location_cost_array[positions]
+        columns["normalized_content"] = top_content
+        columns["collab_score"] = np.nan_to_num(collab_scores[positions], nan=0.0)
+        columns["normalized_collab"] = top_collab
+        columns["hybrid_score"] = top_hybrid
+        final_recs = pd.DataFrame(columns, index=top, copy=False)
+        if self._location_has_gaps[positions].any():
+            # combine_scores filled every gap in the merged frame with 0
+            final_recs = final_recs.fillna(0)
+        return final_recs
+
+    def _similar_users(self, user_id):
+        if user_id in self._neighbor_cache:
+            return self._neighbor_cache[user_id]
+        stale = user_id in self._stale_neighborhoods
+        similar_users = get_top_k_similar_users(
+            self.interaction_matrix, user_id, k=self.num_neighbors,
+            knn_graph=None if stale else self.knn_graph, ann_index=self.ann_index
+        )
+        self._neighbor_cache[user_id] = similar_users
+        return similar_users
+
+    def _collab_score_arrays(self, user_id):
+        # Raw and normalize_scores-normalised CF predictions by location position (NaN = no prediction).
+        # The normalisation spans every unseen location, as combine_scores did, including off-catalogue ones.
+        num_locations = len(self._location_ids)
+        raw, normalized = np.full(num_locations, np.nan), np.full(num_locations, np.nan)
+        interactions = self._sparse_interactions
+        if self.cf_mode == "item":
+            predictions = predict_item_based_rating_array(interactions, self.item_similarity, user_id)
+        elif self.cf_mode == "als":
+            predictions = predict_als_rating_array(interactions, self.als_model, user_id)
+        else:
+            similar_users = self._similar_users(user_id)
+            predictions = None if similar_users is None else predict_rating_array(interactions, similar_users, user_id)
+        if predictions is None:
+            return raw, normalized
+        prediction_scores, unseen = predictions
+        scores, positions = prediction_scores[unseen], self._column_positions[unseen]
+        if np.isnan(scores).all():
+            return raw, normalized
+        on_catalogue = positions >= 0
+        raw[positions[on_catalogue]] = scores[on_catalogue]
+        low, high = np.nanmin(scores), np.nanmax(scores)
+        normalized[positions[on_catalogue]] = (scores[on_catalogue] - low) / (high - low + 1e-9)
+        return raw, normalized
+
+    # Batched scoring -------------------------------------------------------------------------
+
+    def _fit_batch_arrays(self):
+        # Everything recommend_batch needs, aligned to location position in locations_df
+        self._location_ids = self.locations_df["location_id"].to_numpy()
+        self._location_unit = normalize(csr_matrix(self.tfidf_matrix), norm="l2", axis=1)
+        self._location_columns = {name: self.locations_df[name].array for name in self.locations_df.columns}
+        self._location_has_gaps = self.locations_df.isna().any(axis=1).to_numpy()
+        costs = self.locations_df[["location_id"]].merge(self.location_costs, on="location_id", how="left")
+        self._location_cost_array = costs["estimated_cost"].to_numpy(dtype=float)
+        self._review_counts = self.reviews_df.groupby("user_id").size()
+
+        interactions = self.interaction_matrix
+        if not isinstance(interactions, SparseInteractionMatrix):
+            interactions = SparseInteractionMatrix(
+                interactions.to_numpy(dtype=float), interactions.index, interactions.columns
+            )
+        self._sparse_interactions = interactions
+        self._column_positions = self._positions_of(interactions.location_ids)
+
+    def _positions_of(self, location_ids):
+        position_of = {location_id: pos for pos, location_id in enumerate(self._location_ids.tolist())}
+        return np.array([position_of.get(location_id, -1) for location_id in location_ids.tolist()], dtype=np.int64)
+
+    @instrumented("engine.recommend_batch")
+    def recommend_batch(self, user_ids, category, state, budgets=None, top_n=10, block_size=512):
+        # Scores many users with matrix-matrix products; category, state and budgets may be
+        # scalars or sequences aligned with user_ids. Returns a long frame: user_id, rank, location_id, hybrid_score
+        if not self.is_fitted:
+            raise RuntimeError("RecommenderEngine.fit() must be called before recommend_batch()")
+        queries = pd.DataFrame({"user_id": list(user_ids)})
+        queries["category"] = category
+        queries["state"] = state
+        queries["budget"] = np.nan if budgets is None else budgets
+        queries = queries[queries["user_id"].isin(self.user_metadata.index)].reset_index(drop=True)
+        missing_budget = queries["budget"].isna()
+        queries.loc[missing_budget, "budget"] = self.budget_limits.reindex(queries.loc[missing_budget, "user_id"]).to_numpy()
+
+        frames = [
+            self._recommend_block(queries.iloc[start:start + block_size], top_n)
+            for start in range(0, len(queries), block_size)
+        ]
+        if not frames:
+            return pd.DataFrame({
+                "user_id": pd.Series(dtype=self.user_metadata.index.dtype),
+                "rank": pd.Series(dtype=np.int64),
+                "location_id": pd.Series(dtype=self._location_ids.dtype),
+                "hybrid_score": pd.Series(dtype=float),
+            })
+        return pd.concat(frames, ignore_index=True)
+
+    def _recommend_block(self, queries, top_n):
+        user_ids = queries["user_id"].to_numpy()
+        num_users, num_locations = len(user_ids), len(self._location_ids)
+
+        metadata = self.user_metadata.loc[user_ids, ["occupation", "location_type"]]
+        content = self._content_score_rows(
+            queries["category"].tolist(), queries["state"].tolist(),
+            metadata["occupation"].tolist(), metadata["location_type"].tolist()
+        )
+
+        # Candidate pool: top content_pool by content score (stable on ties), then the budget mask
+        order = np.argsort(-content, axis=1, kind="stable")[:, :self.content_pool]
+        candidates = np.zeros((num_users, num_locations), dtype=bool)
+        np.put_along_axis(candidates, order, True, axis=1)
+        with np.errstate(invalid="ignore"):
+            candidates &= self._location_cost_array[None, :] <= queries["budget"].to_numpy(dtype=float)[:, None]
+
+        normalized_content = _normalize_rows(content, candidates)
+        normalized_collab = self._batch_collab_scores(user_ids)
+
+        # Dynamic weights, as in combine_scores
+        num_reviews = self._review_counts.reindex(user_ids, fill_value=0).to_numpy()
+        weight_content = np.where(num_reviews < 3, 0.8, np.where(num_reviews > 10, 0.3, self.weight_content))
+        weight_collab = np.where(num_reviews < 3, 0.2, np.where(num_reviews > 10, 0.7, self.weight_collab))
+        hybrid = weight_content[:, None] * normalized_content + weight_collab[:, None] * normalized_collab
+        hybrid = np.where(candidates, hybrid, -np.inf)
+
+        # Top-n: hybrid score, then content score, then location position
+        positions = np.broadcast_to(np.arange(num_locations), hybrid.shape)
+        ranking = np.lexsort((positions, -content, -hybrid), axis=1)[:, :top_n]
+        top_scores = np.take_along_axis(hybrid, ranking, axis=1)
+        keep = np.isfinite(top_scores)
+        rows = np.nonzero(keep)[0]
+        return pd.DataFrame({
+            "user_id": user_ids[rows],
+            "rank": np.nonzero(keep)[1] + 1,
+            "location_id": self._location_ids[ranking[keep]],
+            "hybrid_score": top_scores[keep],
+        })
+
+    def _batch_collab_scores(self, user_ids):
+        # Normalised CF scores aligned to location position; 0 where predict_* would give no score
+        interactions = self._sparse_interactions
+        num_locations = len(self._location_ids)
+        scores = np.zeros((len(user_ids), num_locations))
+        known = np.array([user_id in interactions.user_index for user_id in user_ids.tolist()], dtype=bool)
+        if not known.any():
+            return scores
+        rows = np.array([interactions.user_index[user_id] for user_id in user_ids[known].tolist()])
+        ratings = interactions.matrix[rows].toarray()
+
+        if self.cf_mode == "item":
+            weighted = np.asarray(ratings @ self.item_similarity.T)
+            normalization = np.asarray((ratings > 0).astype(float) @ self.item_similarity.T)
+            predictions = np.divide(weighted, normalization, out=np.zeros_like(weighted), where=normalization > 0)
+        elif self.cf_mode == "als":
+            predictions = (self.als_model.user_factors[rows] @ self.als_model.item_factors.T).astype(float)
+        else:
+            neighbor_weights = self._batch_neighbor_weights(rows, user_ids[known])
+            weighted = (neighbor_weights @ interactions.matrix).toarray()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                predictions = weighted / np.asarray(neighbor_weights.sum(axis=1))
+
+        normalized = _normalize_rows(predictions, ratings == 0)
+        on_catalogue = self._column_positions >= 0
+        scores[np.ix_(known, self._column_positions[on_catalogue])] = normalized[:, on_catalogue]
+        return scores
+
+    def _batch_neighbor_weights(self, rows, user_ids):
+        # (users x all users) sparse matrix holding each user's top-k neighbour similarities
+        interactions = self._sparse_interactions
+        num_users, k = len(rows), self.num_neighbors
+        if self.knn_graph is not None or self.ann_index is not None:
+            neighbor_rows, weights = [], []
+            for user_id in user_ids.tolist():
+                stale = user_id in self._stale_neighborhoods
+                similar_users = get_top_k_similar_users(
+                    interactions, user_id, k=k,
+                    knn_graph=None if stale else self.knn_graph, ann_index=self.ann_index
+                )
+                neighbor_rows.append([interactions.user_index[u] for u in similar_users.index])
+                weights.append(similar_users.to_numpy(dtype=float))
+            indptr = np.concatenate([[0], np.cumsum([len(r) for r in neighbor_rows])])
+            return csr_matrix(
+                (np.concatenate(weights), np.concatenate(neighbor_rows).astype(np.int64), indptr),
+                shape=(num_users, interactions.shape[0])
+            )
+
+        similarities = (interactions.normalized[rows] @ interactions.normalized.T).toarray()
+        similarities[np.arange(num_users), rows] = -np.inf
+        k = min(k, interactions.shape[0] - 1)
+        if k <= 0:
+            return csr_matrix((num_users, interactions.shape[0]))
+        neighbors = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        # Rows with more than k users tied at the k-th similarity pick the lower user_ids, as in recommend()
+        kth = np.take_along_axis(similarities, neighbors, axis=1).min(axis=1)
+        for row in np.flatnonzero((similarities >= kth[:, None]).sum(axis=1) > k).tolist():
+            neighbors[row] = top_n_indices(similarities[row], k, tiebreak=interactions.user_ids)
+        weights = np.take_along_axis(similarities, neighbors, axis=1)
+        return csr_matrix(
+            (weights.ravel(), neighbors.ravel(), np.arange(0, num_users * k + 1, k)),
+            shape=(num_users, interactions.shape[0])
+        )
+
+
+def _normalize_rows(scores, mask):
+    # normalize_scores applied to each row over the masked entries only; 0 outside the mask / for all-NaN rows
+    masked = np.where(mask, scores, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        low = np.nanmin(masked, axis=1, keepdims=True)
+        high = np.nanmax(masked, axis=1, keepdims=True)
+    normalized = (masked - low) / (high - low + 1e-9)
+    return np.nan_to_num(normalized, nan=0.0)
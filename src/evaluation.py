@@ -0,0 +1,103 @@
+import multiprocessing
+import time
+
+from sklearn.model_selection import KFold
+
+from src.engine import RecommenderEngine
+from src.engine_wrapper import EVALUATION_QUERY
+from src.metrics import padded_rankings, ranking_metrics, relevance_csr
+
+# Read-only inputs for the worker processes. Filled in before the pool starts, so forked children
+# share the parent's pages instead of receiving pickled copies of every DataFrame.
+_SHARED = {}
+
+
+def kfold_tasks(reviews_df, n_splits, seed=42, chunk_size=16):
+    # Folds, and (fold, user chunk) tasks in the order a serial run visits them
+    kf = KFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    folds = list(kf.split(reviews_df))
+    tasks = []
+    for fold, (_, test_idx) in enumerate(folds):
+        test_users = reviews_df.iloc[test_idx]["user_id"].unique().tolist()
+        tasks.extend((fold, test_users[start:start + chunk_size]) for start in range(0, len(test_users), chunk_size))
+    return folds, tasks
+
+
+def _share(shared):
+    _SHARED.update(shared)
+
+
+def fit_fold_engines(locations_df, trips_df, users_df, reviews_df, folds, cf_mode=None):
+    # One engine per fold, fitted on the whole training split; returns the engines and the fit time of each.
+    # Folds are only queried with EVALUATION_QUERY, so the full content table would cost more than it saves
+    engines, fit_seconds = [], []
+    for train_idx, _ in folds:
+        start = time.perf_counter()
+        engines.append(RecommenderEngine(cf_mode=cf_mode, content_table=False).fit(
+            locations_df, trips_df, users_df, reviews_df.iloc[train_idx]
+        ))
+        fit_seconds.append(time.perf_counter() - start)
+    return engines, fit_seconds
+
+
+def _evaluate_users(task):
+    fold, user_ids = task
+    engine, test_locations = _SHARED["engines"][fold], _SHARED["test_locations"][fold]
+    max_k = max(_SHARED["cutoffs"])
+
+    rows = []
+    for user_id in user_ids:
+        # Users need both held-out reviews and training reviews to be scored
+        if user_id not in test_locations.index or engine.lookup.review_count(user_id) == 0:
+            continue
+
+        relevant = test_locations.at[user_id]
+        start = time.perf_counter()
+        recs = engine.recommend(user_id, *EVALUATION_QUERY, top_n=max_k)
+        latency = time.perf_counter() - start
+        # Rankings are deterministic, so the top-k for a smaller k is a prefix of this one
+        predicted = None if recs is None or recs.empty else recs["location_id"].tolist()
+        rows.append((predicted, relevant, latency))
+    return rows
+
+
+def _pool(workers):
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork").Pool(workers)
+    # No fork (e.g. Windows): each worker gets one pickled copy of the inputs at start-up
+    return multiprocessing.get_context("spawn").Pool(workers, initializer=_share, initargs=(dict(_SHARED),))
+
+
+def evaluate_kfold(locations_df, trips_df, users_df, reviews_df, n_splits=5, top_k=10, cf_mode=None,
+                   workers=1, chunk_size=16, seed=42, cutoffs=None):
+    # Per-user metric arrays keyed "<metric>@<k>", in serial (fold, user) order whatever the worker count, so averages
+    # are bit-identical, plus timings: fit seconds per fold and query seconds per user.
+    # Each user is ranked once at max(cutoffs) (default: top_k) and scored at every cutoff.
+    cutoffs = sorted(set(cutoffs or [top_k]))
+    folds, tasks = kfold_tasks(reviews_df, n_splits, seed=seed, chunk_size=chunk_size)
+    # Fitted in the parent, before the pool forks, so every worker shares the same fold engines
+    engines, fit_seconds = fit_fold_engines(locations_df, trips_df, users_df, reviews_df, folds, cf_mode=cf_mode)
+    # Held-out location_ids per user, in review order
+    test_locations = [
+        reviews_df.iloc[test_idx].groupby("user_id")["location_id"].agg(list) for _, test_idx in folds
+    ]
+    _share({"engines": engines, "test_locations": test_locations, "cutoffs": cutoffs})
+    try:
+        if workers > 1:
+            with _pool(workers) as pool:
+                chunks = pool.imap(_evaluate_users, tasks)
+                rows = [row for chunk in chunks for row in chunk]
+        else:
+            rows = [row for task in tasks for row in _evaluate_users(task)]
+    finally:
+        _SHARED.clear()
+
+    # Users without any recommendation are left out of the metrics, as before
+    scored = [(predicted, relevant) for predicted, relevant, _ in rows if predicted is not None]
+    scores = ranking_metrics(
+        padded_rankings([predicted for predicted, _ in scored], max(cutoffs)),
+        relevance_csr([relevant for _, relevant in scored]),
+        cutoffs
+    )
+    query_seconds = [latency for _, _, latency in rows]
+    return scores, {"fit_seconds": fit_seconds, "query_seconds": query_seconds}
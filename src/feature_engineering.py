@@ -1,24 +1,84 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import hstack, csr_matrix, load_npz, save_npz
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.preprocessing import MinMaxScaler
 
-def prepare_location_features(locations_df):
-    locations_df['combined_features'] = (
+from src import config
+from src.instrumentation import instrumented
+
+FEATURE_COLUMNS = ['category', 'state', 'activities', 'places', 'num_activities', 'num_places']
+# Bump when the feature recipe below changes so older artifacts are not reused
+FEATURE_VERSION = "tfidf-english+minmax-v1"
+
+@instrumented("prepare_location_features")
+def prepare_location_features(locations_df, cache_dir=None):
+    # Fitted artifacts are cached under cache_dir, keyed by a hash of the location data; "" disables caching
+    cache_dir = config.FEATURE_CACHE_DIR if cache_dir is None else cache_dir
+    if cache_dir:
+        artifact_dir = os.path.join(cache_dir, location_features_hash(locations_df))
+        cached = load_location_features(artifact_dir)
+        if cached is not None:
+            return cached
+
+    combined_features = (
         locations_df['category'].fillna('') + ' ' +
         locations_df['state'].fillna('') + ' ' +
         locations_df['activities'].fillna('') + ' ' +
         locations_df['places'].fillna('')
     )
     tfidf = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = tfidf.fit_transform(locations_df['combined_features'])
-    
+    tfidf_matrix = tfidf.fit_transform(combined_features)
+
     # Changes Added ===========================================================================
     # Normalize numeric features
     scaler = MinMaxScaler()
     numeric_features = scaler.fit_transform(locations_df[['num_activities', 'num_places']])
-    
-    from scipy.sparse import hstack
-    final_matrix = hstack([tfidf_matrix, numeric_features])
+
+    final_matrix = hstack([tfidf_matrix, numeric_features], format='csr')
 
     # =========================================================================================
 
-    return final_matrix, tfidf
\ No newline at end of file
+    if cache_dir:
+        save_location_features(artifact_dir, final_matrix, tfidf)
+    return final_matrix, tfidf
+
+def location_features_hash(locations_df):
+    row_hashes = pd.util.hash_pandas_object(locations_df[FEATURE_COLUMNS], index=False).to_numpy()
+    digest = hashlib.sha256(FEATURE_VERSION.encode())
+    digest.update(np.ascontiguousarray(row_hashes).tobytes())
+    return digest.hexdigest()[:32]
+
+def save_location_features(artifact_dir, final_matrix, tfidf):
+    # Written to a staging directory and renamed, so a concurrent reader never sees partial artifacts
+    staging_dir = f"{artifact_dir}.tmp-{os.getpid()}"
+    os.makedirs(staging_dir, exist_ok=True)
+    terms = sorted(tfidf.vocabulary_, key=tfidf.vocabulary_.get)
+    with open(os.path.join(staging_dir, 'vocabulary.json'), 'w') as f:
+        json.dump(terms, f)
+    np.save(os.path.join(staging_dir, 'idf.npy'), tfidf.idf_)
+    save_npz(os.path.join(staging_dir, 'location_matrix.npz'), final_matrix)
+    try:
+        os.replace(staging_dir, artifact_dir)
+    except OSError:
+        # Another process published the same artifacts first
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+def load_location_features(artifact_dir):
+    try:
+        with open(os.path.join(artifact_dir, 'vocabulary.json')) as f:
+            terms = json.load(f)
+        idf = np.load(os.path.join(artifact_dir, 'idf.npy'))
+        final_matrix = csr_matrix(load_npz(os.path.join(artifact_dir, 'location_matrix.npz')))
+    except (OSError, ValueError):
+        return None
+    # Rebuild the fitted vectorizer from its vocabulary and IDF weights, without calling fit
+    tfidf = TfidfVectorizer(stop_words='english')
+    tfidf.vocabulary_ = {term: index for index, term in enumerate(terms)}
+    tfidf.idf_ = idf
+    return final_matrix, tfidf
@@ -1,12 +1,24 @@
-from src.utils import normalize_scores
+import numpy as np
 
-def combine_scores(content_df, collab_scores, user_id, reviews_df, weight_content=0.5, weight_collab=0.5):
-    # Adjust weights dynamically
-    num_reviews = len(reviews_df[reviews_df['user_id'] == user_id])
+from src.utils import normalize_scores, top_n_indices
+from src.instrumentation import instrumented
+
+def dynamic_weights(num_reviews, weight_content, weight_collab):
+    # Lean on content for users with few reviews and on CF for users with many
     if num_reviews < 3:
-        weight_content, weight_collab = 0.8, 0.2
-    elif num_reviews > 10:
-        weight_content, weight_collab = 0.3, 0.7
+        return 0.8, 0.2
+    if num_reviews > 10:
+        return 0.3, 0.7
+    return weight_content, weight_collab
+
+@instrumented("combine_scores")
+def combine_scores(content_df, collab_scores, user_id, reviews_df, weight_content=0.5, weight_collab=0.5, lookup=None, top_n=None):
+    # Adjust weights dynamically
+    if lookup is not None:
+        num_reviews = lookup.review_count(user_id)
+    else:
+        num_reviews = len(reviews_df[reviews_df['user_id'] == user_id])
+    weight_content, weight_collab = dynamic_weights(num_reviews, weight_content, weight_collab)
 
     content_df = content_df.copy()
     content_df["normalized_content"] = normalize_scores(content_df["content_score"])
@@ -24,4 +36,20 @@ def combine_scores(content_df, collab_scores, user_id, reviews_df, weight_conten
         weight_content * merged["normalized_content"] + weight_collab * merged["normalized_collab"]
     )
 
-    return merged.sort_values("hybrid_score", ascending=False)
+    # Highest hybrid score first; ties keep content_df order. top_n=None ranks every row.
+    top = top_n_indices(merged["hybrid_score"].to_numpy(), len(merged) if top_n is None else top_n)
+    return merged.iloc[top]
+
+def combine_score_arrays(content_scores, normalized_collab, num_reviews, weight_content=0.5, weight_collab=0.5, top_n=None):
+    # combine_scores on aligned arrays, without building or merging frames. content_scores holds the budget-filtered
+    # candidates in content-rank order; normalized_collab their normalised CF scores (NaN = no score).
+    # Returns the top positions into the candidate arrays with their normalised content/collab and hybrid scores.
+    weight_content, weight_collab = dynamic_weights(num_reviews, weight_content, weight_collab)
+    if len(content_scores) == 0:
+        empty = np.zeros(0)
+        return np.zeros(0, dtype=np.int64), empty, empty, empty
+    normalized_content = normalize_scores(content_scores)
+    normalized_collab = np.nan_to_num(normalized_collab, nan=0.0)
+    hybrid = weight_content * normalized_content + weight_collab * normalized_collab
+    top = top_n_indices(hybrid, len(hybrid) if top_n is None else top_n)
+    return top, normalized_content[top], normalized_collab[top], hybrid[top]
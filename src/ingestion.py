@@ -0,0 +1,316 @@
+import json
+import os
+import time
+
+import pandas as pd
+
+from src import config
+from src.instrumentation import Histogram, histogram_lines, instrumented
+from src.utils import data_fingerprint
+
+CHECKPOINT = "checkpoint.json"
+COMMITTED_LOG = "committed.jsonl"
+# Required fields per event type and how they are coerced
+EVENT_FIELDS = {
+    "review": {"user_id": int, "location_id": int, "rating": float},
+    "trip": {"user_id": int, "cost": float},
+    "user": {"user_id": int, "occupation": str, "location_type": str},
+}
+BUDGET_FLAGS = ["budget_under_25k", "budget_above_100k", "budget_25k_to_50k", "budget_50k_to_100k"]
+# Spellings read_csv parses as booleans in the users CSV
+FLAG_VALUES = {"True": True, "TRUE": True, "true": True, "False": False, "FALSE": False, "false": False}
+
+
+def parse_flag(value):
+    # JSON booleans or the CSV spellings; anything else (bool("false") would be True) is malformed
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value in FLAG_VALUES:
+        return FLAG_VALUES[value]
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+# Optional fields coerced when present; the engine decides whether a trip needs its location (update_columns)
+OPTIONAL_FIELDS = {"trip": {"location_id": int}, "user": {flag: parse_flag for flag in BUDGET_FLAGS}}
+# Freshness lag: event_time (or the moment the line was read) until recommend() sees the event
+LAG_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 3600.0)
+
+
+class EventError(ValueError):
+    pass
+
+
+def parse_event(line):
+    # One JSONL line -> event dict; "type" picks the table, "event_time" (epoch seconds) is optional
+    try:
+        event = json.loads(line)
+    except ValueError:
+        raise EventError("line is not valid JSON")
+    if not isinstance(event, dict):
+        raise EventError("each line must be a JSON object")
+    fields = EVENT_FIELDS.get(event.get("type"))
+    if fields is None:
+        raise EventError(f"unknown event type {event.get('type')!r}; expected one of {', '.join(EVENT_FIELDS)}")
+    missing = [field for field in fields if event.get(field) in (None, "")]
+    if missing:
+        raise EventError(f"{event['type']} event missing field(s): {', '.join(missing)}")
+    try:
+        for field, kind in fields.items():
+            event[field] = kind(event[field])
+        for field, kind in OPTIONAL_FIELDS.get(event["type"], {}).items():
+            if event.get(field) not in (None, ""):
+                event[field] = kind(event[field])
+        if event.get("event_time") is not None:
+            event["event_time"] = float(event["event_time"])
+    except (TypeError, ValueError):
+        raise EventError(f"{event['type']} event has a malformed {field}")
+    return event
+
+
+def read_events(path, offset=0):
+    # Generator of (end_offset, event) for every complete line from byte `offset` on; event is None for a line
+    # parse_event rejects. A last line without its newline is still being written and is left for the next read
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                event = parse_event(line)
+            except EventError:
+                event = None
+            yield offset, event
+
+
+def event_frames(events):
+    # (reviews_df, trips_df, users_df) for engine.update(); columns follow the CSVs, None for an empty table
+    tables = {kind: [] for kind in EVENT_FIELDS}
+    for event in events:
+        tables[event["type"]].append({name: value for name, value in event.items() if name not in ("type", "event_time")})
+    frames = {kind: pd.DataFrame(rows) if rows else None for kind, rows in tables.items()}
+    if frames["user"] is not None:
+        # A profile without budget flags gets no budget cap, not the smallest one (NaN would read as True)
+        for flag in BUDGET_FLAGS:
+            frames["user"][flag] = frames["user"].get(flag, pd.Series(False, index=frames["user"].index))
+            frames["user"][flag] = frames["user"][flag].fillna(False).astype(bool)
+    return frames["review"], frames["trip"], frames["user"]
+
+
+def read_checkpoint(checkpoint_dir):
+    try:
+        with open(os.path.join(checkpoint_dir, CHECKPOINT)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_checkpoint(checkpoint_dir, checkpoint):
+    # Replaced atomically: a crash leaves either the previous commit or this one
+    path = os.path.join(checkpoint_dir, CHECKPOINT)
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+class IngestionMetrics:
+    # Counters, throughput and a freshness-lag histogram, readable as a dict or as Prometheus text
+
+    def __init__(self):
+        self.applied = {kind: 0 for kind in EVENT_FIELDS}
+        self.rejected = 0
+        self.batches = 0
+        self.apply_seconds = 0.0
+        self.started = time.monotonic()
+        self.offset = 0
+        self.lag = Histogram(LAG_BUCKETS)
+
+    def observe_batch(self, events, read_times, apply_seconds, visible_at):
+        self.batches += 1
+        self.apply_seconds += apply_seconds
+        for event, read_at in zip(events, read_times):
+            self.applied[event["type"]] += 1
+            self.lag.observe(max(visible_at - (event.get("event_time") or read_at), 0.0))
+
+    def summary(self):
+        applied = sum(self.applied.values())
+        # No lag before the first applied event: null in /health rather than NaN, which is not valid JSON
+        observed = self.lag.count > 0
+        return {
+            "applied": dict(self.applied), "rejected": self.rejected, "batches": self.batches, "offset": self.offset,
+            # Sustained rate since start, and the rate update() alone could absorb
+            "events_per_second": applied / max(time.monotonic() - self.started, 1e-9),
+            "apply_events_per_second": applied / self.apply_seconds if self.apply_seconds else 0.0,
+            "lag_p50_seconds": self.lag.quantile(0.5) if observed else None,
+            "lag_p95_seconds": self.lag.quantile(0.95) if observed else None,
+            "lag_max_seconds": self.lag.max if observed else None,
+        }
+
+    def prometheus_text(self, prefix="recommender_ingestion"):
+        summary = self.summary()
+        lines = [f"# HELP {prefix}_events_total Events applied to the engine, by type",
+                 f"# TYPE {prefix}_events_total counter"]
+        lines += [f'{prefix}_events_total{{type="{kind}"}} {count}' for kind, count in self.applied.items()]
+        for name, kind, help_text, value in (
+            ("rejected_total", "counter", "Event lines that failed to parse or to apply", self.rejected),
+            ("batches_total", "counter", "engine.update() calls", self.batches),
+            ("committed_offset_bytes", "gauge", "Byte offset of the event file committed to the checkpoint", self.offset),
+            ("events_per_second", "gauge", "Events applied per second since start", summary["events_per_second"]),
+        ):
+            lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} {kind}", f"{prefix}_{name} {value!r}"]
+        lines += [f"# HELP {prefix}_freshness_lag_seconds Event time until recommend() sees the event",
+                  f"# TYPE {prefix}_freshness_lag_seconds histogram"]
+        lines += histogram_lines(f"{prefix}_freshness_lag_seconds", self.lag)
+        return "\n".join(lines) + "\n"
+
+
+class EventIngestor:
+    # Tails a JSONL event file into a fitted RecommenderEngine. Events are applied in micro-batches of at most
+    # max_batch, or once the oldest pending one has waited max_delay seconds. After each batch the applied events
+    # are appended to a committed log and the file offset is checkpointed, so recover() on a freshly fitted engine
+    # replays the log and resumes reading exactly where the last commit stopped.
+
+    def __init__(self, engine, events_path=None, checkpoint_dir=None, max_batch=None, max_delay=None):
+        self.engine = engine
+        self.events_path = events_path or config.EVENTS_PATH
+        self.checkpoint_dir = checkpoint_dir or config.INGEST_CHECKPOINT_DIR
+        self.max_batch = config.INGEST_MAX_BATCH if max_batch is None else max_batch
+        self.max_delay = config.INGEST_MAX_DELAY if max_delay is None else max_delay
+        self.metrics = IngestionMetrics()
+        self.fingerprint = None
+        # Fields each event type needs for this engine's update(), beyond what parse_event already checked
+        columns = engine.update_columns()
+        self._required = {"review": columns["reviews"], "trip": columns["trips"], "user": columns["users"]}
+        self._failed = None
+        self._read_offset = 0
+        self._log_bytes = 0
+        self._pending = []  # (event, time the line was read)
+
+    @property
+    def offset(self):
+        return self.metrics.offset
+
+    @instrumented("ingestion.recover")
+    def recover(self):
+        # Brings the engine up to the last commit; returns how many logged events were replayed. A checkpoint taken
+        # against different base data is refused, since its events may already be part of that data, and so is one
+        # for another events file, whose offset means nothing in this one
+        engine = self.engine
+        self.fingerprint = data_fingerprint((engine.locations_df, engine.trips_df, engine.users_df, engine.reviews_df))
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        checkpoint = read_checkpoint(self.checkpoint_dir)
+        log_path = os.path.join(self.checkpoint_dir, COMMITTED_LOG)
+        if checkpoint is None:
+            open(log_path, "wb").close()
+            self._commit_offsets(0, 0)
+            return 0
+        if checkpoint["fingerprint"] != self.fingerprint:
+            raise ValueError(f"{self.checkpoint_dir} was written against different base data; "
+                             f"delete it to ingest {self.events_path} from the start")
+        if checkpoint["events_path"] != os.path.abspath(self.events_path):
+            raise ValueError(f"{self.checkpoint_dir} tracks {checkpoint['events_path']}, not {self.events_path}; "
+                             f"use a separate checkpoint directory per events file")
+        # Anything logged after the last checkpoint belongs to a batch that never committed
+        with open(log_path, "ab") as f:
+            f.truncate(checkpoint["log_bytes"])
+        events = [event for _, event in read_events(log_path) if event is not None]
+        if events:
+            engine.update(*event_frames(events))
+        self._read_offset = self.metrics.offset = checkpoint["offset"]
+        self._log_bytes = checkpoint["log_bytes"]
+        return len(events)
+
+    def poll(self):
+        # Reads every complete line past the last read and applies the batches that are due; returns events applied
+        if self.fingerprint is None:
+            raise RuntimeError("EventIngestor.recover() must be called before poll()")
+        if self._failed is not None:
+            raise RuntimeError(f"a batch was applied but could not be committed ({self._failed}); restart to recover")
+        if os.path.exists(self.events_path) and os.path.getsize(self.events_path) < self._read_offset:
+            raise ValueError(f"{self.events_path} is shorter than the committed offset; was it truncated or rotated?")
+        applied = 0
+        for end_offset, event in read_events(self.events_path, self._read_offset):
+            self._read_offset = end_offset
+            if event is None or any(event.get(field) in (None, "") for field in self._required[event["type"]]):
+                self.metrics.rejected += 1
+            else:
+                self._pending.append((event, time.time()))
+            if len(self._pending) >= self.max_batch:
+                applied += self._apply()
+        if self._pending and time.time() - self._pending[0][1] >= self.max_delay:
+            applied += self._apply()
+        elif not self._pending and self._read_offset != self.metrics.offset:
+            self._commit_offsets(self._read_offset, self._log_bytes)  # only rejected lines since the last commit
+        return applied
+
+    def flush(self):
+        # Applies whatever is pending without waiting for max_delay
+        return self._apply() if self._pending else 0
+
+    def run(self, follow=False, poll_interval=None, stop=None):
+        # Drains the file (follow=False) or keeps tailing it until `stop` (a threading.Event) is set
+        poll_interval = config.INGEST_POLL_INTERVAL if poll_interval is None else poll_interval
+        while True:
+            self.poll()
+            if not follow or (stop is not None and stop.is_set()):
+                self.flush()
+                return self.metrics.summary()
+            if stop is not None:
+                stop.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+
+    @instrumented("ingestion.apply_batch")
+    def _apply(self):
+        batch = self._pending
+        start = time.perf_counter()
+        applied = self._update(batch)
+        apply_seconds = time.perf_counter() - start
+        visible_at = time.time()
+        self._pending = []
+        events = [event for event, _ in applied]
+        # Events update() refused even on their own are skipped like unparseable lines, so one cannot stall the file
+        self.metrics.rejected += len(batch) - len(applied)
+
+        # The engine is now ahead of the commit; a failed write leaves that to recover() after a restart
+        try:
+            log_path = os.path.join(self.checkpoint_dir, COMMITTED_LOG)
+            with open(log_path, "ab") as f:
+                f.write("".join(json.dumps(event) + "\n" for event in events).encode())
+                f.flush()
+                os.fsync(f.fileno())
+                log_bytes = f.tell()
+            self._commit_offsets(self._read_offset, log_bytes)
+        except OSError as error:
+            self._failed = f"{type(error).__name__}: {error}"
+            raise
+        if events:
+            self.metrics.observe_batch(events, [read_at for _, read_at in applied], apply_seconds, visible_at)
+        return len(events)
+
+    def _update(self, batch):
+        # Applies the batch and returns the (event, read_at) pairs that made it in. update() is all or nothing, so when
+        # it raises the batch is split in half and each half retried in order, down to the single failing events
+        try:
+            self.engine.update(*event_frames([event for event, _ in batch]))
+            return batch
+        except Exception:
+            if len(batch) == 1:
+                return []
+        middle = len(batch) // 2
+        return self._update(batch[:middle]) + self._update(batch[middle:])
+
+    def _commit_offsets(self, offset, log_bytes):
+        _write_checkpoint(self.checkpoint_dir, {
+            "events_path": os.path.abspath(self.events_path), "offset": offset, "log_bytes": log_bytes,
+            "fingerprint": self.fingerprint, "committed_at": time.time(),
+        })
+        self.metrics.offset, self._log_bytes = offset, log_bytes
@@ -0,0 +1,233 @@
+import bisect
+import contextlib
+import functools
+import json
+import math
+import os
+import threading
+import time
+import tracemalloc
+
+from src import config
+
+# Histogram upper bounds, Prometheus style (an implicit +Inf bucket follows the last one)
+SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+BYTES_BUCKETS = tuple(float(1024 * 4 ** i) for i in range(12))  # 1 KiB .. 4 GiB
+METRICS = {
+    "wall_seconds": ("Wall-clock time spent in the stage", SECONDS_BUCKETS),
+    "cpu_seconds": ("CPU time of the calling thread spent in the stage", SECONDS_BUCKETS),
+    "memory_peak_bytes": ("Peak traced allocation above the stage's starting point (tracemalloc)", BYTES_BUCKETS),
+}
+
+_STATE = {"enabled": False, "trace_memory": False, "started_tracemalloc": False}
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+# metric -> stage name -> Histogram
+_HISTOGRAMS = {metric: {} for metric in METRICS}
+_DISABLED = contextlib.nullcontext()
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        # bisect_left puts a value equal to a bound in that bound's bucket (le = "less or equal")
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # histogram_quantile(): linear interpolation inside the bucket holding the q-th observation, capped at max
+        if not self.count:
+            return math.nan
+        rank, cumulative = q * self.count, 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                if index == len(self.buckets):
+                    return self.max
+                lower = self.buckets[index - 1] if index else 0.0
+                estimate = lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+                return min(estimate, self.max)
+            cumulative += count
+        return self.max
+
+
+class _Stage:
+    __slots__ = ("name", "wall_start", "cpu_start", "tracing")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.tracing = _STATE["trace_memory"] and tracemalloc.is_tracing()
+        if self.tracing:
+            # tracemalloc keeps one process-wide peak; resetting it for this stage must not lose the enclosing
+            # stage's peak so far, so that is parked on a per-thread stack and merged back on exit
+            stack = _memory_stack()
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            stack.append([current, current])
+        self.cpu_start = time.thread_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.thread_time() - self.cpu_start
+        memory = None
+        if self.tracing:
+            stack = _memory_stack()
+            base, child_peak = stack.pop()
+            peak = max(tracemalloc.get_traced_memory()[1], child_peak)
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+            memory = peak - base
+        record(self.name, wall, cpu, memory)
+        return False
+
+
+def _memory_stack():
+    if not hasattr(_LOCAL, "memory_stack"):
+        _LOCAL.memory_stack = []
+    return _LOCAL.memory_stack
+
+
+def enable(trace_memory=False):
+    # tracemalloc slows every allocation down noticeably, so memory peaks are opt-in on top of timings
+    _STATE["enabled"] = True
+    _STATE["trace_memory"] = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _STATE["started_tracemalloc"] = True
+
+
+def disable():
+    _STATE["enabled"] = False
+    _STATE["trace_memory"] = False
+    if _STATE["started_tracemalloc"]:
+        tracemalloc.stop()
+        _STATE["started_tracemalloc"] = False
+
+
+def is_enabled():
+    return _STATE["enabled"]
+
+
+def reset():
+    with _LOCK:
+        for histograms in _HISTOGRAMS.values():
+            histograms.clear()
+
+
+def stage(name):
+    # with stage("recommend.content_scores"): ...  -- a shared no-op context while instrumentation is off
+    if not _STATE["enabled"]:
+        return _DISABLED
+    return _Stage(name)
+
+
+def instrumented(name=None):
+    # Decorator form of stage(); the stage is named after the function unless given a name
+    def decorate(fn):
+        stage_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _STATE["enabled"]:
+                return fn(*args, **kwargs)
+            with _Stage(stage_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record(name, wall_seconds, cpu_seconds, memory_peak_bytes=None):
+    values = {"wall_seconds": wall_seconds, "cpu_seconds": cpu_seconds, "memory_peak_bytes": memory_peak_bytes}
+    with _LOCK:
+        for metric, value in values.items():
+            if value is None:
+                continue
+            histograms = _HISTOGRAMS[metric]
+            if name not in histograms:
+                histograms[name] = Histogram(METRICS[metric][1])
+            histograms[name].observe(value)
+
+
+def summary():
+    # {stage: {metric: {count, sum, mean, max, p50, p95, p99}}}; quantiles are bucket estimates
+    with _LOCK:
+        result = {}
+        for metric, histograms in _HISTOGRAMS.items():
+            for name, histogram in histograms.items():
+                result.setdefault(name, {})[metric] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "mean": histogram.sum / histogram.count,
+                    "max": histogram.max,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                }
+    return dict(sorted(result.items()))
+
+
+def prometheus_text(prefix="recommender_stage"):
+    # Text exposition format: one histogram family per metric, labelled by stage
+    lines = []
+    with _LOCK:
+        for metric, (help_text, _) in METRICS.items():
+            if not _HISTOGRAMS[metric]:
+                continue
+            family = f"{prefix}_{metric}"
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} histogram")
+            for name, histogram in sorted(_HISTOGRAMS[metric].items()):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.extend(histogram_lines(family, histogram, f'stage="{label}"'))
+    return "\n".join(lines) + "\n"
+
+
+def histogram_lines(family, histogram, labels=""):
+    # Cumulative _bucket samples plus _sum and _count; labels is an already-escaped 'name="value"' list or ""
+    lines, cumulative = [], 0
+    bucket_labels = f"{labels}," if labels else ""
+    sample_labels = f"{{{labels}}}" if labels else ""
+    for bound, count in zip(histogram.buckets + (math.inf,), histogram.counts):
+        cumulative += count
+        le = "+Inf" if bound == math.inf else repr(bound)
+        lines.append(f'{family}_bucket{{{bucket_labels}le="{le}"}} {cumulative}')
+    lines.append(f"{family}_sum{sample_labels} {histogram.sum!r}")
+    lines.append(f"{family}_count{sample_labels} {histogram.count}")
+    return lines
+
+
+def export(output_dir=None):
+    # Writes stages.prom (Prometheus text, e.g. for node_exporter's textfile collector) and stages.json
+    output_dir = output_dir or config.INSTRUMENTATION_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {"prometheus": os.path.join(output_dir, "stages.prom"), "json": os.path.join(output_dir, "stages.json")}
+    _write_atomic(paths["prometheus"], prometheus_text())
+    _write_atomic(paths["json"], json.dumps(summary(), indent=2))
+    return paths
+
+
+def _write_atomic(path, text):
+    # Scrapers never read a half-written file
+    staging_path = f"{path}.tmp-{os.getpid()}"
+    with open(staging_path, "w") as f:
+        f.write(text)
+    os.replace(staging_path, path)
+
+
+if config.INSTRUMENT_STAGES:
+    enable(trace_memory=config.INSTRUMENT_MEMORY)
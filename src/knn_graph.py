@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+
+class UserKNNGraph:
+    # Precomputed top-k neighbours per user: int32 neighbour rows (-1 = padding) and float32 cosine weights
+
+    def __init__(self, user_ids, neighbor_rows, weights):
+        self.user_ids = np.asarray(user_ids)
+        self.neighbor_rows = np.asarray(neighbor_rows, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.user_index = {user_id: row for row, user_id in enumerate(self.user_ids.tolist())}
+
+    @property
+    def k(self):
+        return self.neighbor_rows.shape[1]
+
+    def __contains__(self, user_id):
+        return user_id in self.user_index
+
+    def neighbors(self, user_id):
+        # Same shape as get_top_k_similar_users: Series of similarity indexed by neighbour user_id
+        row = self.user_index.get(user_id)
+        if row is None:
+            return None
+        rows = self.neighbor_rows[row]
+        valid = rows >= 0
+        return pd.Series(
+            self.weights[row][valid].astype(float),
+            index=pd.Index(self.user_ids[rows[valid]], name="user_id")
+        )
+
+    def save(self, path):
+        np.savez(path, user_ids=self.user_ids, neighbor_rows=self.neighbor_rows, weights=self.weights)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(arrays["user_ids"], arrays["neighbor_rows"], arrays["weights"])
+
+
+def build_user_knn_graph(interactions, k=5, block_size=1024):
+    # Blocked all-pairs cosine: only a (block_size x num_users) similarity slab is alive at any time
+    normalized = interactions.normalized
+    num_users = normalized.shape[0]
+    k_effective = min(k, max(num_users - 1, 0))
+
+    neighbor_rows = np.full((num_users, k), -1, dtype=np.int32)
+    weights = np.zeros((num_users, k), dtype=np.float32)
+    if k_effective == 0:
+        return UserKNNGraph(interactions.user_ids, neighbor_rows, weights)
+    # Slab columns run in user_id order (rows appended by updates are not), so a lower column is a lower user_id
+    id_order = np.argsort(interactions.user_ids, kind="stable")
+    id_rank = np.empty_like(id_order)
+    id_rank[id_order] = np.arange(num_users)
+    normalized_t = normalized[id_order].T.tocsr()
+
+    for start in range(0, num_users, block_size):
+        stop = min(start + block_size, num_users)
+        similarities = (normalized[start:stop] @ normalized_t).toarray()
+        block_rows = np.arange(stop - start)
+        similarities[block_rows, id_rank[start:stop]] = -np.inf
+
+        candidates = np.argpartition(-similarities, k_effective - 1, axis=1)[:, :k_effective]
+        candidate_scores = np.take_along_axis(similarities, candidates, axis=1)
+        # Users tied at the k-th similarity are taken lowest user_id first, as get_top_k_similar_users does:
+        # add the first k tied columns of every row, then keep the best k by (similarity, column)
+        kth = candidate_scores.min(axis=1, keepdims=True)
+        tied = similarities == kth
+        first_tied = np.empty_like(candidates)
+        missing = np.zeros(candidates.shape, dtype=bool)
+        for slot in range(k_effective):
+            first_tied[:, slot] = tied.argmax(axis=1)
+            missing[:, slot] = ~tied[block_rows, first_tied[:, slot]]
+            tied[block_rows, first_tied[:, slot]] = False
+        # Drop rows' unfilled slots and tied columns the partition already picked, so no user is counted twice
+        repeated = missing | (first_tied[:, :, None] == candidates[:, None, :]).any(axis=2)
+        pool = np.concatenate([candidates, np.where(repeated, num_users, first_tied)], axis=1)
+        pool_scores = np.concatenate([candidate_scores, np.where(repeated, -np.inf, kth)], axis=1)
+        # Highest similarity first, lower user_id first on ties
+        order = np.lexsort((pool, -pool_scores), axis=1)[:, :k_effective]
+        neighbor_rows[start:stop, :k_effective] = id_order[np.take_along_axis(pool, order, axis=1)]
+        weights[start:stop, :k_effective] = np.take_along_axis(pool_scores, order, axis=1)
+
+    return UserKNNGraph(interactions.user_ids, neighbor_rows, weights)
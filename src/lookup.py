@@ -0,0 +1,97 @@
+import numpy as np
+
+from src.utils import get_budget_limits
+
+
+def _dense_index(ids):
+    # id -> row as a flat array (-1 = unknown) when ids are small non-negative integers, else a dict
+    ids = np.asarray(ids)
+    if ids.dtype.kind in "iu" and (len(ids) == 0 or (ids.min() >= 0 and ids.max() < 4 * len(ids) + 1024)):
+        index = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int64)
+        index[ids] = np.arange(len(ids))
+        return index
+    return {value: row for row, value in enumerate(ids.tolist())}
+
+
+def _rows_of(index, ids):
+    ids = np.asarray(ids)
+    if isinstance(index, dict):
+        return np.array([index.get(value, -1) for value in ids.tolist()], dtype=np.int64)
+    rows = np.full(len(ids), -1, dtype=np.int64)
+    if ids.dtype.kind in "iu":
+        in_range = (ids >= 0) & (ids < len(index))
+        rows[in_range] = index[ids[in_range]]
+    return rows
+
+
+def _row_of(index, value):
+    if isinstance(index, dict):
+        return index.get(value, -1)
+    try:
+        return int(index[value]) if 0 <= value < len(index) else -1
+    except (TypeError, IndexError):
+        return -1
+
+
+class LookupTables:
+    # Precomputed id -> row arrays and per-user aggregates, so per-request lookups are O(1)
+    # array reads instead of boolean-mask scans over users_df / reviews_df
+
+    def __init__(self, users_df, reviews_df, locations_df=None):
+        # First row per user wins, as users_df[users_df['user_id'] == user_id].iloc[0] did
+        self.users_df = users_df.drop_duplicates("user_id").reset_index(drop=True)
+        self.reviews_df = reviews_df.reset_index(drop=True)
+        self._user_row = _dense_index(self.users_df["user_id"].to_numpy())
+        # get_budget_limits is keyed (and sorted) by user_id; the caps follow users_df rows like _user_row
+        self.budget_caps = get_budget_limits(self.users_df).reindex(self.users_df["user_id"]).to_numpy(dtype=float)
+
+        # Reviews grouped by user row, CSR style: the reviews of row r are review_order[indptr[r]:indptr[r + 1]].
+        # Reviews from users missing in users_df are only reachable through review_count/user_reviews.
+        review_user_ids = self.reviews_df["user_id"].to_numpy()
+        self.review_user_ids = np.union1d(self.users_df["user_id"].to_numpy(), review_user_ids)
+        self._review_user_row = _dense_index(self.review_user_ids)
+        review_rows = _rows_of(self._review_user_row, review_user_ids)
+        self.review_order = np.argsort(review_rows, kind="stable")
+        self.review_counts = np.bincount(review_rows, minlength=len(self.review_user_ids))
+        self.review_indptr = np.concatenate([[0], np.cumsum(self.review_counts)])
+
+        self.locations_df = None if locations_df is None else locations_df.reset_index(drop=True)
+        self._location_row = None if locations_df is None else _dense_index(self.locations_df["location_id"].to_numpy())
+
+    def __contains__(self, user_id):
+        return self.user_row(user_id) >= 0
+
+    def user_row(self, user_id):
+        return _row_of(self._user_row, user_id)
+
+    def user_rows(self, user_ids):
+        return _rows_of(self._user_row, user_ids)
+
+    def location_row(self, location_id):
+        return _row_of(self._location_row, location_id)
+
+    def location_rows(self, location_ids):
+        return _rows_of(self._location_row, location_ids)
+
+    def user_metadata(self, user_id):
+        row = self.user_row(user_id)
+        if row < 0:
+            raise KeyError(user_id)
+        return self.users_df.iloc[row]
+
+    def budget_limit(self, user_id):
+        row = self.user_row(user_id)
+        if row < 0:
+            raise KeyError(user_id)
+        cap = self.budget_caps[row]
+        return int(cap) if np.isfinite(cap) else float('inf')
+
+    def review_count(self, user_id):
+        row = _row_of(self._review_user_row, user_id)
+        return int(self.review_counts[row]) if row >= 0 else 0
+
+    def user_reviews(self, user_id):
+        row = _row_of(self._review_user_row, user_id)
+        if row < 0:
+            return self.reviews_df.iloc[:0]
+        return self.reviews_df.iloc[self.review_order[self.review_indptr[row]:self.review_indptr[row + 1]]]
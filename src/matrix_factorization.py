@@ -0,0 +1,172 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from src import config
+from src.collaborative_filtering import _as_sparse_interactions
+from src.instrumentation import instrumented
+from src.utils import data_fingerprint
+
+# Largest block of factor outer products (or normal-equation matrices) _solve_factors holds at once, in values
+BLOCK_VALUES = 1 << 22
+
+
+class ALSModel:
+    # Latent factors from alternating least squares: float32 user and location factors whose rows follow user_ids /
+    # location_ids. A user's predicted ratings are one dense product, item_factors @ user_factors[row].
+    # fingerprint identifies the ratings the factors were trained on (training_fingerprint), when known
+
+    def __init__(self, user_ids, location_ids, user_factors, item_factors, regularization=None, fingerprint=None):
+        self.user_ids = np.asarray(user_ids)
+        self.location_ids = np.asarray(location_ids)
+        self.user_factors = np.asarray(user_factors, dtype=np.float32)
+        self.item_factors = np.asarray(item_factors, dtype=np.float32)
+        self.regularization = config.ALS_REGULARIZATION if regularization is None else float(regularization)
+        self.fingerprint = fingerprint
+        self.user_index = {user_id: row for row, user_id in enumerate(self.user_ids.tolist())}
+        self.location_index = {location_id: row for row, location_id in enumerate(self.location_ids.tolist())}
+
+    @property
+    def rank(self):
+        return self.item_factors.shape[1]
+
+    def __contains__(self, user_id):
+        return user_id in self.user_index
+
+    def save(self, path):
+        np.savez(path, user_ids=self.user_ids, location_ids=self.location_ids, user_factors=self.user_factors,
+                 item_factors=self.item_factors, regularization=self.regularization,
+                 fingerprint=np.array(self.fingerprint or ""))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            fingerprint = str(arrays["fingerprint"]) if "fingerprint" in arrays.files else ""
+            return cls(arrays["user_ids"], arrays["location_ids"], arrays["user_factors"], arrays["item_factors"],
+                       float(arrays["regularization"]), fingerprint or None)
+
+
+def training_fingerprint(reviews_df):
+    # Content hash of the ratings ALS trains on; review text and other columns do not change the factors
+    return data_fingerprint([reviews_df[["user_id", "location_id", "rating"]]])
+
+
+def load_als_model(path, reviews_df):
+    # Factors saved by train_als_model.py, or None when there is no file. Factors trained on other ratings are
+    # refused rather than aligned, since they would serve stale predictions for every user whose ratings changed
+    if not path or not os.path.exists(path):
+        return None
+    model = ALSModel.load(path)
+    if model.fingerprint != training_fingerprint(reviews_df):
+        raise ValueError(f"{path} was trained on different reviews; rerun train_als_model.py or delete it")
+    return model
+
+
+def _solve_factors(ratings, fixed, regularization):
+    # One ALS half-step: for every row u of `ratings` (CSR), x_u = argmin sum_j (r_uj - x_u . f_j)^2 + lambda n_u |x_u|^2
+    # over its rated columns j (ALS-WR: the penalty grows with the row's rating count). Each row's normal matrix
+    # sum_j f_j f_j^T is a sparse product of the rated-indicator matrix with the flattened outer products f_j f_j^T,
+    # built a block of rows x a block of columns at a time, then every row in the block is solved in one batched call.
+    rank = fixed.shape[1]
+    num_rows, num_columns = ratings.shape
+    rated = ratings.copy()
+    rated.data = np.ones_like(rated.data, dtype=np.float32)
+    rhs = np.asarray(ratings @ fixed, dtype=np.float32)
+    factors = np.zeros((num_rows, rank), dtype=np.float32)
+    identity = np.eye(rank, dtype=np.float32)
+    block = max(BLOCK_VALUES // (rank * rank), 1)
+
+    for start in range(0, num_rows, block):
+        stop = min(start + block, num_rows)
+        rows = rated[start:stop]
+        counts = np.diff(rows.indptr)
+        gram = np.zeros((stop - start, rank * rank), dtype=np.float32)
+        for column_start in range(0, num_columns, block):
+            part = fixed[column_start:column_start + block]
+            outer = (part[:, :, None] * part[:, None, :]).reshape(len(part), rank * rank)
+            gram += (rows if num_columns <= block else rows[:, column_start:column_start + block]) @ outer
+        solve = np.nonzero(counts)[0]
+        if len(solve):
+            normal = gram[solve].reshape(len(solve), rank, rank)
+            normal += regularization * counts[solve, None, None].astype(np.float32) * identity
+            factors[start + solve] = np.linalg.solve(normal, rhs[start + solve, :, None])[:, :, 0]
+    return factors
+
+
+@instrumented("train_als")
+def train_als(interaction_matrix, rank=None, regularization=None, iterations=None, seed=42):
+    # Explicit-feedback ALS on the observed ratings only; rows/columns follow the interaction matrix
+    interactions = _as_sparse_interactions(interaction_matrix)
+    rank = config.ALS_RANK if rank is None else rank
+    regularization = config.ALS_REGULARIZATION if regularization is None else regularization
+    iterations = config.ALS_ITERATIONS if iterations is None else iterations
+
+    ratings = csr_matrix(interactions.matrix, dtype=np.float32)
+    ratings_t = ratings.T.tocsr()
+    rng = np.random.default_rng(seed)
+    item_factors = rng.normal(0.0, 1.0 / np.sqrt(rank), size=(ratings.shape[1], rank)).astype(np.float32)
+    user_factors = np.zeros((ratings.shape[0], rank), dtype=np.float32)
+    for _ in range(iterations):
+        user_factors = _solve_factors(ratings, item_factors, regularization)
+        item_factors = _solve_factors(ratings_t, user_factors, regularization)
+    return ALSModel(interactions.user_ids, interactions.location_ids, user_factors, item_factors, regularization)
+
+
+@instrumented("align_als_model")
+def align_als_model(model, interaction_matrix, refresh_users=()):
+    # Model whose rows follow the interaction matrix. Known factors are kept; locations the model has not seen are
+    # solved against the user factors, then unseen users and refresh_users (e.g. after update()) against the items
+    interactions = _as_sparse_interactions(interaction_matrix)
+    ratings = csr_matrix(interactions.matrix, dtype=np.float32)
+
+    user_factors = np.zeros((len(interactions.user_ids), model.rank), dtype=np.float32)
+    known_users = np.array([model.user_index.get(user_id, -1) for user_id in interactions.user_ids.tolist()], dtype=np.int64)
+    user_factors[known_users >= 0] = model.user_factors[known_users[known_users >= 0]]
+    item_factors = np.zeros((len(interactions.location_ids), model.rank), dtype=np.float32)
+    known_items = np.array([model.location_index.get(location_id, -1) for location_id in interactions.location_ids.tolist()], dtype=np.int64)
+    item_factors[known_items >= 0] = model.item_factors[known_items[known_items >= 0]]
+
+    new_items = np.nonzero(known_items < 0)[0]
+    if len(new_items):
+        item_factors[new_items] = _solve_factors(ratings.T.tocsr()[new_items], user_factors, model.regularization)
+    solve_users = known_users < 0
+    solve_users[[interactions.user_index[user_id] for user_id in refresh_users if user_id in interactions.user_index]] = True
+    solve_users = np.nonzero(solve_users)[0]
+    if len(solve_users):
+        user_factors[solve_users] = _solve_factors(ratings[solve_users], item_factors, model.regularization)
+    return ALSModel(interactions.user_ids, interactions.location_ids, user_factors, item_factors, model.regularization)
+
+
+def als_rmse(model, interaction_matrix):
+    # Root mean squared error of the model on the observed ratings of an aligned interaction matrix
+    matrix = _as_sparse_interactions(interaction_matrix).matrix.tocoo()
+    predictions = np.einsum("ij,ij->i", model.user_factors[matrix.row], model.item_factors[matrix.col])
+    return float(np.sqrt(np.mean((matrix.data - predictions) ** 2))) if matrix.nnz else 0.0
+
+
+def predict_als_rating_array(interactions, model, target_user_id):
+    # Array form of predict_als_ratings: (scores per column, unseen mask), or None for an unknown user.
+    # The model must be aligned with interactions (align_als_model)
+    row = interactions.user_index.get(target_user_id)
+    if row is None:
+        return None
+    prediction_scores = (model.item_factors @ model.user_factors[row]).astype(float)
+    unseen = np.ones(len(prediction_scores), dtype=bool)
+    unseen[interactions.matrix.indices[interactions.matrix.indptr[row]:interactions.matrix.indptr[row + 1]]] = False
+    return prediction_scores, unseen
+
+
+@instrumented("predict_als_ratings")
+def predict_als_ratings(interaction_matrix, model, target_user_id):
+    # Score each unseen location by the dot product of the user's and the location's latent factors
+    interactions = _as_sparse_interactions(interaction_matrix)
+    predictions = predict_als_rating_array(interactions, model, target_user_id)
+    if predictions is None:
+        return pd.Series(dtype=float)
+    prediction_scores, unseen = predictions
+    prediction_scores = pd.Series(
+        prediction_scores[unseen], index=pd.Index(interactions.location_ids[unseen], name="location_id")
+    )
+    return prediction_scores.sort_values(ascending=False)
@@ -0,0 +1,116 @@
+from functools import lru_cache
+from itertools import chain
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+METRICS = ("precision", "recall", "ndcg", "hit_rate")
+
+
+# Scalar reference implementations, one user at a time
+def precision_at_k(recommended, relevant, k):
+    if not recommended:
+        return 0.0
+    recommended_k = recommended[:k]
+    relevant_set = set(relevant)
+    hits = sum(1 for item in recommended_k if item in relevant_set)
+    return hits / k
+
+def recall_at_k(recommended, relevant, k):
+    if not relevant:
+        return 0.0
+    recommended_k = recommended[:k]
+    relevant_set = set(relevant)
+    hits = sum(1 for item in recommended_k if item in relevant_set)
+    return hits / len(relevant_set)
+
+def ndcg_at_k(recommended, relevant, k):
+    dcg = 0.0
+    for i, item in enumerate(recommended[:k]):
+        if item in relevant:
+            dcg += 1 / np.log2(i + 2)
+    idcg = sum(1 / np.log2(i + 2) for i in range(min(len(relevant), k)))
+    return dcg / idcg if idcg != 0 else 0.0
+
+def hit_rate_at_k(recommended, relevant, k):
+    return int(any(item in relevant for item in recommended[:k]))
+
+SCALAR_METRICS = {"precision": precision_at_k, "recall": recall_at_k, "ndcg": ndcg_at_k, "hit_rate": hit_rate_at_k}
+
+
+# Vectorised versions over every user and cutoff at once
+@lru_cache(maxsize=None)
+def discount_table(max_k):
+    # 1 / log2(rank + 1) for ranks 1..max_k
+    return 1 / np.log2(np.arange(max_k) + 2)
+
+@lru_cache(maxsize=None)
+def ideal_dcg_table(max_k):
+    # ideal_dcg_table(k)[n] is the best DCG with n relevant items in the top k
+    return np.concatenate([[0.0], np.cumsum(discount_table(max_k))])
+
+def relevance_csr(relevant_lists):
+    # users x items 0/1 CSR from per-user lists of non-negative integer ids; repeated ids collapse to one
+    lengths = np.array([len(items) for items in relevant_lists], dtype=np.int64)
+    rows = np.repeat(np.arange(len(relevant_lists)), lengths)
+    cols = np.fromiter(chain.from_iterable(relevant_lists), dtype=np.int64, count=int(lengths.sum()))
+    num_items = int(cols.max()) + 1 if cols.size else 0
+    relevance = csr_matrix((np.ones(len(cols)), (rows, cols)), shape=(len(relevant_lists), num_items))
+    relevance.sum_duplicates()
+    relevance.data[:] = 1.0
+    return relevance
+
+def padded_rankings(recommended_lists, width, pad=-1):
+    # (users x width) int64 matrix of recommended ids, padded with `pad`
+    truncated = [list(items)[:width] for items in recommended_lists]
+    lengths = np.array([len(items) for items in truncated], dtype=np.int64)
+    rankings = np.full((len(truncated), width), pad, dtype=np.int64)
+    if lengths.sum():
+        rows = np.repeat(np.arange(len(truncated)), lengths)
+        cols = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        rankings[rows, cols] = np.fromiter(chain.from_iterable(truncated), dtype=np.int64, count=int(lengths.sum()))
+    return rankings
+
+def hit_matrix(rankings, relevance):
+    # rankings[u, i] in the relevant set of user u; one searchsorted over (row, id) keys instead of per-user sets.
+    # Ids outside the relevance columns (including negative padding) never hit.
+    relevance = csr_matrix(relevance)
+    relevance.sort_indices()
+    width = relevance.shape[1] + 1
+    rows = np.repeat(np.arange(relevance.shape[0], dtype=np.int64), np.diff(relevance.indptr))
+    relevant_keys = rows * width + relevance.indices
+    valid = (rankings >= 0) & (rankings < relevance.shape[1])
+    ranking_keys = np.arange(rankings.shape[0], dtype=np.int64)[:, None] * width + np.where(valid, rankings, 0)
+    positions = np.searchsorted(relevant_keys, ranking_keys).clip(max=max(len(relevant_keys) - 1, 0))
+    return valid & (relevant_keys[positions] == ranking_keys) if len(relevant_keys) else np.zeros(rankings.shape, bool)
+
+def first_occurrences(rankings):
+    # False where an id already appeared earlier in the same row
+    order = np.argsort(rankings, axis=1, kind="stable")
+    sorted_ids = np.take_along_axis(rankings, order, axis=1)
+    repeated = np.zeros(rankings.shape, dtype=bool)
+    np.put_along_axis(repeated, order[:, 1:], sorted_ids[:, 1:] == sorted_ids[:, :-1], axis=1)
+    return ~repeated
+
+def ranking_metrics(rankings, relevance, cutoffs):
+    # Every metric at every cutoff for all users: {"<metric>@<k>": (users,) array}. Same values as the scalar
+    # functions with each user's relevant ids de-duplicated and a repeated recommendation only hitting at its
+    # first position; rows are padded up to the largest cutoff.
+    max_k = max(cutoffs)
+    if rankings.shape[1] < max_k:
+        rankings = np.hstack([rankings, np.full((rankings.shape[0], max_k - rankings.shape[1]), -1, np.int64)])
+    rankings = rankings[:, :max_k]
+    hits = hit_matrix(rankings, relevance) & first_occurrences(rankings)
+    hit_counts = np.cumsum(hits, axis=1)
+    dcg = np.cumsum(np.where(hits, discount_table(max_k), 0.0), axis=1)
+    num_relevant = np.diff(csr_matrix(relevance).indptr)
+    ideal_dcg = ideal_dcg_table(max_k)
+
+    results = {}
+    for k in cutoffs:
+        hits_k, idcg = hit_counts[:, k - 1], ideal_dcg[np.minimum(num_relevant, k)]
+        results[f"precision@{k}"] = hits_k / k
+        results[f"recall@{k}"] = np.divide(hits_k, num_relevant, out=np.zeros(len(hits_k)), where=num_relevant > 0)
+        results[f"ndcg@{k}"] = np.divide(dcg[:, k - 1], idcg, out=np.zeros(len(hits_k)), where=idcg != 0)
+        results[f"hit_rate@{k}"] = (hits_k > 0).astype(np.int64)
+    return results
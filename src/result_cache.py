@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+
+from src import config
+
+
+class ResultCache:
+    # Process-wide LRU cache with a time-to-live, shared by every session and thread; counts hits and misses
+
+    def __init__(self, max_entries=None, ttl_seconds=None, clock=time.monotonic):
+        self.max_entries = config.RESULT_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl_seconds = config.RESULT_CACHE_TTL if ttl_seconds is None else ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key, usable=None):
+        # An entry that `usable(value)` rejects counts as a miss; the caller is expected to put() a replacement
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None or (usable is not None and not usable(entry[1])):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "evictions": self.evictions, "expirations": self.expirations}
+
+
+def recommend_cached(cache, engine, user_id, category, state, budget=None, top_n=10, depth=None):
+    # engine.recommend() through the cache. Entries hold a ranking at least `depth` long, keyed on the query and
+    # engine.version (so update()/fit() retire them); a smaller top_n is a prefix of the same deterministic ranking,
+    # so changing only top_n is served by slicing. The returned frame is shared: copy it before modifying it.
+    depth = max(config.RESULT_CACHE_DEPTH if depth is None else depth, top_n)
+    key = (user_id, category, state, budget, engine.version)
+    # None (unknown user) is final; a ranking shorter than the depth it was asked for already holds every candidate
+    cached = cache.get(key, usable=lambda entry: entry[1] is None or top_n <= entry[0] or len(entry[1]) < entry[0])
+    if cached is not None:
+        ranking = cached[1]
+        return None if ranking is None else ranking.head(top_n)
+    ranking = engine.recommend(user_id, category, state, budget=budget, top_n=depth)
+    cache.put(key, (depth, ranking))
+    return None if ranking is None else ranking.head(top_n)
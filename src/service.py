@@ -0,0 +1,327 @@
+import asyncio
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from src import config, instrumentation
+from src.instrumentation import instrumented
+
+MAX_TOP_N = 100
+MAX_BATCH_QUERIES = 1000
+MAX_BODY_BYTES = 1 << 20
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_query(payload):
+    # One recommendation query from a JSON object or URL parameters; budget and top_n are optional
+    if not isinstance(payload, dict):
+        raise RequestError(400, "each query must be a JSON object")
+    missing = [field for field in ("user_id", "category", "state") if payload.get(field) in (None, "")]
+    if missing:
+        raise RequestError(400, f"missing field(s): {', '.join(missing)}")
+    user_id = _parse_integer(payload["user_id"], "user_id")
+    top_n = config.TOP_K if payload.get("top_n") in (None, "") else _parse_integer(payload["top_n"], "top_n")
+    if not 1 <= top_n <= MAX_TOP_N:
+        raise RequestError(400, f"top_n must be between 1 and {MAX_TOP_N}")
+    budget = None if payload.get("budget") in (None, "") else _parse_budget(payload["budget"])
+    return {"user_id": user_id, "category": str(payload["category"]), "state": str(payload["state"]),
+            "budget": budget, "top_n": top_n}
+
+
+def _parse_integer(value, field):
+    # JSON integers (or integral floats such as 7.0) and base-10 strings from URL parameters; never truncates
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise RequestError(400, f"{field} must be an integer")
+
+
+def _parse_budget(value):
+    # NaN or infinite budgets are refused: recommend() and recommend_batch() would read NaN differently
+    try:
+        budget = float(value)
+    except (TypeError, ValueError):
+        budget = math.nan
+    if isinstance(value, bool) or not math.isfinite(budget):
+        raise RequestError(400, "budget must be a finite number")
+    return budget
+
+
+class RecommendationService:
+    # Micro-batching front end for a fitted RecommenderEngine. Queries that arrive within `window` seconds of the
+    # first waiting one (up to max_batch) are scored together by one recommend_batch() call (recommend() for a batch
+    # of one) on a worker thread, so the event loop keeps accepting requests while a batch is computed. With an
+    # EventIngestor, new events are polled onto the same worker between batches.
+
+    def __init__(self, engine, window=0.002, max_batch=256, ingestor=None, poll_interval=None):
+        self.engine = engine
+        self.window = window
+        self.max_batch = max_batch
+        self.ingestor = ingestor
+        self.poll_interval = config.INGEST_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.stats = {"requests": 0, "queries": 0, "batches": 0}
+        # One worker: batches and engine updates run one at a time, so the engine is never touched concurrently
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._queue = None
+        self._batch_task = None
+        self._ingest_task = None
+        self._ingest_error = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._batch_task = asyncio.create_task(self._batch_loop())
+        if self.ingestor is not None:
+            self._ingest_task = asyncio.create_task(self._ingest_loop())
+
+    async def stop(self):
+        for task in (self._batch_task, self._ingest_task):
+            if task is not None:
+                task.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def recommend(self, query):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, future))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            if self.window > 0 and self._queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(self._executor, self.score_batch, [query for query, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.stats["batches"] += 1
+            self.stats["queries"] += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def _ingest_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(self._executor, self.ingestor.poll)
+                self._ingest_error = None
+            except Exception as error:
+                # Reported on /health; serving carries on with the last applied state
+                self._ingest_error = f"{type(error).__name__}: {error}"
+            await asyncio.sleep(self.poll_interval)
+
+    @instrumented("service.score_batch")
+    def score_batch(self, queries):
+        # Recommendation lists aligned with queries (None for unknown users). recommend_batch() keys its rows on
+        # user_id, so a user asking twice in one batch is scored again in a later round
+        results = [None] * len(queries)
+        pending = list(range(len(queries)))
+        while pending:
+            seen, current, later = set(), [], []
+            for index in pending:
+                user_id = queries[index]["user_id"]
+                (later if user_id in seen else current).append(index)
+                seen.add(user_id)
+            for index, recommendations in zip(current, self._score_round([queries[index] for index in current])):
+                results[index] = recommendations
+            pending = later
+        return results
+
+    def _score_round(self, queries):
+        engine = self.engine
+        if len(queries) == 1:
+            # A lone query is cheaper through recommend() than through a one-row block; both rank identically
+            query = queries[0]
+            recs = engine.recommend(query["user_id"], query["category"], query["state"], budget=query["budget"],
+                                    top_n=query["top_n"])
+            if recs is None:
+                return [None]
+            recs = recs.assign(user_id=query["user_id"])
+        else:
+            # Rankings are deterministic, so each query's top_n is a prefix of the batch's largest top_n
+            recs = engine.recommend_batch(
+                [query["user_id"] for query in queries],
+                [query["category"] for query in queries],
+                [query["state"] for query in queries],
+                budgets=[np.nan if query["budget"] is None else query["budget"] for query in queries],
+                top_n=max(query["top_n"] for query in queries)
+            )
+        rows = engine.lookup.location_rows(recs["location_id"].to_numpy())
+        columns = {
+            "location_id": recs["location_id"].to_numpy().tolist(),
+            "location_name": engine.locations_df["location_name"].to_numpy()[rows].tolist(),
+            "state": engine.locations_df["state"].to_numpy()[rows].tolist(),
+            "category": engine.locations_df["category"].to_numpy()[rows].tolist(),
+            "estimated_cost": engine._location_cost_array[rows].tolist(),
+            "hybrid_score": recs["hybrid_score"].to_numpy().tolist(),
+        }
+        by_user = {}
+        for position, user_id in enumerate(recs["user_id"].to_numpy().tolist()):
+            by_user.setdefault(user_id, []).append(position)
+
+        results = []
+        for query in queries:
+            if query["user_id"] not in engine.lookup:
+                results.append(None)
+                continue
+            results.append([
+                {"rank": rank, **{name: _json_value(values[position]) for name, values in columns.items()}}
+                for rank, position in enumerate(by_user.get(query["user_id"], [])[:query["top_n"]], start=1)
+            ])
+        return results
+
+    # HTTP -------------------------------------------------------------------------------------
+
+    async def handle_connection(self, reader, writer):
+        # HTTP/1.1 with keep-alive; one request at a time per connection
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except RequestError as error:
+                    await _write_response(writer, error.status, {"error": str(error)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                status, payload = await self.dispatch(method, target, body)
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+                await _write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        routes = {"/recommend": ("GET", "POST"), "/recommend/batch": ("POST",), "/health": ("GET",),
+                  "/metrics": ("GET",)}
+        if url.path not in routes:
+            return 404, {"error": f"no route {url.path}"}
+        if method not in routes[url.path]:
+            return 405, {"error": f"{method} not allowed on {url.path}"}
+        try:
+            if url.path == "/health":
+                health = {"status": "ok", "engine_version": self.engine.version, "window_ms": self.window * 1000,
+                          "max_batch": self.max_batch, **self.stats,
+                          "mean_batch_size": self.stats["queries"] / max(self.stats["batches"], 1)}
+                if self.ingestor is not None:
+                    health["ingestion"] = {**self.ingestor.metrics.summary(), "error": self._ingest_error}
+                return 200, health
+            if url.path == "/metrics":
+                text = instrumentation.prometheus_text()
+                if self.ingestor is not None:
+                    text += self.ingestor.metrics.prometheus_text()
+                return 200, text
+            self.stats["requests"] += 1
+            if url.path == "/recommend":
+                query = parse_query(dict(parse_qsl(url.query)) if method == "GET" else _parse_json(body))
+                recommendations = await self.recommend(query)
+                if recommendations is None:
+                    return 404, {"error": f"unknown user_id {query['user_id']}"}
+                return 200, {"user_id": query["user_id"], "recommendations": recommendations}
+
+            payload = _parse_json(body)
+            queries = payload.get("queries") if isinstance(payload, dict) else None
+            if not isinstance(queries, list) or not 1 <= len(queries) <= MAX_BATCH_QUERIES:
+                raise RequestError(400, f"body must be {{\"queries\": [...]}} with 1 to {MAX_BATCH_QUERIES} queries")
+            queries = [parse_query(query) for query in queries]
+            # Submitted one by one so they share batches with concurrent single requests
+            results = await asyncio.gather(*(self.recommend(query) for query in queries))
+            return 200, {"results": [
+                {"user_id": query["user_id"], "recommendations": recommendations} if recommendations is not None
+                else {"user_id": query["user_id"], "error": "unknown user_id"}
+                for query, recommendations in zip(queries, results)
+            ]}
+        except RequestError as error:
+            return error.status, {"error": str(error)}
+        except Exception as error:
+            return 500, {"error": f"{type(error).__name__}: {error}"}
+
+
+def _json_value(value):
+    # NaN costs (locations without trips) become null; json.dumps would write a bare NaN
+    return None if isinstance(value, float) and value != value else value
+
+
+def _parse_json(body):
+    try:
+        return json.loads(body or b"null")
+    except ValueError:
+        raise RequestError(400, "body is not valid JSON")
+
+
+async def _read_request(reader):
+    # (method, target, version, headers, body), or None once the client has closed the connection
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise RequestError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise RequestError(400, "bad Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    method, target, version = parts
+    return method.upper(), target, version.upper(), headers, body
+
+
+async def _write_response(writer, status, payload, keep_alive):
+    if isinstance(payload, str):
+        body, content_type = payload.encode(), "text/plain; version=0.0.4"
+    else:
+        body, content_type = json.dumps(payload).encode(), "application/json"
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+async def serve(service, host="127.0.0.1", port=8080, ready=None):
+    # Runs until cancelled; `ready` (an asyncio.Event) is set once the socket is listening
+    await service.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    try:
+        async with server:
+            if ready is not None:
+                ready.set()
+            await server.serve_forever()
+    finally:
+        await service.stop()
@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+TABLES = ["locations", "trips", "users", "reviews"]
+MANIFEST = "manifest.json"
+
+
+# Layout: <snapshot_dir>/<table>/<column>.npy for numeric/bool columns, in the dtype read_csv gave them. Text
+# columns are dictionary encoded as <column>.codes.npy (-1 = missing) plus a UTF-8 string table
+# <column>.strings.bin / <column>.offsets.npy, and load as pandas Categoricals over the mapped codes: only the
+# distinct strings are decoded. Arrays are mapped copy-on-write, so worker processes share the page cache instead
+# of parsing CSVs, and a write to a loaded frame copies just the touched pages of that process.
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _code_dtype(num_categories):
+    # The code width pandas.Categorical picks for this many categories, so it adopts the mapped codes without a copy
+    for dtype in (np.int8, np.int16, np.int32):
+        if num_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _write_text_column(table_dir, name, series):
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    encoded = [str(value).encode("utf-8") for value in uniques]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    np.save(os.path.join(table_dir, f"{name}.codes.npy"), codes.astype(_code_dtype(len(uniques))))
+    np.save(os.path.join(table_dir, f"{name}.offsets.npy"), offsets)
+    with open(os.path.join(table_dir, f"{name}.strings.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+
+
+def _map_array(path):
+    # Plain ndarray view of the mapping, so slices and results built from it are not np.memmap subclasses
+    return np.load(path, mmap_mode="c").view(np.ndarray)
+
+
+def _read_text_column(table_dir, name):
+    codes = _map_array(os.path.join(table_dir, f"{name}.codes.npy"))
+    offsets = np.load(os.path.join(table_dir, f"{name}.offsets.npy"))
+    with open(os.path.join(table_dir, f"{name}.strings.bin"), "rb") as f:
+        raw = f.read()
+    categories = pd.Index([raw[start:stop].decode("utf-8") for start, stop in zip(offsets[:-1], offsets[1:])])
+    # Codes were checked against the string table when written; -1 reads as missing
+    return pd.Categorical.from_codes(codes, categories=categories, validate=False)
+
+
+def decode_text_columns(df):
+    # Categorical text columns back to the string dtype read_csv gives, for catalogue-sized tables whose values are
+    # copied into results (where e.g. fillna(0) must work as it does on CSV-loaded frames)
+    categorical = {name: "str" for name in df.columns if isinstance(df[name].dtype, pd.CategoricalDtype)}
+    return df.astype(categorical) if categorical else df
+
+
+def write_table(df, table_dir):
+    os.makedirs(table_dir, exist_ok=True)
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy()
+            np.save(os.path.join(table_dir, f"{name}.npy"), values)
+            columns.append({"name": name, "kind": "array", "dtype": values.dtype.str})
+        else:
+            _write_text_column(table_dir, name, series)
+            columns.append({"name": name, "kind": "text"})
+    return {"rows": len(df), "columns": columns}
+
+
+def read_table(table_dir, table_manifest):
+    data = {}
+    for column in table_manifest["columns"]:
+        name = column["name"]
+        if column["kind"] == "array":
+            data[name] = _map_array(os.path.join(table_dir, f"{name}.npy"))
+        else:
+            data[name] = _read_text_column(table_dir, name)
+    return pd.DataFrame(data, copy=False)
+
+
+def compile_snapshot(source_dir, snapshot_dir):
+    staging_dir = snapshot_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    manifest = {}
+    for table in TABLES:
+        source_path = os.path.join(source_dir, f"{table}.csv")
+        table_manifest = write_table(pd.read_csv(source_path), os.path.join(staging_dir, table))
+        table_manifest["source"] = _source_signature(source_path)
+        manifest[table] = table_manifest
+    with open(os.path.join(staging_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    # Swap in the finished snapshot so readers never see a half-written one
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    os.replace(staging_dir, snapshot_dir)
+    return manifest
+
+
+def read_manifest(snapshot_dir):
+    with open(os.path.join(snapshot_dir, MANIFEST)) as f:
+        return json.load(f)
+
+
+def snapshot_is_fresh(source_dir, snapshot_dir):
+    # Stale (or missing) when any source CSV changed size or mtime since the snapshot was compiled
+    try:
+        manifest = read_manifest(snapshot_dir)
+        return all(
+            manifest[table]["source"] == _source_signature(os.path.join(source_dir, f"{table}.csv"))
+            for table in TABLES
+        )
+    except (OSError, KeyError, ValueError):
+        return False
+
+
+def load_snapshot(snapshot_dir):
+    manifest = read_manifest(snapshot_dir)
+    locations_df, trips_df, users_df, reviews_df = (
+        read_table(os.path.join(snapshot_dir, table), manifest[table]) for table in TABLES
+    )
+    # The location catalogue is small and its columns flow into every result frame, so it keeps CSV dtypes
+    return decode_text_columns(locations_df), trips_df, users_df, reviews_df
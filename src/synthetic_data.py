@@ -0,0 +1,163 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Vocabularies the synthetic tables draw from; close to the shipped data so TF-IDF and the app queries behave alike
+STATES = [
+    'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar', 'Chhattisgarh', 'Delhi', 'Goa', 'Gujarat', 'Haryana',
+    'Himachal Pradesh', 'Jammu and Kashmir', 'Jharkhand', 'Karnataka', 'Kerala', 'Ladakh', 'Madhya Pradesh',
+    'Maharashtra', 'Manipur', 'Meghalaya', 'Mizoram', 'Nagaland', 'Odisha', 'Punjab', 'Rajasthan', 'Sikkim',
+    'Tamil Nadu', 'Telangana', 'Tripura', 'Uttar Pradesh', 'Uttarakhand', 'West Bengal'
+]
+CATEGORIES = [
+    'remote_nature', 'remote_nature_cultural', 'local_getaway', 'cultural_historical', 'religious_cultural',
+    'beach_retreat', 'wildlife_ecotourism', 'remote_nature_religious', 'beach_religious', 'eco_adventure',
+    'eco_tourism', 'religious_historical', 'historical_ruins', 'riverine_cultural', 'adventure_hiking',
+    'tribal_retreat', 'hill_station_trails', 'cultural_escape'
+]
+ACTIVITY_VERBS = ['trek to', 'explore', 'visit', 'camp near', 'hike around', 'photograph', 'enjoy views of',
+                  'take a boat ride on', 'go rafting at', 'watch the sunrise at', 'learn crafts at', 'shop near']
+SITE_NAMES = ['river', 'lake', 'pass', 'valley', 'falls', 'fort', 'temple', 'monastery', 'meadows', 'beach',
+              'caves', 'palace', 'market', 'village', 'peak', 'forest', 'reserve', 'museum', 'ghats', 'gardens']
+NAME_PARTS = ['Chit', 'Lan', 'Gur', 'Sho', 'Kal', 'Mun', 'Tir', 'Nau', 'Shek', 'Pang', 'Dal', 'Sang', 'Kha',
+              'Bir', 'Jib', 'Ser', 'Rog', 'Zir', 'Maw', 'Pel', 'Ton', 'Hamp', 'Var', 'Kov', 'Mah', 'Ara']
+NAME_ENDINGS = ['kul', 'dour', 'ez', 'jha', 'pa', 'siyari', 'than', 'tal', 'gam', 'ling', 'pur', 'garh', 'ur',
+                'kot', 'ghat', 'bari', 'halli', 'nagar', 'ong', 'du']
+OCCUPATIONS = ['Student', 'Working professional', 'Entrepreneur / Business owner', 'Other']
+LOCATION_TYPES = ['Urban (metro city)', 'Rural', 'Suburban']
+# users.csv column order, with the share of users in each bracket
+BUDGET_COLUMNS = ['budget_under_25k', 'budget_above_100k', 'budget_25k_to_50k', 'budget_50k_to_100k']
+BUDGET_SHARES = [0.48, 0.2, 0.25, 0.07]
+REVIEW_OPENERS = {1: ['Horrible', 'Extremely bad', 'Very poor'], 2: ['Poor', 'Not very good', 'Mediocre'],
+                  3: ['Average', 'Just okay', 'Decent'], 4: ['Good', 'A solid', 'Pleasant'],
+                  5: ['Excellent', 'Amazing', 'Outstanding']}
+REVIEW_SUBJECTS = ['nature walk', 'ferry ride', 'cultural immersion', 'yoga experience', 'tribal retreat',
+                   'historical exploration', 'bird photography', 'temple architecture', 'relaxation experience']
+# Upper bounds of the trips.csv cost_label bands
+COST_LABELS = ['Low', 'Medium', 'High', 'Very High']
+COST_LABEL_BOUNDS = [5000, 10000, 20000]
+TRIP_DATE_RANGE = ('2022-01-01', '2024-12-31')
+
+
+def zipf_weights(n, exponent, rng):
+    # Long-tailed popularity over n ids in random order: weight of rank r is r ** -exponent
+    weights = np.arange(1, n + 1, dtype=float) ** -exponent
+    return rng.permutation(weights / weights.sum())
+
+
+def generate_dataset(num_users=1000, num_locations=200, num_reviews=5000, num_trips=None,
+                     popularity_exponent=0.8, activity_exponent=0.7, seed=42):
+    # (locations_df, trips_df, users_df, reviews_df), in load_all_data() order. Each table has its own random
+    # stream, so the same seed and sizes always give the same tables and resizing one table leaves the others alone.
+    # Location popularity and user activity both follow Zipf-like weights, so a few locations collect most reviews
+    # and most users have only one or two. trips carry location_id and trip_date as well as the trips.csv columns.
+    num_trips = num_users if num_trips is None else num_trips
+    location_rng, user_rng, review_rng, trip_rng, popularity_rng = (
+        np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(5)
+    )
+    popularity = zipf_weights(num_locations, popularity_exponent, popularity_rng)
+    activity = zipf_weights(num_users, activity_exponent, popularity_rng)
+
+    locations_df, location_quality, location_cost = generate_locations(num_locations, location_rng)
+    users_df = generate_users(num_users, user_rng)
+    reviews_df = generate_reviews(num_reviews, activity, popularity, location_quality, review_rng)
+    trips_df = generate_trips(num_trips, activity, popularity, location_cost, trip_rng)
+    return locations_df, trips_df, users_df, reviews_df
+
+
+def generate_locations(num_locations, rng):
+    # locations.csv rows plus each location's latent quality (mean rating) and base trip cost
+    num_activities = rng.integers(1, 8, size=num_locations)
+    num_places = rng.integers(2, 9, size=num_locations)
+    activities = [
+        ', '.join(f"{rng.choice(ACTIVITY_VERBS)} {rng.choice(NAME_PARTS).lower()}{rng.choice(NAME_ENDINGS)} "
+                  f"{rng.choice(SITE_NAMES)}" for _ in range(count))
+        for count in num_activities
+    ]
+    places = [
+        ','.join(f"{rng.choice(NAME_PARTS).lower()}{rng.choice(NAME_ENDINGS)} {rng.choice(SITE_NAMES)}"
+                 for _ in range(count))
+        for count in num_places
+    ]
+    names = np.char.add(rng.choice(NAME_PARTS, size=num_locations), rng.choice(NAME_ENDINGS, size=num_locations))
+    locations_df = pd.DataFrame({
+        'location_id': np.arange(1, num_locations + 1),
+        'location_name': [f"{name} {index}" for index, name in enumerate(names, start=1)],
+        'state': rng.choice(STATES, size=num_locations),
+        'category': rng.choice(CATEGORIES, size=num_locations, p=zipf_weights(len(CATEGORIES), 1.2, rng)),
+        'activities': activities,
+        'places': places,
+        'num_activities': num_activities,
+        'num_places': num_places,
+    })
+    quality = np.clip(rng.normal(3.7, 0.5, size=num_locations), 1.5, 4.9)
+    base_cost = rng.lognormal(np.log(9000), 0.6, size=num_locations)
+    return locations_df, quality, base_cost
+
+
+def generate_users(num_users, rng):
+    budgets = rng.choice(len(BUDGET_COLUMNS), size=num_users, p=BUDGET_SHARES)
+    users_df = pd.DataFrame({
+        'user_id': np.arange(1, num_users + 1),
+        'occupation': rng.choice(OCCUPATIONS, size=num_users, p=[0.33, 0.26, 0.2, 0.21]),
+        'location_type': rng.choice(LOCATION_TYPES, size=num_users),
+    })
+    for index, column in enumerate(BUDGET_COLUMNS):
+        users_df[column] = budgets == index
+    return users_df
+
+
+def generate_reviews(num_reviews, activity, popularity, location_quality, rng):
+    # Ratings are location quality plus a per-user bias and noise, on the 1-5 scale with one decimal
+    user_index = rng.choice(len(activity), size=num_reviews, p=activity)
+    location_index = rng.choice(len(popularity), size=num_reviews, p=popularity)
+    user_bias = rng.normal(0.0, 0.4, size=len(activity))
+    ratings = location_quality[location_index] + user_bias[user_index] + rng.normal(0.0, 0.8, size=num_reviews)
+    ratings = np.round(np.clip(ratings, 1.0, 5.0), 1)
+
+    # Text is a short template keyed on the rounded rating, built once per (opener, subject) pair
+    stars = np.rint(ratings).astype(int)
+    templates = np.array([f"{opener} {subject}." for star in range(1, 6) for opener in REVIEW_OPENERS[star]
+                          for subject in REVIEW_SUBJECTS])
+    per_star = 3 * len(REVIEW_SUBJECTS)
+    text_index = (stars - 1) * per_star + rng.integers(0, per_star, size=num_reviews)
+    return pd.DataFrame({
+        'review_id': np.arange(1, num_reviews + 1),
+        'user_id': user_index + 1,
+        'location_id': location_index + 1,
+        'rating': ratings,
+        'review_text': templates[text_index],
+    })
+
+
+def generate_trips(num_trips, activity, popularity, location_cost, rng):
+    # Cost scales with the location's base cost and the trip length; day_of_week and month follow trip_date
+    user_index = rng.choice(len(activity), size=num_trips, p=activity)
+    location_index = rng.choice(len(popularity), size=num_trips, p=popularity)
+    duration_days = rng.integers(1, 15, size=num_trips)
+    cost = location_cost[location_index] * (0.5 + duration_days / 10) * rng.lognormal(0.0, 0.25, size=num_trips)
+    cost = np.round(np.clip(cost, 1500, 45000), 2)
+
+    start, end = (np.datetime64(day) for day in TRIP_DATE_RANGE)
+    trip_date = pd.DatetimeIndex(start + rng.integers(0, (end - start).astype(int) + 1, size=num_trips))
+    return pd.DataFrame({
+        'trip_id': np.arange(1, num_trips + 1),
+        'user_id': user_index + 1,
+        'cost': cost,
+        'duration_days': duration_days,
+        'day_of_week': trip_date.dayofweek,
+        'month': trip_date.month,
+        'cost_label': np.array(COST_LABELS)[np.searchsorted(COST_LABEL_BOUNDS, cost, side='right')],
+        'location_id': location_index + 1,
+        'trip_date': trip_date.strftime('%Y-%m-%d'),
+    })
+
+
+def write_dataset(output_dir, locations_df, trips_df, users_df, reviews_df):
+    # Same file layout as data/final, so load_all_data(output_dir) reads it directly
+    os.makedirs(output_dir, exist_ok=True)
+    tables = {'locations': locations_df, 'trips': trips_df, 'users': users_df, 'reviews': reviews_df}
+    for table, df in tables.items():
+        df.to_csv(os.path.join(output_dir, f"{table}.csv"), index=False)
+    return {table: len(df) for table, df in tables.items()}
@@ -0,0 +1,160 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.instrumentation import instrumented
+
+MANIFEST = "manifest.json"
+USER_IDS = "user_ids.npy"
+
+
+# Layout: <table_dir>/manifest.json, user_ids.npy and shard-<n>.npy. Shard n holds users
+# [n * shard_users, (n + 1) * shard_users) x every (category, state) context as fixed-width records: top_n int32
+# location ids (-1 = padding) and top_n float32 hybrid scores (NaN = padding), best first. A lookup is two dict
+# reads and one record of a memory-mapped shard.
+
+def record_dtype(top_n):
+    return np.dtype([("location_id", "<i4", (top_n,)), ("score", "<f4", (top_n,))])
+
+
+def shard_name(shard):
+    return f"shard-{shard:05d}.npy"
+
+
+def location_contexts(locations_df):
+    # Every (category, state) pair that at least one location has, in first-seen order
+    pairs = locations_df[["category", "state"]].dropna().drop_duplicates()
+    return [(str(category), str(state)) for category, state in pairs.itertuples(index=False)]
+
+
+def read_manifest(table_dir):
+    with open(os.path.join(table_dir, MANIFEST)) as f:
+        return json.load(f)
+
+
+def _write_manifest(table_dir, manifest):
+    # Replaced atomically after every shard, so an interrupted run resumes from the last finished shard
+    path = os.path.join(table_dir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _save_array(path, values):
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, values)
+    os.replace(path + ".tmp", path)
+
+
+def _same_contents(path, records):
+    try:
+        existing = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return False
+    return existing.dtype == records.dtype and existing.shape == records.shape and existing.tobytes() == records.tobytes()
+
+
+def score_shard(engine, user_ids, contexts, top_n):
+    # (users x contexts) records from one recommend_batch() call per context
+    records = np.empty((len(user_ids), len(contexts)), dtype=record_dtype(top_n))
+    records["location_id"] = -1
+    records["score"] = np.nan
+    user_rows = pd.Index(user_ids)
+    for column, (category, state) in enumerate(contexts):
+        recs = engine.recommend_batch(user_ids, category, state, top_n=top_n)
+        rows = user_rows.get_indexer(recs["user_id"])
+        ranks = recs["rank"].to_numpy() - 1
+        records["location_id"][rows, column, ranks] = recs["location_id"].to_numpy()
+        records["score"][rows, column, ranks] = recs["hybrid_score"].to_numpy(dtype=float)
+    return records
+
+
+@instrumented("precompute_topn_table")
+def precompute_topn_table(engine, table_dir, contexts, fingerprint, top_n=None, shard_users=None, progress=None):
+    # Scores every user of a fitted engine shard by shard. A shard already finished under the same fingerprint is
+    # skipped (resume); a recomputed shard whose records match the file on disk is left untouched, so only changed
+    # shards are rewritten. Returns how many shards were resumed, unchanged and written.
+    top_n = config.TOP_K if top_n is None else top_n
+    shard_users = config.TOPN_SHARD_USERS if shard_users is None else shard_users
+    user_ids = engine.user_metadata.index.to_numpy()
+    layout = {"top_n": top_n, "shard_users": shard_users, "contexts": [list(context) for context in contexts],
+              "num_users": len(user_ids)}
+    num_shards = -(-len(user_ids) // shard_users)
+
+    os.makedirs(table_dir, exist_ok=True)
+    try:
+        manifest = read_manifest(table_dir)
+        same_layout = manifest["layout"] == layout and np.array_equal(
+            np.load(os.path.join(table_dir, USER_IDS)), user_ids
+        )
+    except (OSError, KeyError, ValueError):
+        same_layout = False
+    if not same_layout:
+        # Rows no longer line up with the old shards: start over
+        manifest = {"layout": layout, "shards": {}}
+        _save_array(os.path.join(table_dir, USER_IDS), user_ids)
+        for name in os.listdir(table_dir):
+            if name.startswith("shard-") and name >= shard_name(num_shards):
+                os.remove(os.path.join(table_dir, name))
+    manifest["fingerprint"] = fingerprint
+    manifest["complete"] = False
+    _write_manifest(table_dir, manifest)
+
+    summary = {"resumed": 0, "unchanged": 0, "written": 0}
+    for shard in range(num_shards):
+        name = shard_name(shard)
+        path = os.path.join(table_dir, name)
+        if manifest["shards"].get(name) == fingerprint and os.path.exists(path):
+            summary["resumed"] += 1
+            continue
+        records = score_shard(engine, user_ids[shard * shard_users:(shard + 1) * shard_users], contexts, top_n)
+        if same_layout and _same_contents(path, records):
+            summary["unchanged"] += 1
+        else:
+            _save_array(path, records)
+            summary["written"] += 1
+        manifest["shards"][name] = fingerprint
+        _write_manifest(table_dir, manifest)
+        if progress is not None:
+            progress(shard + 1, num_shards)
+
+    manifest["complete"] = True
+    _write_manifest(table_dir, manifest)
+    return summary
+
+
+class TopNTable:
+    # Read side of precompute_topn_table(). Shards are memory-mapped, so opening is cheap, a lookup is O(1) and
+    # worker processes share the page cache
+
+    def __init__(self, table_dir):
+        manifest = read_manifest(table_dir)
+        if not manifest.get("complete"):
+            raise ValueError(f"{table_dir} is incomplete; rerun the precompute to finish it")
+        layout = manifest["layout"]
+        self.top_n = layout["top_n"]
+        self.shard_users = layout["shard_users"]
+        self.fingerprint = manifest["fingerprint"]
+        self.contexts = [tuple(context) for context in layout["contexts"]]
+        self.context_index = {context: column for column, context in enumerate(self.contexts)}
+        self.user_ids = np.load(os.path.join(table_dir, USER_IDS))
+        self.user_index = {user_id: row for row, user_id in enumerate(self.user_ids.tolist())}
+        num_shards = -(-len(self.user_ids) // self.shard_users)
+        self._shards = [np.load(os.path.join(table_dir, shard_name(shard)), mmap_mode="r") for shard in range(num_shards)]
+
+    def __contains__(self, user_id):
+        return user_id in self.user_index
+
+    def lookup(self, user_id, category, state):
+        # (location_ids, scores), best first, or None for a user or (category, state) outside the table
+        row = self.user_index.get(user_id)
+        column = self.context_index.get((category, state))
+        if row is None or column is None:
+            return None
+        record = self._shards[row // self.shard_users][row % self.shard_users, column]
+        location_ids = record["location_id"]
+        count = int(np.count_nonzero(location_ids >= 0))
+        return location_ids[:count], record["score"][:count]
@@ -1,12 +1,104 @@
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.instrumentation import instrumented
+
 def normalize_scores(series):
     return (series - series.min()) / (series.max() - series.min() + 1e-9)
 
+def top_n_indices(scores, n, tiebreak=None):
+    # Positions of the n highest scores, best first, without sorting the rest: argpartition-style selection
+    # keeps everything tied with the n-th best, then only those survivors are sorted. Ties go to the smaller
+    # tiebreak key (default: position), NaN ranks last, as in sort_values.
+    scores = np.asarray(scores, dtype=float)
+    n = max(min(n, len(scores)), 0)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    negated = -scores
+    if n < len(scores):
+        kth = np.partition(negated, n - 1)[n - 1]
+        candidates = np.arange(len(scores)) if np.isnan(kth) else np.flatnonzero(negated <= kth)
+    else:
+        candidates = np.arange(len(scores))
+    keys = candidates if tiebreak is None else np.asarray(tiebreak)[candidates]
+    return candidates[np.lexsort((keys, negated[candidates]))[:n]]
+
+def data_fingerprint(frames, **params):
+    # Content hash of the input tables plus every parameter that changes the rankings
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode())
+    for df in frames:
+        digest.update(",".join(map(str, df.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+COST_PERCENTILES = (25, 75, 90)
+
+@instrumented("estimate_location_cost")
 def estimate_location_cost(reviews_df, trips_df):
+    # Trips that carry location_id are aggregated directly; older extracts without it fall back to
+    # attributing each user's trip costs to every location they reviewed (a reviews x trips fan-out)
+    if "location_id" in trips_df.columns:
+        cost_table = build_location_cost_table(trips_df)
+        return cost_table[["location_id", "mean_cost"]].rename(columns={"mean_cost": "estimated_cost"})
     merged = reviews_df.merge(trips_df, on="user_id", how="left")
     location_costs = merged.groupby("location_id")["cost"].mean().reset_index()
     location_costs.columns = ["location_id", "estimated_cost"]
     return location_costs
 
+@instrumented("build_location_cost_table")
+def build_location_cost_table(trips_df, percentiles=COST_PERCENTILES):
+    # Per-location trip count, mean, median and percentile costs from a single sort by (location, cost);
+    # percentiles interpolate linearly, like np.percentile
+    trips = trips_df.dropna(subset=["location_id", "cost"])
+    location_codes, location_ids = pd.factorize(trips["location_id"], sort=True)
+    costs = trips["cost"].to_numpy(dtype=float)
+    order = np.lexsort((costs, location_codes))
+    sorted_costs = costs[order]
+    counts = np.bincount(location_codes, minlength=len(location_ids))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+
+    def percentile(q):
+        position = (counts - 1) * (q / 100)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        low, high = sorted_costs[starts + lower], sorted_costs[starts + upper]
+        return low + (high - low) * (position - lower)
+
+    cost_table = pd.DataFrame({
+        "location_id": np.asarray(location_ids),
+        "trip_count": counts,
+        "cost_sum": np.add.reduceat(sorted_costs, starts) if len(starts) else np.zeros(0),
+    })
+    cost_table["mean_cost"] = cost_table["cost_sum"] / cost_table["trip_count"]
+    cost_table["median_cost"] = percentile(50)
+    for q in percentiles:
+        cost_table[f"p{q}_cost"] = percentile(q)
+    return cost_table
+
+def build_location_cost_stats(reviews_df, trips_df):
+    # Sums/counts behind estimate_location_cost, kept so new reviews and trips can be added incrementally.
+    if "location_id" in trips_df.columns:
+        # Direct path: a trip's cost belongs to its own location only, reviews play no part
+        cost_stats = build_location_cost_table(trips_df).set_index("location_id")[["cost_sum", "trip_count"]]
+        cost_stats.columns = ["cost_sum", "cost_count"]
+        return cost_stats, None
+    # Each review contributes its user's trip-cost total and trip count to the reviewed location.
+    trip_stats = trips_df.groupby("user_id")["cost"].agg(["sum", "count"])
+    trip_stats.columns = ["trip_sum", "trip_count"]
+    per_review = reviews_df[["user_id", "location_id"]].join(trip_stats, on="user_id")
+    cost_stats = per_review.groupby("location_id")[["trip_sum", "trip_count"]].sum()
+    cost_stats.columns = ["cost_sum", "cost_count"]
+    return cost_stats, trip_stats
+
+def location_costs_from_stats(cost_stats):
+    estimated_cost = cost_stats["cost_sum"] / cost_stats["cost_count"].where(cost_stats["cost_count"] > 0)
+    location_costs = estimated_cost.rename("estimated_cost").reset_index()
+    location_costs.columns = ["location_id", "estimated_cost"]
+    return location_costs
+
 """
 def apply_budget_filter(location_df, location_costs, trip_budget):
     merged = location_df.merge(location_costs, on="location_id", how="left")
@@ -14,7 +106,10 @@ def apply_budget_filter(location_df, location_costs, trip_budget):
 """
 
 # More optimized function
-def get_user_budget_limit(users_df, user_id):
+def get_user_budget_limit(users_df, user_id, lookup=None):
+    # lookup: a src.lookup.LookupTables built from users_df, for an O(1) read instead of the mask scan
+    if lookup is not None:
+        return lookup.budget_limit(user_id)
     user = users_df[users_df['user_id'] == user_id].iloc[0]
     if user['budget_under_25k']:
         return 25000
@@ -26,3 +121,14 @@ def get_user_budget_limit(users_df, user_id):
         return 200000
     else:
         return float('inf')
+
+def get_budget_limits(users_df):
+    # Vectorised get_user_budget_limit for every user at once
+    conditions = [
+        users_df['budget_under_25k'].astype(bool),
+        users_df['budget_25k_to_50k'].astype(bool),
+        users_df['budget_50k_to_100k'].astype(bool),
+        users_df['budget_above_100k'].astype(bool),
+    ]
+    limits = np.select(conditions, [25000, 50000, 100000, 200000], default=float('inf'))
+    return pd.Series(limits, index=users_df['user_id'].values).groupby(level=0).first()
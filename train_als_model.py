@@ -0,0 +1,38 @@
+import argparse
+import os
+import time
+
+from src import config
+from src.collaborative_filtering import create_sparse_user_location_matrix
+from src.data_loader import load_all_data
+from src.matrix_factorization import als_rmse, train_als, training_fingerprint
+
+
+# Offline job: latent factors that serve.py / main.py (--als-model) load instead of training at start-up
+def main():
+    parser = argparse.ArgumentParser(description="Train the ALS matrix-factorisation model on reviews.csv")
+    parser.add_argument("--rank", type=int, default=config.ALS_RANK)
+    parser.add_argument("--regularization", type=float, default=config.ALS_REGULARIZATION)
+    parser.add_argument("--iterations", type=int, default=config.ALS_ITERATIONS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=None)
+    parser.add_argument("--output", default=config.ALS_MODEL_PATH)
+    args = parser.parse_args()
+
+    _, _, _, reviews_df = load_all_data(args.data_dir)
+    interactions = create_sparse_user_location_matrix(reviews_df)
+
+    start = time.perf_counter()
+    model = train_als(interactions, rank=args.rank, regularization=args.regularization, iterations=args.iterations,
+                      seed=args.seed)
+    elapsed = time.perf_counter() - start
+    model.fingerprint = training_fingerprint(reviews_df)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    model.save(args.output)
+    print(f"Trained rank={args.rank} model for {len(model.user_ids)} users x {len(model.location_ids)} locations "
+          f"in {elapsed:.3f}s (training RMSE {als_rmse(model, interactions):.4f}) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()